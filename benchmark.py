@@ -0,0 +1,461 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Git提交日志提取工具 - 性能基准测试脚本
+生成合成的多仓库工作区（完全离线），分别统计各阶段耗时，并以 JSON 格式输出结果，
+便于在不同版本之间对比性能变化。
+
+用法示例:
+    python benchmark.py --repos 100 --commits 200 --branches 3 --output bench.json
+    python benchmark.py --repos 20 --check-backends     # 校验各 git 后端在合成仓库上的结果是否一致
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import statistics
+import subprocess
+import tempfile
+
+from git_commit_tool import (find_git_repos, get_git_commits, extract_commits_from_repos,
+                             clean_commit_message, MessageNormalizer, save_commits_to_file, AuthorMatcher,
+                             SubprocessBackend, Pygit2Backend, pygit2, CommitIndex, set_git_backend)
+
+BENCH_AUTHOR = "Bench User"
+OTHER_AUTHORS = ["Other Dev", "Build Bot"]
+MESSAGE_TEMPLATES = [
+    "feat: add {topic} support",
+    "fix: handle empty {topic}",
+    "refactor: simplify {topic} handling\n\nMove the {topic} helpers into one module.",
+    "docs: describe {topic}",
+    "chore: bump {topic} version",
+    "perf(core): speed up {topic} lookup",
+]
+TOPICS = ["config", "parser", "login", "cache", "export", "report", "branch", "search"]
+# 一致性检查用的边界情况仓库及额外检查的作者表达式（git log --author 的 BRE 写法）
+EDGE_CASE_REPO = "edge_cases"
+EDGE_CASE_AUTHORS = [
+    "Alice (Dev)", "Alice+", "C++", "[bot]", "^Alice", "Dev)$", "Ali.e", "\\(Dev\\)", "Alice \\(Dev\\|Ops\\)",
+    "l\\{2\\}", "[[:upper:]]\\{3\\}", "*", "Renée", "Café", "Old Alias", "old.alias@", "Build Bot", "cpp@",
+]
+
+
+def _fast_import_stream(repo_index, commits, branches, branch_commits, days, now):
+    """
+    生成 git fast-import 的输入流：main 分支 commits 个提交，另有 branches 个分支各 branch_commits 个提交。
+    提交时间均匀分布在最近 days 天内，作者在测试作者和其他作者之间轮换。
+    """
+    span = max(1, days * 86400 - 60)
+    total = commits + branches * branch_commits
+    lines = []
+    mark = 0
+
+    def add_commit(ref, number, parent_mark):
+        nonlocal mark
+        mark += 1
+        timestamp = now - span + span * number // max(1, total)
+        author = BENCH_AUTHOR if number % 3 != 2 else OTHER_AUTHORS[number % len(OTHER_AUTHORS)]
+        email = author.lower().replace(' ', '.') + "@example.com"
+        message = MESSAGE_TEMPLATES[number % len(MESSAGE_TEMPLATES)].format(
+            topic=TOPICS[(number + repo_index) % len(TOPICS)]) + f" #{number}\n"
+        content = f"repo {repo_index} change {number}\n"
+        lines.append(f"commit {ref}\n")
+        lines.append(f"mark :{mark}\n")
+        lines.append(f"author {author} <{email}> {timestamp} +0800\n")
+        lines.append(f"committer {author} <{email}> {timestamp} +0800\n")
+        lines.append(f"data {len(message.encode('utf-8'))}\n{message}")
+        if parent_mark:
+            lines.append(f"from :{parent_mark}\n")
+        lines.append(f"M 644 inline file_{number % 10}.txt\n")
+        lines.append(f"data {len(content.encode('utf-8'))}\n{content}\n")
+        return mark
+
+    number = 0
+    main_marks = []
+    parent = None
+    for _ in range(commits):
+        parent = add_commit("refs/heads/main", number, parent)
+        main_marks.append(parent)
+        number += 1
+
+    for b in range(branches):
+        # 分支从 main 的不同位置分出
+        parent = main_marks[(b + 1) * len(main_marks) // (branches + 1)] if main_marks else None
+        for _ in range(branch_commits):
+            parent = add_commit(f"refs/heads/feature-{b}", number, parent)
+            number += 1
+
+    return ''.join(lines).encode('utf-8')
+
+
+def _edge_case_stream(now, days):
+    """
+    生成边界情况仓库的 git fast-import 输入流（bytes）：
+
+    - feature-edge 分支合并回 main 的合并提交；
+    - .mailmap 把 “Old Alias” 映射为测试作者、把 cpp@example.com 映射为 Build Bot；
+    - 提交时间早于父提交（时钟偏差）、作者时间在日期范围之外而提交时间在范围之内、提交时间在未来；
+    - 提交时间早于 --since 的分支；
+    - encoding 为 ISO-8859-1 的提交（作者名和提交信息都以 Latin-1 存储）；
+    - 作者名包含 ( ) + [ ] . * 等正则特殊字符。
+    """
+    base = now - max(1, days) * 86400 + 3600
+    chunks = []
+    mark = 0
+
+    def add_commit(ref, author, email, author_time, commit_time, message, parents=(), files=None,
+                   encoding=None, tz='+0800'):
+        nonlocal mark
+        mark += 1
+        text_encoding = encoding or 'utf-8'
+        data = message.encode(text_encoding)
+        chunks.append(f"commit {ref}\nmark :{mark}\n".encode('ascii'))
+        chunks.append(f"author {author} <{email}> {author_time} {tz}\n".encode(text_encoding))
+        chunks.append(f"committer {author} <{email}> {commit_time} {tz}\n".encode(text_encoding))
+        if encoding:
+            chunks.append(f"encoding {encoding}\n".encode('ascii'))
+        chunks.append(f"data {len(data)}\n".encode('ascii') + data + b"\n")
+        for index, parent in enumerate(parents):
+            chunks.append(f"{'from' if index == 0 else 'merge'} :{parent}\n".encode('ascii'))
+        for path, content in (files or {}).items():
+            content = content.encode('utf-8')
+            chunks.append(f"M 644 inline {path}\ndata {len(content)}\n".encode('utf-8') + content + b"\n")
+        chunks.append(b"\n")
+        return mark
+
+    bench_email = BENCH_AUTHOR.lower().replace(' ', '.') + "@example.com"
+    first = add_commit("refs/heads/main", BENCH_AUTHOR, bench_email, base, base, "feat: edge base",
+                       files={"a.txt": "a\n"})
+    alice = add_commit("refs/heads/main", "Alice (Dev)", "alice@example.com", base + 100, base + 100,
+                       "fix: parenthesised author", [first], {"a.txt": "b\n"}, tz='-0700')
+    plus = add_commit("refs/heads/main", "Alice+", "alice.plus@example.com", base + 200, base + 200,
+                      "fix: plus author", [alice], {"a.txt": "c\n"}, tz='+0530')
+    side = add_commit("refs/heads/feature-edge", "C++ Dev [bot]", "cpp@example.com", base + 150, base + 150,
+                      "chore: bot change", [alice], {"b.txt": "bot\n"})
+    merge = add_commit("refs/heads/main", BENCH_AUTHOR, bench_email, base + 300, base + 300,
+                       "Merge branch 'feature-edge'", [plus, side], {"b.txt": "bot\n"})
+    # 提交时间早于父提交，作者时间在日期范围之外
+    skew = add_commit("refs/heads/main", "Ali.e* Skew", "skew@example.com", base - 30 * 86400, base + 250,
+                      "perf: skewed clock", [merge], {"c.txt": "skew\n"})
+    latin1 = add_commit("refs/heads/main", "Renée Café", "renee@example.com", base + 400, base + 400,
+                        "fix: café crème\n\nCorps du message encodé en Latin-1.", [skew], {"d.txt": "latin1\n"},
+                        encoding='iso-8859-1')
+    mailmap = (f"{BENCH_AUTHOR} <{bench_email}> Old Alias <old.alias@example.com>\n"
+               f"Build Bot <build.bot@example.com> <cpp@example.com>\n")
+    alias = add_commit("refs/heads/main", "Old Alias", "old.alias@example.com", base + 500, base + 500,
+                       "docs: commit under an old alias", [latin1], {".mailmap": mailmap})
+    # 提交时间在未来（晚于 --until），其父提交仍应被遍历
+    add_commit("refs/heads/main", BENCH_AUTHOR, bench_email, now + 2 * 86400, now + 2 * 86400,
+               "chore: commit from the future", [alias], {"e.txt": "future\n"})
+    # 提交时间早于 --since 的分支
+    add_commit("refs/heads/old-edge", "Other Dev", "other.dev@example.com", base - 40 * 86400, base - 40 * 86400,
+               "chore: stale branch", [first], {"f.txt": "old\n"})
+    return b''.join(chunks)
+
+
+def generate_edge_cases(root, days):
+    """在工作区下生成（已存在时直接复用）边界情况仓库，返回其路径"""
+    repo_path = os.path.join(root, EDGE_CASE_REPO)
+    if os.path.isdir(os.path.join(repo_path, '.git')):
+        return repo_path
+    subprocess.run(['git', 'init', '-q', repo_path], check=True)
+    subprocess.run(['git', 'symbolic-ref', 'HEAD', 'refs/heads/main'], cwd=repo_path, check=True)
+    subprocess.run(['git', 'fast-import', '--quiet'], input=_edge_case_stream(int(time.time()), days),
+                   cwd=repo_path, check=True)
+    # 检出工作区，.mailmap 才会生效
+    subprocess.run(['git', 'reset', '-q', '--hard'], cwd=repo_path, check=True)
+    return repo_path
+
+
+def _make_noise(directory, noise_dirs):
+    """在目录下生成 node_modules、dist 等“噪音”目录（不含仓库），用于衡量查找时的剪枝效果"""
+    for name in ('node_modules', 'dist'):
+        for k in range(noise_dirs):
+            package_dir = os.path.join(directory, name, f"pkg_{k}", "lib")
+            os.makedirs(package_dir, exist_ok=True)
+            with open(os.path.join(package_dir, "index.js"), 'w') as f:
+                f.write("module.exports = {};\n")
+
+
+def generate_workspace(root, repos, commits, branches, branch_commits, depth, noise_dirs, days):
+    """
+    生成合成工作区。
+
+    :param root: 工作区根目录
+    :param repos: 仓库数量
+    :param commits: 每个仓库 main 分支的提交数
+    :param branches: 每个仓库额外的分支数
+    :param branch_commits: 每个分支的提交数
+    :param depth: 仓库所在的目录深度（1 表示直接位于根目录下）
+    :param noise_dirs: 每个分组目录下 node_modules/dist 中的包数量
+    :param days: 提交时间分布的天数（截止到当前时间）
+    :return: 生成的仓库路径列表
+    """
+    now = int(time.time())
+    groups = max(1, int(repos ** 0.5))
+    repo_paths = []
+    for i in range(repos):
+        parts = [f"group_{i % groups}"] + [f"level_{d}" for d in range(max(0, depth - 2))]
+        parent_dir = os.path.join(root, *parts) if depth > 1 else root
+        repo_path = os.path.join(parent_dir, f"repo_{i:04d}")
+        os.makedirs(repo_path, exist_ok=True)
+
+        subprocess.run(['git', 'init', '-q', repo_path], check=True)
+        subprocess.run(['git', 'symbolic-ref', 'HEAD', 'refs/heads/main'], cwd=repo_path, check=True)
+        stream = _fast_import_stream(i, commits, branches, branch_commits, days, now)
+        subprocess.run(['git', 'fast-import', '--quiet'], input=stream, cwd=repo_path, check=True)
+        repo_paths.append(repo_path)
+
+    for g in range(groups):
+        group_dir = os.path.join(root, f"group_{g}") if depth > 1 else root
+        _make_noise(group_dir, noise_dirs)
+        if depth <= 1:
+            break
+
+    return sorted(repo_paths)
+
+
+def _time_stage(func, repeat):
+    """执行 repeat 次并返回 (统计结果, 最后一次的返回值)"""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return {
+        'runs': [round(s, 6) for s in seconds],
+        'min': round(min(seconds), 6),
+        'median': round(statistics.median(seconds), 6),
+    }, result
+
+
+def run_benchmark(workspace, start_date, end_date, repeat, max_workers):
+    """对工作区依次统计各阶段耗时，返回结果字典"""
+    stages = {}
+    counts = {}
+
+    stats, repos = _time_stage(lambda: find_git_repos(workspace, max_workers=max_workers), repeat)
+    stages['find_git_repos'] = stats
+    counts['repos'] = len(repos)
+
+    def serial_extract(extract_all_branches):
+        commits = []
+        for repo in repos:
+            commits.extend(get_git_commits(repo, start_date, end_date, BENCH_AUTHOR, False, extract_all_branches))
+        return commits
+
+    stats, commits = _time_stage(lambda: serial_extract(False), repeat)
+    stages['get_git_commits_current_branch'] = stats
+    counts['commits_current_branch'] = len(commits)
+
+    stats, all_commits = _time_stage(lambda: serial_extract(True), repeat)
+    stages['get_git_commits_all_branches'] = stats
+    counts['commits_all_branches'] = len(all_commits)
+
+    for engine in ('threads', 'asyncio'):
+        stats, _ = _time_stage(lambda: extract_commits_from_repos(
+            repos, start_date, end_date, BENCH_AUTHOR, False, True, max_workers, engine=engine), repeat)
+        stages[f'extract_commits_from_repos_{engine}'] = stats
+
+    messages = [commit.message for commit in all_commits]
+    stats, _ = _time_stage(lambda: [clean_commit_message(message) for message in messages], repeat)
+    stages['clean_commit_message'] = stats
+    stats, _ = _time_stage(lambda: MessageNormalizer().normalize_many(messages), repeat)
+    stages['normalize_messages_batch'] = stats
+    counts['messages'] = len(messages)
+
+    output_dir = tempfile.mkdtemp(prefix="git_commit_bench_out_")
+    try:
+        output_file = os.path.join(output_dir, "git_commits_bench.txt")
+        # save_commits_to_file 会打印保存路径，基准测试时不需要
+        devnull = open(os.devnull, 'w')
+        stdout = sys.stdout
+        try:
+            sys.stdout = devnull
+            stats, _ = _time_stage(lambda: save_commits_to_file(
+                all_commits, output_file, True, {"repo_0000(*)": "Bench-"}, True), repeat)
+        finally:
+            sys.stdout = stdout
+            devnull.close()
+        stages['save_commits_to_file'] = stats
+        counts['output_bytes'] = os.path.getsize(output_file)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {'stages': stages, 'counts': counts}
+
+
+def _commit_rows(commits):
+    return [(c.hash, c.author, c.timestamp, c.tz_offset, c.message, c.repo, c.branch) for c in commits]
+
+
+def check_backends(workspace, start_date, end_date):
+    """
+    后端一致性检查：在工作区的每个仓库（包括 generate_edge_cases 生成的边界情况仓库）上比较进程内后端与
+    subprocess 后端的分支、引用、祖先判断、按日期/作者遍历的提交（包括顺序）、团队模式和建立索引用的记录，
+    并检查用各后端建立的提交索引回答的查询与 git log 是否相同。
+
+    :return: 不一致项的描述列表，为空表示完全一致
+    """
+    reference = SubprocessBackend()
+    candidates = [Pygit2Backend()] if pygit2 is not None else []
+    authors = [BENCH_AUTHOR, "Other Dev", "Build Bot", "User", "example.com", ""] + EDGE_CASE_AUTHORS
+    matchers = [AuthorMatcher([BENCH_AUTHOR, {'name': "Other", 'aliases': ["other.dev@example.com"]},
+                               {'name': "Renée", 'aliases': ["Renée Café"]}, "Build Bot"]),
+                AuthorMatcher([BENCH_AUTHOR, "Build Bot"], use_mailmap=False)]
+    mismatches = []
+    for repo in find_git_repos(workspace):
+        for backend in candidates:
+            def compare(label, expected, actual):
+                if expected != actual:
+                    mismatches.append(f"{backend.name} {repo} {label}")
+
+            compare("current_branch", reference.current_branch(repo), backend.current_branch(repo))
+            for all_branches in (False, True):
+                tips = reference.ref_tips(repo, all_branches)
+                compare(f"ref_tips all={all_branches}", tips, backend.ref_tips(repo, all_branches))
+                for author in authors + matchers:
+                    compare(f"iter_commits all={all_branches} author={author!r}",
+                            _commit_rows(reference.iter_commits(repo, start_date, end_date, author, all_branches,
+                                                                branch='b')),
+                            _commit_rows(backend.iter_commits(repo, start_date, end_date, author, all_branches,
+                                                              branch='b')))
+                compare(f"iter_index_records all={all_branches}",
+                        list(reference.iter_index_records(repo, all_branches)),
+                        list(backend.iter_index_records(repo, all_branches)))
+
+            # 增量范围：从 HEAD 之前的提交到所有引用
+            history = subprocess.check_output(['git', 'rev-list', '--max-count=6', 'HEAD'],
+                                              cwd=repo).decode('ascii').split()
+            if len(history) > 5:
+                old, head = history[5], history[0]
+                for pair in ((old, head), (head, old), (head, head)):
+                    compare(f"is_ancestor {pair}", reference.is_ancestor(repo, *pair),
+                            backend.is_ancestor(repo, *pair))
+                revisions = sorted(set(reference.ref_tips(repo, True).values())) + ['^' + old]
+                compare("iter_commits revisions",
+                        _commit_rows(reference.iter_commits(repo, start_date, end_date, BENCH_AUTHOR,
+                                                            revisions=revisions)),
+                        _commit_rows(backend.iter_commits(repo, start_date, end_date, BENCH_AUTHOR,
+                                                          revisions=revisions)))
+                compare("iter_index_records revisions",
+                        list(reference.iter_index_records(repo, False, revisions)),
+                        list(backend.iter_index_records(repo, False, revisions)))
+
+        for backend in [reference] + candidates:
+            mismatches.extend(f"{backend.name} {repo} {label}"
+                              for label in _check_index(repo, backend, reference, start_date, end_date,
+                                                        authors + matchers))
+    return mismatches
+
+
+def _check_index(repo, backend, reference, start_date, end_date, authors):
+    """用 backend 建立临时提交索引，返回查询结果（包括顺序）与 git log 不同的项"""
+    labels = []
+    index_dir = tempfile.mkdtemp(prefix="git_commit_bench_index_")
+    index = CommitIndex(os.path.join(index_dir, "index.sqlite"))
+    set_git_backend(backend)
+    try:
+        for all_branches in (False, True):
+            branch = index.sync(repo, all_branches)
+            for author in authors:
+                expected = _commit_rows(reference.iter_commits(repo, start_date, end_date, author, all_branches,
+                                                               branch=branch))
+                if expected != _commit_rows(index.query(repo, start_date, end_date, author, all_branches)):
+                    labels.append(f"index query all={all_branches} author={author!r}")
+    finally:
+        set_git_backend(SubprocessBackend())
+        index.close()
+        shutil.rmtree(index_dir, ignore_errors=True)
+    return labels
+
+
+def _git_version():
+    try:
+        return subprocess.check_output(['git', '--version']).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Git 提交日志提取工具性能基准测试（离线、合成工作区）")
+    parser.add_argument('--repos', type=int, default=50, help="仓库数量 (默认 50)")
+    parser.add_argument('--commits', type=int, default=100, help="每个仓库 main 分支的提交数 (默认 100)")
+    parser.add_argument('--branches', type=int, default=2, help="每个仓库额外的分支数 (默认 2)")
+    parser.add_argument('--branch-commits', type=int, default=20, help="每个分支的提交数 (默认 20)")
+    parser.add_argument('--depth', type=int, default=2, help="仓库所在目录深度 (默认 2)")
+    parser.add_argument('--noise', type=int, default=20, help="每个分组下 node_modules/dist 的包数量 (默认 20)")
+    parser.add_argument('--days', type=int, default=7, help="提交时间分布的天数 (默认 7)")
+    parser.add_argument('--repeat', type=int, default=3, help="每个阶段重复次数 (默认 3)")
+    parser.add_argument('--workers', type=int, default=None, help="并行线程数 (默认与工具相同)")
+    parser.add_argument('--workspace', help="使用/生成到指定目录；已存在仓库时直接复用")
+    parser.add_argument('--keep', action='store_true', help="保留生成的临时工作区")
+    parser.add_argument('--output', help="将 JSON 结果写入文件（默认输出到标准输出）")
+    parser.add_argument('--check-backends', action='store_true',
+                        help="不统计耗时，只校验进程内 git 后端与 git 命令行的结果是否一致")
+    args = parser.parse_args()
+
+    workspace = args.workspace or tempfile.mkdtemp(prefix="git_commit_bench_")
+    created = not args.workspace or not os.path.isdir(workspace) or not os.listdir(workspace)
+    try:
+        generate_seconds = None
+        if created:
+            os.makedirs(workspace, exist_ok=True)
+            print(f"🏗️ 正在生成合成工作区: {workspace}", file=sys.stderr)
+            start = time.perf_counter()
+            generate_workspace(workspace, args.repos, args.commits, args.branches, args.branch_commits,
+                               args.depth, args.noise, args.days)
+            generate_seconds = round(time.perf_counter() - start, 3)
+
+        today = datetime.date.today()
+        start_date = (today - datetime.timedelta(days=args.days)).strftime('%Y-%m-%d')
+        end_date = today.strftime('%Y-%m-%d')
+
+        if args.check_backends:
+            if pygit2 is None:
+                print("⚠️ 未安装 pygit2，没有可校验的进程内后端", file=sys.stderr)
+            generate_edge_cases(workspace, args.days)
+            mismatches = check_backends(workspace, start_date, end_date)
+            for mismatch in mismatches:
+                print(f"❌ {mismatch}")
+            if mismatches:
+                sys.exit(1)
+            print("✅ 各后端结果一致", file=sys.stderr)
+            return
+
+        print("⏱️ 正在运行基准测试...", file=sys.stderr)
+        result = run_benchmark(workspace, start_date, end_date, max(1, args.repeat), args.workers)
+        result['parameters'] = {
+            'repos': args.repos, 'commits': args.commits, 'branches': args.branches,
+            'branch_commits': args.branch_commits, 'depth': args.depth, 'noise': args.noise,
+            'days': args.days, 'repeat': args.repeat, 'workers': args.workers,
+            'start_date': start_date, 'end_date': end_date,
+        }
+        result['environment'] = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'git': _git_version(),
+            'cpu_count': os.cpu_count(),
+            'generate_seconds': generate_seconds,
+        }
+
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            print(f"✅ 结果已保存: {args.output}", file=sys.stderr)
+        else:
+            print(output)
+    finally:
+        if created and not args.keep and not args.workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -45,7 +45,7 @@ def demo_current_repo():
     print(f"📅 查询日期范围: {week_ago} 到 {today}")
     
     try:
-        commits, messages = get_git_commits(
+        commits = get_git_commits(
             repo_path=os.getcwd(),
             start_date=week_ago,
             end_date=today,
@@ -59,13 +59,13 @@ def demo_current_repo():
             
             # 显示前3个提交的摘要
             print("\n📋 提交摘要（最多显示3个）:")
-            for i, (repo_path, message) in enumerate(messages[:3], 1):
-                print(f"  {i}. {message[:80]}...")
+            for i, commit in enumerate(commits[:3], 1):
+                print(f"  {i}. {commit.message[:80]}...")
             
             # 保存到演示文件
             demo_output = f"demo_commits_{today}.txt"
             save_commits_to_file(
-                commits, messages, demo_output,
+                commits, demo_output,
                 detailed_output=True,
                 project_names={"git-commit-log-tool(*)": "摸鱼神器-"},
                 show_project_and_branch=True
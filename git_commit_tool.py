@@ -1,9 +1,687 @@
 import os
 import datetime
+import sys
 import subprocess
 import yaml  # 用来读取 YAML 配置文件
 import re
 import shutil
+import fnmatch
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+import threading
+import asyncio
+import contextlib
+import signal
+import tempfile
+import csv
+import sqlite3
+import heapq
+import itertools
+
+try:
+    import pygit2  # 可选依赖：进程内 git 后端
+except ImportError:
+    pygit2 = None
+
+# 并行提取时的默认线程数：耗时主要在等待 git 子进程，因此线程数可以高于 CPU 核数
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# 同步（pull/fetch）阶段的默认并发数和单个仓库的超时时间（秒）；网络操作并发过高容易被远端限流
+DEFAULT_SYNC_WORKERS = 4
+DEFAULT_SYNC_TIMEOUT = 120
+SYNC_MODES = ('pull', 'fetch')
+
+# 提取引擎：threads 为线程池，asyncio 为异步子进程（仓库很多时无需每个仓库一个线程）
+EXTRACTION_ENGINES = ('threads', 'asyncio')
+
+# 单个 git 命令（查询分支、引用、git log 等）的默认超时时间（秒），超时后结束子进程
+DEFAULT_GIT_TIMEOUT = 300
+# 读取引用和提交的后端：subprocess 调用 git 命令行；pygit2 在进程内直接读取仓库；auto 在安装了 pygit2 时使用它
+GIT_BACKENDS = ('subprocess', 'pygit2', 'auto')
+# 进程内后端每遍历多少个提交检查一次是否已取消
+BACKEND_CANCEL_CHECK_INTERVAL = 1024
+# 看门狗检查 git 子进程是否超时的间隔（秒）
+_GIT_WATCHDOG_INTERVAL = 0.5
+
+# 性能分析报告中列出的最慢仓库数量；仓库总耗时由以下阶段相加（其余阶段为其细分）
+PROFILE_TOP_REPOS = 20
+PROFILE_REPO_STAGES = ('sync', 'extract')
+
+# 查找仓库时默认跳过的目录：依赖、虚拟环境和构建产物，其中通常不包含需要统计的仓库
+DEFAULT_PRUNE_DIRS = [
+    'node_modules', 'bower_components', '.venv', 'venv', '__pycache__',
+    '.tox', '.mypy_cache', '.pytest_cache', 'target', 'dist', '.gradle',
+    '.idea', '.vscode', '.next', '.nuxt', '*.egg-info',
+]
+
+# 仓库查找索引：记录扫描过的目录及其 mtime，用于下次增量扫描
+REPO_INDEX_FILENAME = '.repo_index.json'
+REPO_INDEX_VERSION = 1
+# mtime 距扫描时刻不足该时长的目录不写入 mtime（文件系统时间精度最粗为 FAT 的 2 秒）
+_MTIME_TRUST_WINDOW_NS = 2 * 10 ** 9
+
+# 提交记录缓存：按引用指向判断仓库是否有变化
+COMMIT_CACHE_FILENAME = '.commit_cache.json'
+COMMIT_CACHE_VERSION = 4
+DEFAULT_COMMIT_CACHE_ENTRIES = 2000
+# 每个仓库最多保留的缓存条数（作者、日期范围不同的查询各占一条）
+DEFAULT_COMMIT_CACHE_ENTRIES_PER_REPO = 20
+# 超过该时长（秒）未使用的缓存在保存时删除
+DEFAULT_COMMIT_CACHE_MAX_AGE = 30 * 86400
+# 命中缓存时，上次使用时间早于该时长（秒）才更新并标记需要保存，避免每次运行都重写整个文件
+_COMMIT_CACHE_TOUCH_INTERVAL = 86400
+# 提交索引：SQLite 数据库，保存各仓库全部提交的元数据，结构变化时递增版本号并重建
+COMMIT_INDEX_FILENAME = '.commit_index.sqlite'
+COMMIT_INDEX_VERSION = 3
+# 写入索引时每批插入的提交数（每批一个事务）
+COMMIT_INDEX_BATCH_SIZE = 2000
+
+# 增量获取时逐个检查被更新的引用是否为快进，超过该数量时直接完整获取
+MAX_INCREMENTAL_REF_CHECKS = 16
+# 通过常驻的 git cat-file 判断祖先关系时最多读取的提交数，超过时改用 git merge-base
+ANCESTRY_WALK_LIMIT = 1000
+
+# 守护模式：默认轮询间隔（秒），每个仓库最多监视的文件和目录数
+DEFAULT_WATCH_INTERVAL = 5
+MAX_WATCH_PATHS = 32
+
+# 报告写入：详细记录的写缓冲大小；汇总部分先写入内存，超过该大小后溢出到临时文件
+REPORT_BUFFER_SIZE = 1024 * 1024
+REPORT_SUMMARY_SPOOL_SIZE = 4 * 1024 * 1024
+
+# 输出格式：txt 为文本报告，其余为便于程序读取的结构化格式；值为文件扩展名
+OUTPUT_FORMATS = {'txt': '.txt', 'jsonl': '.jsonl', 'csv': '.csv', 'sqlite': '.sqlite'}
+# 结构化格式中每条提交包含的字段
+EXPORT_FIELDS = ('repo', 'project', 'project_alias', 'branch', 'hash', 'author', 'timestamp', 'date', 'message',
+                 'type', 'scope', 'breaking', 'tickets')
+
+# 提交信息规范化：识别的约定式提交类型、默认去除的噪音（正则表达式）和工单号格式
+DEFAULT_MESSAGE_TYPES = ('feat', 'fix', 'refactor', 'chore', 'docs', 'style', 'test', 'perf', 'ci', 'build', 'revert')
+DEFAULT_MESSAGE_NOISE = (re.escape("['']"), '"')
+# 工单号：JIRA 风格的 ABC-123（前面不能紧接字母、数字或 '-'）和 GitHub 风格的 #123
+DEFAULT_TICKET_PATTERN = r'[A-Z](?<![\w-][A-Z])[A-Z0-9]+-\d+\b|#\d+\b'
+# 写入报告时每批规范化的提交数（批内重复的提交信息只处理一次）
+MESSAGE_NORMALIZE_BATCH_SIZE = 1000
+
+# git log 输出格式：哈希、作者、时间戳、时区、完整提交信息，每个字段以 NUL 结尾
+GIT_LOG_PRETTY_FORMAT = '--pretty=format:%H%x00%an%x00%at%x00%ad%x00%B%x00'
+GIT_LOG_FIELD_COUNT = 5
+GIT_LOG_READ_SIZE = 64 * 1024
+# 团队模式的 git log 输出格式：另外包含作者邮箱，以及按 .mailmap 映射后的作者名和邮箱
+GIT_TEAM_PRETTY_FORMAT = '--pretty=format:%H%x00%an%x00%ae%x00%aN%x00%aE%x00%at%x00%ad%x00%B%x00'
+GIT_TEAM_FIELD_COUNT = 8
+# 建立索引时的 git log 输出格式：另外包含作者邮箱、.mailmap 映射后的作者名和邮箱以及提交者时间戳
+# （日期范围按提交者时间筛选，与 --since/--until 一致）
+GIT_INDEX_PRETTY_FORMAT = '--pretty=format:%H%x00%an%x00%ae%x00%aN%x00%aE%x00%at%x00%ad%x00%ct%x00%B%x00'
+GIT_INDEX_FIELD_COUNT = 9
+
+
+class RunProfiler:
+    """
+    记录一次运行中各阶段、各仓库的耗时，以及启动的 git 子进程数和从 git 读取的字节数。
+
+    作为 RunControl 的 profiler 传给提取函数（查找仓库、写报告时直接传入）后，各函数会自动上报；
+    可在多个线程中同时使用。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.repos = {}
+        self.counters = {}
+
+    def _repo_entry(self, repo):
+        entry = self.repos.get(repo)
+        if entry is None:
+            entry = self.repos[repo] = {'stages': {}, 'spawns': 0, 'bytes_read': 0}
+        return entry
+
+    def add_time(self, stage, seconds, repo=None):
+        with self._lock:
+            total = self.stages.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+            if repo is not None:
+                repo_stages = self._repo_entry(repo)['stages']
+                repo_stages[stage] = repo_stages.get(stage, 0.0) + seconds
+
+    def add_git_spawn(self, repo=None):
+        self.count('git_spawns', repo=repo, field='spawns')
+
+    def add_bytes_read(self, nbytes, repo=None):
+        self.count('git_bytes_read', nbytes, repo=repo, field='bytes_read')
+
+    def count(self, name, amount=1, repo=None, field=None):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            if repo is not None and field is not None:
+                self._repo_entry(repo)[field] += amount
+
+    def report(self, top=PROFILE_TOP_REPOS):
+        """
+        生成报告字典。
+
+        仓库耗时为 PROFILE_REPO_STAGES 中各阶段之和，其余阶段（branch、git_log、parse 等）是其中的细分。
+        """
+        with self._lock:
+            repos = []
+            for repo, entry in self.repos.items():
+                seconds = sum(entry['stages'].get(stage, 0.0) for stage in PROFILE_REPO_STAGES)
+                repos.append({
+                    'repo': repo,
+                    'seconds': round(seconds, 4),
+                    'stages': {name: round(value, 4) for name, value in sorted(entry['stages'].items())},
+                    'spawns': entry['spawns'],
+                    'bytes_read': entry['bytes_read'],
+                })
+            repos.sort(key=lambda item: item['seconds'], reverse=True)
+            return {
+                'total_seconds': round(time.perf_counter() - self.started, 4),
+                'stages': {name: {'seconds': round(value[0], 4), 'count': value[1]}
+                           for name, value in self.stages.items()},
+                'counters': dict(self.counters),
+                'repo_count': len(repos),
+                'slowest_repos': repos[:top],
+            }
+
+    def format_text(self, top=PROFILE_TOP_REPOS):
+        """生成便于阅读的文本报告"""
+        report = self.report(top)
+        counters = report['counters']
+        lines = [
+            f"Total: {report['total_seconds']:.3f}s, repositories: {report['repo_count']}, "
+            f"git processes: {counters.get('git_spawns', 0)}, "
+            f"bytes read from git: {counters.get('git_bytes_read', 0)}",
+            '',
+            'Stages (seconds are summed across threads):',
+        ]
+        for name, value in sorted(report['stages'].items(), key=lambda item: item[1]['seconds'], reverse=True):
+            lines.append(f"  {name:<12} {value['seconds']:>10.3f}s  x{value['count']}")
+        other = {name: value for name, value in counters.items() if name not in ('git_spawns', 'git_bytes_read')}
+        if other:
+            lines.append('')
+            lines.append('Counters: ' + ', '.join(f"{name}={value}" for name, value in sorted(other.items())))
+        lines.append('')
+        lines.append(f"Slowest {len(report['slowest_repos'])} repositories:")
+        for item in report['slowest_repos']:
+            breakdown = ', '.join(f"{name}={value:.3f}s" for name, value in item['stages'].items())
+            lines.append(f"  {item['seconds']:>8.3f}s  {item['repo']}  "
+                         f"[{breakdown}; spawns={item['spawns']}, bytes={item['bytes_read']}]")
+        return '\n'.join(lines) + '\n'
+
+    def save(self, output_prefix, top=PROFILE_TOP_REPOS):
+        """
+        保存报告为 <output_prefix>.json 和 <output_prefix>.txt。
+
+        :return: (json 文件路径, 文本文件路径)
+        """
+        json_file = output_prefix + '.json'
+        text_file = output_prefix + '.txt'
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(self.report(top), f, ensure_ascii=False, indent=2)
+        with open(text_file, 'w', encoding='utf-8') as f:
+            f.write(self.format_text(top))
+        return json_file, text_file
+
+
+@contextlib.contextmanager
+def profile_stage(profiler, stage, repo=None):
+    """统计代码块耗时；profiler 为 None（未启用性能分析）时几乎没有开销"""
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.add_time(stage, time.perf_counter() - start, repo)
+
+
+def _count(profiler, name, amount=1):
+    """累加性能分析计数器（如缓存命中次数）"""
+    if profiler is not None:
+        profiler.count(name, amount)
+
+
+def _profiler_of(control):
+    """本次运行的性能分析器；未传入 RunControl 或未启用性能分析时为 None"""
+    return control.profiler if control is not None else None
+
+
+class ExtractionCancelled(Exception):
+    """提取过程被取消"""
+
+
+class RunControl:
+    """
+    控制一次提取运行：可在任意线程中取消，并限制每个 git 命令的执行时间。
+
+    传给 extract_commits_from_repos 等函数后，由它们一路传给每个 git 调用；超时的仓库记录在 timed_out 中，
+    git 执行失败的仓库记录在 failed 中，由调用方在运行结束后统一报告，不会中断其他仓库的提取。
+    每个 RunControl 只记录和结束自己启动的 git 子进程，同一进程中的多个运行（如查询服务的并发请求）互不影响。
+    """
+
+    def __init__(self, git_timeout=DEFAULT_GIT_TIMEOUT, profiler=None):
+        """
+        :param git_timeout: 单个 git 命令的超时时间（秒），为 None 或 0 时不限制
+        :param profiler: 可选的 RunProfiler，本次运行的各阶段耗时、git 子进程数等上报给它
+        """
+        self.git_timeout = git_timeout or None
+        self.profiler = profiler
+        self.timed_out = []
+        self.failed = []
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = _GitProcessTracker(self)
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """取消运行并结束本次运行中正在运行的 git 子进程"""
+        self._event.set()
+        self._processes.kill_all()
+
+    def check(self):
+        """已取消时抛出 ExtractionCancelled"""
+        if self._event.is_set():
+            raise ExtractionCancelled()
+
+    def wait(self, timeout):
+        """等待至多 timeout 秒，期间被取消时立即返回；返回是否已取消"""
+        return self._event.wait(timeout)
+
+    def add_timeout(self, repo_path, error):
+        with self._lock:
+            self.timed_out.append((repo_path, error))
+
+    def add_failure(self, repo_path, error):
+        with self._lock:
+            self.failed.append((repo_path, error))
+
+    def clear_timeouts(self):
+        """清空超时和失败记录（同一个 RunControl 用于多轮提取时，每轮开始前调用）"""
+        with self._lock:
+            self.timed_out = []
+            self.failed = []
+
+
+def _record_timeout(control, repo_path, error):
+    """把超时的仓库记录到 control（可以为 None），运行结束后统一报告"""
+    if control is not None:
+        control.add_timeout(repo_path, error)
+
+
+def _record_failure(control, repo_path, error):
+    """把 git 执行失败的仓库记录到 control（可以为 None）"""
+    if control is not None:
+        control.add_failure(repo_path, str(error))
+
+
+def _non_interactive_git_env():
+    """
+    生成执行 git 时使用的环境变量：禁止终端和凭据管理器弹出提示，
+    需要认证的远端直接失败而不是一直等待输入。
+    """
+    env = dict(os.environ)
+    env['GIT_TERMINAL_PROMPT'] = '0'
+    env['GCM_INTERACTIVE'] = 'never'
+    # GIT_ASKPASS 为空字符串时 git 不再尝试 SSH_ASKPASS 等图形化提示程序
+    env['GIT_ASKPASS'] = ''
+    env['SSH_ASKPASS'] = ''
+    if 'GIT_SSH_COMMAND' not in env and 'GIT_SSH' not in env:
+        env['GIT_SSH_COMMAND'] = 'ssh -o BatchMode=yes'
+    return env
+
+
+GIT_ENV = _non_interactive_git_env()
+# POSIX 上每个 git 进程单独成组，结束时连同 ssh、git-remote-https 等子进程一起结束
+_GIT_POPEN_KWARGS = {'env': GIT_ENV, 'start_new_session': os.name == 'posix'}
+
+
+def _kill_process_tree(process):
+    """结束 git 进程及其启动的子进程；process 可以是 subprocess.Popen 或 asyncio 的 Process"""
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            process.kill()
+    except OSError:
+        pass
+
+
+class _GitProcessTracker:
+    """
+    记录一次运行（RunControl）中正在运行的 git 子进程。
+
+    有期限的进程由一个看门狗线程统一检查，超时后结束；RunControl.cancel() 时结束该运行的全部进程。
+    """
+
+    def __init__(self, control=None):
+        self._control = control
+        self._lock = threading.Lock()
+        self._processes = {}
+        self._watchdog = None
+
+    def register(self, process, timeout):
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._processes[process] = [deadline, None]
+            if deadline is not None and self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name='git-watchdog', daemon=True)
+                self._watchdog.start()
+        if self._control is not None and self._control.cancelled:
+            self._stop(process, 'cancelled')
+
+    def set_deadline(self, process, timeout):
+        """为常驻进程的一次请求设置期限（timeout 为 None 时取消期限）"""
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            entry = self._processes.get(process)
+            if entry is None:
+                return
+            entry[0] = deadline
+            if deadline is not None and self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name='git-watchdog', daemon=True)
+                self._watchdog.start()
+
+    def unregister(self, process):
+        """
+        :return: 进程被结束的原因：'timeout'、'cancelled'，正常结束时为 None
+        """
+        with self._lock:
+            entry = self._processes.pop(process, None)
+        return entry[1] if entry else None
+
+    def kill_all(self):
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            self._stop(process, 'cancelled')
+
+    def _stop(self, process, reason):
+        with self._lock:
+            entry = self._processes.get(process)
+            if entry is None or entry[1] is not None:
+                return
+            entry[1] = reason
+        _kill_process_tree(process)
+
+    def _watch(self):
+        while True:
+            time.sleep(_GIT_WATCHDOG_INTERVAL)
+            now = time.monotonic()
+            with self._lock:
+                if not any(deadline is not None for deadline, _ in self._processes.values()):
+                    self._watchdog = None
+                    return
+                expired = [process for process, (deadline, reason) in self._processes.items()
+                           if deadline is not None and deadline <= now and reason is None]
+            for process in expired:
+                self._stop(process, 'timeout')
+
+
+# 不属于任何运行（未传入 RunControl）的 git 子进程，只用于执行超时，不会被取消
+_untracked_processes = _GitProcessTracker()
+
+
+def _process_tracker(control):
+    return control._processes if control is not None else _untracked_processes
+
+
+def _git_timeout(control, timeout=None):
+    """未指定超时时间时使用 control 的 git_timeout（control 为 None 时不限时）"""
+    if timeout is not None:
+        return timeout
+    return control.git_timeout if control is not None else None
+
+
+def _raise_if_stopped(reason, command, timeout):
+    """git 进程被看门狗或取消操作结束时抛出对应的异常"""
+    if reason == 'cancelled':
+        raise ExtractionCancelled()
+    if reason == 'timeout':
+        raise subprocess.TimeoutExpired(command, timeout)
+
+
+def _run_git(repo_path, args, input=None, timeout=None, check=False, control=None):
+    """
+    在 repo_path 中以非交互方式执行 git 命令并捕获输出，同时上报子进程数和读取的字节数。
+
+    :param timeout: 超时时间（秒），为 None 时使用 control 的 git_timeout
+    :param control: 本次运行的 RunControl，为 None 时不限时、不可取消
+    :return: subprocess.CompletedProcess（stdout/stderr 为 bytes）
+    :raises subprocess.TimeoutExpired: 超时（子进程已被结束）
+    :raises ExtractionCancelled: 运行被取消
+    """
+    profiler = _profiler_of(control)
+    if profiler is not None:
+        profiler.add_git_spawn(repo_path)
+    command = ['git'] + list(args)
+    timeout = _git_timeout(control, timeout)
+    tracker = _process_tracker(control)
+    process = subprocess.Popen(command, cwd=repo_path,
+                               stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, **_GIT_POPEN_KWARGS)
+    tracker.register(process, timeout)
+    try:
+        stdout, stderr = process.communicate(input)
+    except BaseException:
+        _kill_process_tree(process)
+        process.wait()
+        raise
+    finally:
+        reason = tracker.unregister(process)
+    _raise_if_stopped(reason, command, timeout)
+
+    if profiler is not None:
+        profiler.add_bytes_read(len(stdout), repo_path)
+    result = subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+    if check:
+        result.check_returncode()
+    return result
+
+
+class _BatchProcess:
+    """
+    一个常驻的 git 辅助进程（如 git cat-file --batch）。
+
+    每次请求写入一行，再由调用方按该命令的格式读取响应；请求期间受 timeout 限制，
+    control.cancel() 时与该运行的其他 git 进程一起被结束。
+    """
+
+    def __init__(self, repo_path, args, control=None):
+        self.command = ['git'] + list(args)
+        self.control = control
+        self._tracker = _process_tracker(control)
+        profiler = _profiler_of(control)
+        if profiler is not None:
+            profiler.add_git_spawn(repo_path)
+        self.process = subprocess.Popen(self.command, cwd=repo_path, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **_GIT_POPEN_KWARGS)
+        # 空闲时不限时，只在请求期间设置期限
+        self._tracker.register(self.process, None)
+
+    def request(self, line, read_response, timeout=None):
+        """
+        写入一行请求并读取响应。
+
+        :param line: 请求内容（bytes，不含换行）
+        :param read_response: 从标准输出读取一条响应的函数，读到 EOF 时应抛出 EOFError
+        :raises subprocess.CalledProcessError: 进程意外退出
+        :raises subprocess.TimeoutExpired: 请求超时（进程已被结束）
+        :raises ExtractionCancelled: 运行被取消
+        """
+        timeout = _git_timeout(self.control, timeout)
+        self._tracker.set_deadline(self.process, timeout)
+        try:
+            self.process.stdin.write(line + b'\n')
+            self.process.stdin.flush()
+            return read_response(self.process.stdout)
+        except (OSError, ValueError, EOFError):
+            _raise_if_stopped(self._tracker.unregister(self.process), self.command, timeout)
+            raise subprocess.CalledProcessError(self.process.poll() or -1, self.command)
+        finally:
+            self._tracker.set_deadline(self.process, None)
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        """关闭标准输入让进程自行退出，超过 1 秒仍未退出时结束进程"""
+        self._tracker.unregister(self.process)
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            _kill_process_tree(self.process)
+            self.process.wait()
+        self.process.stdout.close()
+
+
+def _read_line(stream):
+    line = stream.readline()
+    if not line.endswith(b'\n'):
+        raise EOFError()
+    return line[:-1]
+
+
+def _read_object_header(stream):
+    """解析 cat-file 的响应头 '<sha> <type> <size>'；对象不存在时返回 None"""
+    parts = _read_line(stream).split(b' ')
+    if len(parts) != 3:
+        # '<名称> missing' 或 '<名称> ambiguous'
+        return None
+    return parts[0].decode('ascii'), parts[1].decode('ascii'), int(parts[2])
+
+
+def _read_object(stream):
+    header = _read_object_header(stream)
+    if header is None:
+        return None
+    sha, object_type, size = header
+    data = stream.read(size + 1)
+    if len(data) != size + 1:
+        raise EOFError()
+    return sha, object_type, data[:size]
+
+
+class GitHelpers:
+    """
+    单个仓库的常驻 git 辅助进程池，用于沿父提交判断祖先关系等需要大量读取提交的场景。
+
+    git cat-file --batch 在第一次使用时启动，之后的查询都复用同一个进程，
+    成千上万次查询只需每个仓库启动一次进程。可在多个线程中共享（同一进程的请求依次执行）。
+    通常通过 git_helpers(repo_path) 上下文管理器使用，退出时关闭所有辅助进程。
+    """
+
+    def __init__(self, repo_path, control=None):
+        self.repo_path = repo_path
+        self.control = control
+        self._lock = threading.Lock()
+        self._processes = {}
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _request(self, args, line, read_response):
+        if '\n' in line:
+            raise ValueError(f"对象名不能包含换行: {line!r}")
+        with self._lock:
+            if self._closed:
+                raise ValueError("GitHelpers 已关闭")
+            key = tuple(args)
+            helper = self._processes.get(key)
+            if helper is None or not helper.alive:
+                helper = self._processes[key] = _BatchProcess(self.repo_path, args, self.control)
+            try:
+                return helper.request(line.encode('utf-8'), read_response)
+            except BaseException:
+                # 进程状态未知（可能只读取了一半的响应），下次使用时重新启动
+                del self._processes[key]
+                helper.close()
+                raise
+
+    def commit_parents(self, name):
+        """返回提交的父提交哈希列表；不是提交或不存在时返回 None"""
+        result = self._request(['cat-file', '--batch'], name, _read_object)
+        if result is None or result[1] != 'commit':
+            return None
+        parents = []
+        for line in result[2].split(b'\n'):
+            if not line:
+                # 头部结束
+                break
+            if line.startswith(b'parent '):
+                parents.append(line[7:].decode('ascii'))
+        return parents
+
+    def is_ancestor(self, ancestor, descendant, max_commits=ANCESTRY_WALK_LIMIT):
+        """
+        从 descendant 沿父提交向上查找 ancestor（最多读取 max_commits 个提交）。
+
+        :return: True / False；超过读取上限仍无法判断时返回 None
+        """
+        # 与 merge-base --is-ancestor 相同，ancestor 不是已有的提交时为 False（只使用 --batch 一个进程）
+        if self.commit_parents(ancestor) is None:
+            return False
+        if ancestor == descendant:
+            return True
+        pending = [descendant]
+        seen = {descendant}
+        while pending:
+            if len(seen) > max_commits:
+                return None
+            parents = self.commit_parents(pending.pop())
+            if parents is None:
+                return None
+            for parent in parents:
+                if parent == ancestor:
+                    return True
+                if parent not in seen:
+                    seen.add(parent)
+                    pending.append(parent)
+        return False
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            helpers = list(self._processes.values())
+            self._processes.clear()
+        for helper in helpers:
+            helper.close()
+
+
+@contextlib.contextmanager
+def git_helpers(repo_path, control=None):
+    """
+    在 with 块内提供仓库的常驻 git 辅助进程（GitHelpers），退出时关闭所有辅助进程：
+
+        with git_helpers(repo_path, control) as helpers:
+            helpers.is_ancestor(old_sha, new_sha)
+    """
+    helpers = GitHelpers(repo_path, control)
+    try:
+        yield helpers
+    finally:
+        helpers.close()
+
 
 def load_config(config_file="config.yaml"):
     """
@@ -40,6 +718,14 @@ def load_config(config_file="config.yaml"):
                 'show_project_and_branch': True,
                 'pull_latest_code': False,
                 'extract_all_branches': False,
+                'sync_mode': 'pull',
+                'sync_workers': DEFAULT_SYNC_WORKERS,
+                'sync_timeout': DEFAULT_SYNC_TIMEOUT,
+                'max_workers': DEFAULT_MAX_WORKERS,
+                'extraction_engine': 'threads',
+                'prune_directories': DEFAULT_PRUNE_DIRS,
+                'use_repo_index': True,
+                'use_commit_cache': True,
                 'project_names': {}
             }
     
@@ -51,158 +737,2898 @@ def load_config(config_file="config.yaml"):
         return {}
 
 
-def find_git_repos(root_dir, max_depth=None):
+def compile_prune_matcher(prune_dirs=None):
+    """
+    将需要跳过的目录名/通配符列表编译为匹配函数。
+
+    :param prune_dirs: 目录名或 glob 通配符列表（如 'node_modules'、'*.egg-info'），
+                       为 None 时使用 DEFAULT_PRUNE_DIRS，为空列表时不跳过任何目录
+    :return: 函数 is_pruned(name) -> bool
+    """
+    if prune_dirs is None:
+        prune_dirs = DEFAULT_PRUNE_DIRS
+
+    # 普通目录名放入集合做 O(1) 查找，含通配符的模式合并为一个正则
+    names = set()
+    globs = []
+    for pattern in prune_dirs:
+        pattern = os.path.normcase(str(pattern).strip())
+        if not pattern:
+            continue
+        if any(ch in pattern for ch in '*?['):
+            globs.append(fnmatch.translate(pattern))
+        else:
+            names.add(pattern)
+    glob_re = re.compile('|'.join(globs)) if globs else None
+
+    def is_pruned(name):
+        name = os.path.normcase(name)
+        if name in names:
+            return True
+        return glob_re is not None and glob_re.match(name) is not None
+
+    return is_pruned
+
+
+def _scan_directory(path, is_pruned):
+    """
+    扫描单个目录。
+
+    :return: (is_repo, subdirs)。目录中存在 .git（目录或文件）时视为仓库，不再返回子目录
+    """
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name == '.git':
+                    # .git 目录是普通仓库，.git 文件则是 worktree 或子模块
+                    return True, []
+                try:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                except OSError:
+                    continue
+                if not is_pruned(name):
+                    subdirs.append(entry.path)
+    except OSError:
+        # 无权限或目录在扫描期间被删除
+        return False, []
+    return False, subdirs
+
+
+def _visit_directory(path, is_pruned, cached_dirs=None, record=None):
+    """
+    获取单个目录的扫描结果，必要时复用索引。
+
+    :param cached_dirs: 上次扫描保存的目录索引 {路径: [mtime_ns, is_repo, 子目录列表]}，
+                        目录 mtime 未变化时直接复用其中的结果而不再列目录
+    :param record: 用于记录本次扫描结果的字典，格式同 cached_dirs；为 None 时不使用索引
+    :return: (is_repo, subdirs)
+    """
+    if record is None:
+        return _scan_directory(path, is_pruned)
+
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return False, []
+
+    cached = cached_dirs.get(path) if cached_dirs else None
+    if cached is not None and cached[0] == mtime_ns:
+        # 目录的增删会更新其 mtime，mtime 不变说明子目录列表和 .git 是否存在均未变化
+        _, is_repo, subdirs = cached
+    else:
+        is_repo, subdirs = _scan_directory(path, is_pruned)
+
+    # 刚修改过的目录在同一时间精度内可能还会变化，不记录其 mtime，下次强制重新扫描
+    trusted = time.time_ns() - mtime_ns > _MTIME_TRUST_WINDOW_NS
+    record[path] = [mtime_ns if trusted else None, is_repo, subdirs]
+    return is_repo, subdirs
+
+
+def _walk_subtree(path, depth, max_depth, is_pruned, cached_dirs=None, record=None):
+    """从 path（深度为 depth）开始迭代地深度优先遍历，返回找到的仓库列表"""
+    repos = []
+    stack = [(path, depth)]
+    while stack:
+        current, current_depth = stack.pop()
+        is_repo, subdirs = _visit_directory(current, is_pruned, cached_dirs, record)
+        if is_repo:
+            repos.append(current)
+            continue
+        # 深度随遍历逐层递增，无需对每个目录计算相对路径
+        if max_depth is None or current_depth < max_depth:
+            stack.extend((subdir, current_depth + 1) for subdir in subdirs)
+    return repos
+
+
+def get_repo_index_path(config_file="config.yaml"):
+    """返回仓库查找索引文件的路径（与配置文件位于同一目录）"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), REPO_INDEX_FILENAME)
+
+
+def _repo_index_key(root_dir, max_depth, prune_dirs):
+    """索引按 (根目录, 最大深度, 跳过列表) 区分，任一项变化都不复用旧索引"""
+    if prune_dirs is None:
+        prune_dirs = DEFAULT_PRUNE_DIRS
+    return json.dumps([os.path.abspath(root_dir), max_depth, sorted(str(p) for p in prune_dirs)], ensure_ascii=False)
+
+
+def _load_repo_index(index_file):
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == REPO_INDEX_VERSION and isinstance(index.get('roots'), dict):
+            return index
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {'version': REPO_INDEX_VERSION, 'roots': {}}
+
+
+def _write_json_atomic(path, data):
+    """先写临时文件再替换，避免中途退出留下损坏的文件"""
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_file, path)
+    except OSError as e:
+        print(f"⚠️ 保存 {path} 失败: {e}")
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def find_git_repos(root_dir, max_depth=None, prune_dirs=None, max_workers=None,
+                   index_file=None, force_rescan=False, profiler=None):
     """
     递归查找 root_dir 下的所有 git 仓库。
-    :param root_dir: 搜索的根目录
-    :param max_depth: 最大递归深度，如果为 None 则不限制
-    :return: 包含所有 Git 仓库路径的列表
+
+    根目录的各个子树会在线程池中并行扫描；找到仓库后不再进入其子目录。
+    指定 index_file 时会把扫描过的目录及其 mtime 保存下来，下次只需 stat 各目录，
+    仅重新列出 mtime 发生变化的目录。
+
+    :param root_dir: 搜索的根目录，也可以是多个根目录的列表（各根目录依次扫描，
+                     重叠的根目录、符号链接导致的重复仓库由 dedupe_git_repos 去除）
+    :param max_depth: 最大递归深度（根目录为 0），如果为 None 则不限制
+    :param prune_dirs: 跳过的目录名或通配符列表，为 None 时使用 DEFAULT_PRUNE_DIRS
+    :param max_workers: 并行扫描的线程数，为 None 时使用 DEFAULT_MAX_WORKERS
+    :param index_file: 仓库查找索引文件路径，为 None 时不使用索引
+    :param force_rescan: 为 True 时忽略已有索引，完整重新扫描（并更新索引）
+    :param profiler: 可选的 RunProfiler，记录查找耗时
+    :return: 包含所有 Git 仓库路径的列表（每个根目录内已排序，多个根目录时按根目录的顺序排列）
     """
-    git_repos = []
+    with profile_stage(profiler, 'discovery'):
+        if not isinstance(root_dir, (list, tuple)):
+            return _find_git_repos(root_dir, max_depth, prune_dirs, max_workers, index_file, force_rescan)
 
-    for root, dirs, files in os.walk(root_dir):
-        if max_depth is not None:
-            current_depth = len(os.path.relpath(root, root_dir).split(os.sep))
-            if current_depth > max_depth:
-                dirs[:] = []  # 防止进一步递归
-                continue
+        git_repos = []
+        for root in root_dir:
+            git_repos.extend(_find_git_repos(root, max_depth, prune_dirs, max_workers, index_file, force_rescan))
+        return git_repos
+
+
+def _find_git_repos(root_dir, max_depth, prune_dirs, max_workers, index_file, force_rescan):
+    """find_git_repos 的实现"""
+    is_pruned = compile_prune_matcher(prune_dirs)
+
+    index = None
+    cached_dirs = None
+    record = None
+    if index_file:
+        index = _load_repo_index(index_file)
+        index_key = _repo_index_key(root_dir, max_depth, prune_dirs)
+        if not force_rescan:
+            cached_dirs = index['roots'].get(index_key)
+        record = {}
+
+    # 根目录自身单独处理，其下的各个子树再分发到线程池并行扫描
+    is_repo, subdirs = _visit_directory(root_dir, is_pruned, cached_dirs, record)
+    if is_repo:
+        git_repos = [root_dir]
+    else:
+        git_repos = []
+        if subdirs and (max_depth is None or max_depth >= 1):
+            workers = max(1, min(int(max_workers or DEFAULT_MAX_WORKERS), len(subdirs)))
 
-        if '.git' in dirs:  # 如果找到 .git 目录，认为是 Git 仓库
-            git_repos.append(root)
-            dirs[:] = []  # 防止递归进入子目录
+            def walk(subdir):
+                # 每个子树使用独立的记录字典，结束后在主线程合并
+                sub_record = {} if record is not None else None
+                return _walk_subtree(subdir, 1, max_depth, is_pruned, cached_dirs, sub_record), sub_record
 
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for repos, sub_record in executor.map(walk, subdirs):
+                    git_repos.extend(repos)
+                    if sub_record:
+                        record.update(sub_record)
+
+    if index is not None:
+        index['roots'][index_key] = record
+        _write_json_atomic(index_file, index)
+
+    git_repos.sort()
     return git_repos
-        
-def get_current_branch(repo_path):
-    """获取当前Git分支名称"""
-    try:
-        os.chdir(repo_path)  # 切换到指定的仓库路径
-        return subprocess.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD']).strip().decode('utf-8')
-    except subprocess.CalledProcessError:
-        return "unknown branch"
 
 
-def get_git_commits(repo_path, start_date, end_date, author, pull_latest_code, extract_all_branches):
+def _read_git_dirs(repo_path):
     """
-    获取指定日期、作者的 git 提交记录，并在获取之前拉取最新代码。
+    不启动 git，直接读取仓库的 git 目录和公共目录（worktree 共享主仓库的公共目录）。
 
-    :param repo_path: 仓库路径
-    :param date_str: 日期字符串，格式为 'YYYY-MM-DD'
-    :param author: 作者名
-    :param pull_latest_code: 是否拉取最新代码
-    :param extract_all_branches: 是否提取所有分支的提交记录
-    :return: 提交记录和提交信息列表
+    :return: (git 目录, 公共目录的真实路径)，无法读取时返回 (None, None)
     """
+    git_path = os.path.join(repo_path, '.git')
     try:
-        os.chdir(repo_path)
+        if os.path.isfile(git_path):
+            # worktree / 子模块：.git 文件内容为 'gitdir: <路径>'
+            with open(git_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            if not content.startswith('gitdir:'):
+                return None, None
+            git_dir = os.path.join(repo_path, content[len('gitdir:'):].strip())
+        else:
+            git_dir = git_path
+        common_dir = git_dir
+        commondir_file = os.path.join(git_dir, 'commondir')
+        if os.path.isfile(commondir_file):
+            with open(commondir_file, 'r', encoding='utf-8') as f:
+                common_dir = os.path.join(git_dir, f.read().strip())
+    except (OSError, UnicodeDecodeError):
+        return None, None
+    return git_dir, os.path.realpath(common_dir)
 
-        # 根据配置决定是否拉取最新代码
-        if pull_latest_code:
-            pull_command = ['git', 'pull']
-            subprocess.run(pull_command, check=True)
 
-        commits = []
-        messages = []
+def _head_is_symbolic(git_dir):
+    """HEAD 是否指向某个分支（而不是分离状态）"""
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r', encoding='utf-8') as f:
+            return f.read().startswith('ref:')
+    except (OSError, UnicodeDecodeError):
+        return False
+
 
+def dedupe_git_repos(repos, extract_all_branches):
+    """
+    去除重复的仓库，保留先出现的一个。
+
+    - 真实路径相同（符号链接、重叠的根目录）的仓库只保留一个
+    - 提取所有分支时，同一仓库的多个 worktree 共享全部引用，git log --all 的结果相同，只保留一个；
+      HEAD 处于分离状态的 worktree 其提交不一定在任何引用上，仍然单独提取。
+      只提取当前分支时各 worktree 的 HEAD 不同，都会保留，重复的提交由 CommitDeduplicator 按哈希去除
+    - 不读取 objects/info/alternates：通过 alternates 共享对象库的克隆（git clone --shared / --reference）
+      各自有独立的引用，git log 的结果不同，不能视为重复；它们之间重复的提交同样由 CommitDeduplicator 去除
+
+    :return: (保留的仓库列表, [(跳过的仓库, 与之重复的仓库), ...])
+    """
+    kept = []
+    skipped = []
+    by_realpath = {}
+    by_common_dir = {}
+    for repo in repos:
+        realpath = os.path.realpath(repo)
+        if realpath in by_realpath:
+            skipped.append((repo, by_realpath[realpath]))
+            continue
+        by_realpath[realpath] = repo
         if extract_all_branches:
-            # 获取所有分支的提交记录
-            git_log_command = [
-                'git', 'log',
-                '--all',
-                '--since="{} 00:00:00"'.format(start_date),
-                '--until="{} 23:59:59"'.format(end_date),
-                '--author={}'.format(author),
-                '--pretty=format:Hash: %H%nAuthor: %an%nDate: %ad%nMessage: %B%n',
-                '--date=iso'
-            ]
-        else:
-            # 获取当前分支的提交记录
-            git_log_command = [
-                'git', 'log',
-                '--since="{} 00:00:00"'.format(start_date),
-                '--until="{} 23:59:59"'.format(end_date),
-                '--author={}'.format(author),
-                '--pretty=format:Hash: %H%nAuthor: %an%nDate: %ad%nMessage: %B%n',
-                '--date=iso'
-            ]
-
-
-        result = subprocess.run(git_log_command, capture_output=True, text=True, check=True, encoding='utf-8')
-
-        if result.stdout:
-            for commit in result.stdout.strip().split('\n\n'):
-                if commit:
-                    cleaned_commit = f"Repository: {repo_path}\n{commit.strip()}"
-                    commits.append(cleaned_commit)
-
-                    message_start = commit.find('Message:')
-                    if message_start != -1:
-                        message = commit[message_start + len('Message:'):].strip()
-                        messages.append((repo_path, message))
-
-        return commits, messages
-    
-    except subprocess.CalledProcessError as e:
-        print(f"Error in {repo_path}: {e}")
-        return [], []
+            git_dir, common_dir = _read_git_dirs(repo)
+            if common_dir is not None:
+                if common_dir in by_common_dir and _head_is_symbolic(git_dir):
+                    skipped.append((repo, by_common_dir[common_dir]))
+                    continue
+                by_common_dir.setdefault(common_dir, repo)
+        kept.append(repo)
+    return kept, skipped
 
 
-def clean_commit_message(message):
+class CommitDeduplicator:
     """
-    去掉 'feat: ', 'fix: ' 等前缀，并处理任何特殊符号。
-    
-    :param message: 原始提交信息
-    :return: 处理后的提交信息
+    在整个运行中按哈希去除重复的提交（同一项目克隆在多个位置、多个 worktree 时同一提交会被多次提取）。
+
+    已见过的哈希以 20 字节的二进制形式保存，比保存 40 个字符的字符串更省内存。可在多个线程中共享。
+    """
+
+    def __init__(self):
+        self._seen = set()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def filter(self, commits):
+        """返回 commits 中第一次出现的提交（保持原有顺序）"""
+        unique = []
+        with self._lock:
+            seen = self._seen
+            for commit in commits:
+                key = bytes.fromhex(commit.hash)
+                if key in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(key)
+                unique.append(commit)
+        return unique
+
+
+def get_current_branch(repo_path, control=None):
+    """获取当前Git分支名称（HEAD 分离时为 'HEAD'，无法获取时为 'unknown branch'）"""
+    with profile_stage(_profiler_of(control), 'branch', repo_path):
+        return _git_backend.current_branch(repo_path, control)
+
+
+def get_ref_tips(repo_path, extract_all_branches, control=None):
+    """
+    获取仓库各引用当前指向的提交，用作提交缓存的指纹。
+
+    :param repo_path: 仓库路径
+    :param extract_all_branches: 为 False 时只关心 HEAD
+    :param control: 本次运行的 RunControl
+    :return: {引用名: 对象哈希}；空仓库返回空字典
     """
-    cleaned_message = re.sub(r'^(feat|fix|refactor|chore|docs|style|test|perf|ci|build|revert):\s*', '', message, flags=re.IGNORECASE)
-    cleaned_message = cleaned_message.replace("['']", "").replace('"', '')
-    return cleaned_message
+    with profile_stage(_profiler_of(control), 'refs', repo_path):
+        return _git_backend.ref_tips(repo_path, extract_all_branches, control)
 
 
-def save_commits_to_file(commits, messages, output_file, detailed_output, project_names, show_project_and_branch):
+class Commit:
     """
-    将所有仓库的 commit 记录保存到指定文件，并在文件末尾汇总所有的提交 message。
-    
-    :param commits: commit 记录列表。
-    :param messages: 所有 commit 的 message 列表（包含 repo 路径信息）。
-    :param output_file: 输出文件路径。
-    :param detailed_output: 布尔值，控制是否输出详细记录。
-    :param project_names: 项目名称映射字典。
-    :param show_project_and_branch: 布尔值，控制是否显示项目名与分支名。
+    单条提交记录。
+
+    使用 __slots__ 减少每个实例的内存占用；仓库路径、分支名和作者在大量提交间重复，
+    因此做了字符串驻留。文本输出只在写文件时按需生成。
     """
+
+    __slots__ = ('hash', 'author', 'timestamp', 'tz_offset', 'message', 'repo', 'branch')
+
+    def __init__(self, hash, author, timestamp, tz_offset, message, repo, branch):
+        """
+        :param hash: 提交哈希
+        :param author: 作者名
+        :param timestamp: 作者时间，Unix 时间戳（整数）
+        :param tz_offset: 作者所在时区相对 UTC 的偏移（分钟）
+        :param message: 完整提交信息
+        :param repo: 仓库路径
+        :param branch: 提取时仓库的当前分支
+        """
+        self.hash = hash
+        self.author = sys.intern(author)
+        self.timestamp = timestamp
+        self.tz_offset = tz_offset
+        self.message = message
+        self.repo = sys.intern(repo)
+        self.branch = sys.intern(branch)
+
+    def __repr__(self):
+        return f"Commit({self.hash[:10]} {self.repo!r} {self.branch!r})"
+
+    @property
+    def date(self):
+        """提交时间，格式同 git log --date=iso，如 '2024-01-15 10:00:00 +0800'"""
+        tz = datetime.timezone(datetime.timedelta(minutes=self.tz_offset))
+        return datetime.datetime.fromtimestamp(self.timestamp, tz).strftime('%Y-%m-%d %H:%M:%S %z')
+
+    def format_detail(self):
+        """生成详细输出中的一条记录"""
+        return (f"Repository: {self.repo}\nHash: {self.hash}\nAuthor: {self.author}\n"
+                f"Date: {self.date}\nMessage: {self.message}")
+
+    def to_list(self):
+        """转换为便于 JSON 序列化的列表（用于缓存）"""
+        return [self.hash, self.author, self.timestamp, self.tz_offset, self.message, self.repo, self.branch]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+def _parse_tz_offset(value):
+    """将 '+0800' 形式的时区转换为分钟偏移"""
     try:
-        output_file = os.path.abspath(output_file)
+        minutes = int(value[1:3]) * 60 + int(value[3:5])
+    except (ValueError, IndexError):
+        return 0
+    return -minutes if value.startswith('-') else minutes
 
-        with open(output_file, 'w', encoding='utf-8') as f:
-            if detailed_output:
-                for commit in commits:
-                    f.write(commit + '\n\n')
-                    f.write('\n' + '='*40 + '\n')
-                    f.write('Summary of all commit messages:\n\n')
-            
-            for entry in messages:
-                if isinstance(entry, tuple) and len(entry) == 2:
-                    repo_path, message = entry
-                    project_name = os.path.basename(repo_path)
-                    cleaned_message = clean_commit_message(message)
-                    current_branch = get_current_branch(repo_path)
-                    
-                    # 首先检查是否有精确匹配的项目名+分支名
-                    custom_project_name = project_names.get(f"{project_name}({current_branch})", "")
-                    
-                    # 如果没有精确匹配，检查是否有通配符匹配
-                    if not custom_project_name:
-                        wildcard_key = f"{project_name}(*)"
-                        custom_project_name = project_names.get(wildcard_key, "")
-
-                    # 生成输出内容
-                    if show_project_and_branch:
-                        output_line = f"{project_name}({current_branch}) - {custom_project_name}{cleaned_message}\n"
-                    else:
-                        output_line = f"{custom_project_name}{cleaned_message}\n"
 
-                    f.write(output_line)
+class AuthorMatcher:
+    """
+    团队模式的作者匹配器。
+
+    每个仓库只执行一次不按作者过滤的 git log，在进程内把每条提交的作者名、邮箱
+    （以及按仓库 .mailmap 映射后的作者名、邮箱）与团队成员及其别名比较，
+    匹配到的提交以成员名作为 Commit.author。比较不区分大小写，每条提交只需几次字典查找。
+    """
+
+    def __init__(self, authors, use_mailmap=True):
+        """
+        :param authors: 成员列表，每项为作者名字符串，或 {'name': 显示名, 'aliases': [作者名或邮箱, ...]}
+        :param use_mailmap: 是否同时按 .mailmap 映射后的作者名和邮箱匹配
+        """
+        self.names = []
+        self.use_mailmap = use_mailmap
+        self._lookup = {}
+        for entry in authors or []:
+            if isinstance(entry, dict):
+                name = entry.get('name')
+                aliases = entry.get('aliases') or []
+            else:
+                name, aliases = entry, []
+            if not name:
+                raise ValueError(f"团队成员缺少作者名: {entry!r}")
+            name = str(name)
+            if name not in self.names:
+                self.names.append(name)
+            for alias in [name] + [str(alias) for alias in aliases]:
+                # 同一别名出现在多个成员下时归属第一个成员
+                self._lookup.setdefault(alias.strip().lower(), name)
+        if not self.names:
+            raise ValueError("团队模式至少需要一个作者")
+        # 用于提交记录缓存的键：成员或别名变化后不会误用旧结果
+        self.key = json.dumps({'authors': sorted(self._lookup.items()), 'mailmap': bool(use_mailmap)},
+                              ensure_ascii=False)
+
+    def __repr__(self):
+        return f"AuthorMatcher({self.names!r})"
+
+    def match(self, name, email, mailmap_name='', mailmap_email=''):
+        """返回匹配到的成员名，不属于任何成员时返回 None"""
+        lookup = self._lookup
+        member = lookup.get(name.lower()) or lookup.get(email.lower())
+        if member is None and self.use_mailmap:
+            member = lookup.get(mailmap_name.lower()) or lookup.get(mailmap_email.lower())
+        return member
+
+
+def _build_git_log_command(start_date, end_date, author, extract_all_branches, read_revisions=False):
+    """
+    构造 git log 命令；read_revisions 为 True 时从标准输入读取要遍历的提交范围。
+    author 为 AuthorMatcher 时不按作者过滤，并额外输出邮箱和 .mailmap 映射后的作者信息。
+    """
+    git_log_command = ['git', 'log']
+    if read_revisions:
+        git_log_command.append('--stdin')
+    elif extract_all_branches:
+        # 获取所有分支的提交记录
+        git_log_command.append('--all')
+    git_log_command.extend([
+        '--since={} 00:00:00'.format(start_date),
+        '--until={} 23:59:59'.format(end_date),
+    ])
+    if isinstance(author, AuthorMatcher):
+        git_log_command.append(GIT_TEAM_PRETTY_FORMAT)
+    else:
+        git_log_command.extend(['--author={}'.format(author), GIT_LOG_PRETTY_FORMAT])
+    # %ad 只输出提交者所在时区（如 +0800），日期由时间戳还原
+    git_log_command.append('--date=format:%z')
+    return git_log_command
+
+
+class _CommitStreamParser:
+    """
+    增量解析 git log 的字节输出。
+
+    每个字段都以 NUL 结尾，而提交信息中不会出现 NUL，因此多段落的提交信息也能被正确切分。
+    """
+
+    def __init__(self, field_count=GIT_LOG_FIELD_COUNT):
+        self._field_count = field_count
+        self._partial = b''
+        self._fields = []
+
+    def feed(self, chunk):
+        """输入一段字节，返回其中已完整的提交记录列表（每项为各字段 bytes 组成的元组）"""
+        parts = (self._partial + chunk).split(b'\0')
+        self._partial = parts.pop()
+        records = []
+        for part in parts:
+            self._fields.append(part)
+            if len(self._fields) == self._field_count:
+                records.append(tuple(self._fields))
+                self._fields = []
+        return records
+
+
+def _decode_record(fields, repo_path, branch):
+    """按需解码一条提交记录；作者和提交信息不是合法 UTF-8 时用替换字符代替，而不是报错"""
+    commit_hash, author, timestamp, tz_offset, message = fields
+    # format: 模式下 git 会在相邻两条记录之间插入换行
+    return Commit(commit_hash.lstrip(b'\n').decode('ascii'),
+                  author.decode('utf-8', errors='replace'),
+                  int(timestamp),
+                  _parse_tz_offset(tz_offset.decode('ascii', errors='replace')),
+                  message.decode('utf-8', errors='replace').strip(),
+                  repo_path,
+                  branch)
+
+
+def _decode_team_record(fields, repo_path, branch, matcher):
+    """团队模式下解码一条提交记录：作者不属于任何成员时返回 None，否则以成员名作为作者"""
+    commit_hash, name, email, mailmap_name, mailmap_email, timestamp, tz_offset, message = fields
+    member = matcher.match(name.decode('utf-8', errors='replace'), email.decode('utf-8', errors='replace'),
+                           mailmap_name.decode('utf-8', errors='replace'),
+                           mailmap_email.decode('utf-8', errors='replace'))
+    if member is None:
+        return None
+    return Commit(commit_hash.lstrip(b'\n').decode('ascii'),
+                  member,
+                  int(timestamp),
+                  _parse_tz_offset(tz_offset.decode('ascii', errors='replace')),
+                  message.decode('utf-8', errors='replace').strip(),
+                  repo_path,
+                  branch)
+
+
+def _commit_decoder(author, repo_path, branch):
+    """返回 (每条记录的字段数, 解码函数)；团队模式下解码函数对非成员的提交返回 None"""
+    if isinstance(author, AuthorMatcher):
+        return GIT_TEAM_FIELD_COUNT, lambda fields: _decode_team_record(fields, repo_path, branch, author)
+    return GIT_LOG_FIELD_COUNT, lambda fields: _decode_record(fields, repo_path, branch)
+
+
+def iter_commits(repo_path, start_date, end_date, author, extract_all_branches=False, revisions=None, branch='',
+                 control=None):
+    """
+    流式读取仓库中指定日期、作者的提交记录。
+
+    直接从 git log 子进程的标准输出按块读取并解析，内存占用与提交数量无关。
+
+    :param repo_path: 仓库路径
+    :param start_date: 开始日期，格式为 'YYYY-MM-DD'
+    :param end_date: 结束日期，格式为 'YYYY-MM-DD'
+    :param author: 作者名；为 AuthorMatcher 时只遍历一次并产出所有团队成员的提交（团队模式）
+    :param extract_all_branches: 是否遍历所有分支
+    :param revisions: 可选的提交范围列表（如 ['<新提交>', '^<旧提交>']），指定时忽略 extract_all_branches
+    :param branch: 记录在每个 Commit 上的分支名
+    :param control: 本次运行的 RunControl，为 None 时不限时、不可取消
+    :return: 生成器，逐个产出 Commit
+    :raises subprocess.CalledProcessError: git log 执行失败
+    :raises subprocess.TimeoutExpired: 超过 control 的 git_timeout
+    :raises GitBackendError: 进程内后端读取仓库失败
+    :raises ExtractionCancelled: 运行被取消
+    """
+    return _git_backend.iter_commits(repo_path, start_date, end_date, author, extract_all_branches, revisions,
+                                     branch, control)
+
+
+def _iter_git_records(repo_path, git_log_command, revisions, field_count, decode, control=None):
+    """
+    执行 git log 并流式解析输出，对每条记录的字段调用 decode 并产出结果。
+
+    :param revisions: 通过标准输入传给 git log --stdin 的提交范围列表，为 None 时不使用标准输入
+    :param field_count: 每条记录的字段数
+    :param decode: 把字段元组转换为结果对象的函数
+    :param control: 本次运行的 RunControl
+    """
+    timeout = _git_timeout(control)
+    profiler = _profiler_of(control)
+    tracker = _process_tracker(control)
+    if profiler is not None:
+        profiler.add_git_spawn(repo_path)
+        # 分别统计等待 git 输出的时间和解析的时间（不含调用方处理每条提交的时间）
+        wait_seconds = parse_seconds = 0.0
+        bytes_read = 0
+    process = subprocess.Popen(git_log_command, cwd=repo_path,
+                               stdin=subprocess.PIPE if revisions is not None else subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, **_GIT_POPEN_KWARGS)
+    tracker.register(process, timeout)
+    try:
+        if revisions is not None:
+            # git log --stdin 会先读完全部输入再开始输出，因此可以一次写入
+            try:
+                process.stdin.write(('\n'.join(revisions) + '\n').encode('utf-8'))
+                process.stdin.close()
+            except BrokenPipeError:
+                # 进程已被结束，原因在下面检查
+                pass
+
+        parser = _CommitStreamParser(field_count)
+        while True:
+            if profiler is None:
+                chunk = process.stdout.read1(GIT_LOG_READ_SIZE)
+                if not chunk:
+                    break
+                for fields in parser.feed(chunk):
+                    yield decode(fields)
+                continue
+
+            start = time.perf_counter()
+            chunk = process.stdout.read1(GIT_LOG_READ_SIZE)
+            parsed = time.perf_counter()
+            wait_seconds += parsed - start
+            if not chunk:
+                break
+            bytes_read += len(chunk)
+            records = [decode(fields) for fields in parser.feed(chunk)]
+            parse_seconds += time.perf_counter() - parsed
+            for commit in records:
+                yield commit
+
+        stderr = process.stderr.read()
+        returncode = process.wait()
+        _raise_if_stopped(tracker.unregister(process), git_log_command, timeout)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, git_log_command, stderr=stderr)
+    finally:
+        tracker.unregister(process)
+        # 调用方提前结束迭代时终止子进程
+        if process.poll() is None:
+            _kill_process_tree(process)
+        process.wait()
+        process.stdout.close()
+        process.stderr.close()
+        if process.stdin is not None:
+            process.stdin.close()
+        if profiler is not None:
+            profiler.add_time('git_log', wait_seconds, repo_path)
+            profiler.add_time('parse', parse_seconds, repo_path)
+            profiler.add_bytes_read(bytes_read, repo_path)
+
+
+def _run_git_log(repo_path, start_date, end_date, author, extract_all_branches, branch, revisions=None,
+                 control=None):
+    """执行 git log 并返回 Commit 列表"""
+    return list(iter_commits(repo_path, start_date, end_date, author, extract_all_branches, revisions, branch,
+                             control))
+
+
+def _incremental_revisions(repo_path, old_tips, new_tips, control=None):
+    """
+    计算从 old_tips 到 new_tips 新增提交的范围（供 git log --stdin 使用）。
+
+    当有引用被删除或被改写（旧指向不再是新指向的祖先）时，之前获取的提交可能已不可达，
+    此时返回 None，由调用方完整重新获取；没有新增提交时返回空列表。
+    """
+    pairs = _changed_ref_pairs(old_tips, new_tips)
+    if pairs is None:
+        return None
+    with profile_stage(_profiler_of(control), 'refs', repo_path):
+        fast_forward = _git_backend.check_ancestry(repo_path, pairs, control)
+    if not fast_forward:
+        return None
+    return _new_revisions(old_tips, new_tips)
+
+
+def _changed_ref_pairs(old_tips, new_tips):
+    """
+    列出指向发生变化的引用，返回需要判断祖先关系的 (旧指向, 新指向) 列表。
+
+    :return: 有引用被删除或变化的引用过多（无法增量获取）时返回 None
+    """
+    changed_refs = [ref for ref, sha in old_tips.items() if new_tips.get(ref) != sha]
+    if any(ref not in new_tips for ref in changed_refs) or len(changed_refs) > MAX_INCREMENTAL_REF_CHECKS:
+        return None
+    return [(old_tips[ref], new_tips[ref]) for ref in changed_refs]
+
+
+def _new_revisions(old_tips, new_tips):
+    """所有变化都是快进时，返回 git log --stdin 使用的新增提交范围；没有新增提交时返回空列表"""
+    old_shas = set(old_tips.values())
+    new_shas = sorted(set(new_tips.values()) - old_shas)
+    if not new_shas:
+        return []
+    return new_shas + ['^' + sha for sha in sorted(old_shas)]
+
+
+def _fetch_new_commits(repo_path, old_tips, new_tips, start_date, end_date, author, extract_all_branches, branch,
+                       control=None):
+    """只获取 old_tips 之后新增的提交；无法增量获取时返回 None（见 _incremental_revisions）"""
+    revisions = _incremental_revisions(repo_path, old_tips, new_tips, control)
+    if not revisions:
+        return revisions
+
+    try:
+        return _run_git_log(repo_path, start_date, end_date, author, extract_all_branches, branch, revisions,
+                            control)
+    except (subprocess.CalledProcessError, GitBackendError):
+        # 例如引用指向的不是提交对象，退回完整获取
+        return None
+
+
+class GitBackendError(Exception):
+    """进程内后端读取仓库失败（如仓库损坏、HEAD 尚无提交），处理方式同 git 命令执行失败"""
+
+
+class GitBackend:
+    """
+    读取仓库引用和提交的后端接口。
+
+    提取、提交缓存和提交索引只通过当前后端查询分支、引用和提交，
+    同步远端代码（pull / fetch）始终使用 git 命令行。各方法可在多个线程中并发调用；
+    control 为本次运行的 RunControl（可以为 None），用于超时和取消。
+    """
+
+    name = ''
+
+    def current_branch(self, repo_path, control=None):
+        """返回当前分支名；HEAD 分离时为 'HEAD'，无法获取时为 'unknown branch'"""
+        raise NotImplementedError
+
+    def ref_tips(self, repo_path, extract_all_branches, control=None):
+        """返回 {引用名: 对象哈希}，格式同 git show-ref --head；extract_all_branches 为 False 时只包含 HEAD"""
+        raise NotImplementedError
+
+    def is_ancestor(self, repo_path, ancestor, descendant, control=None):
+        """ancestor 是否为 descendant 本身或其祖先（同 git merge-base --is-ancestor）"""
+        raise NotImplementedError
+
+    def check_ancestry(self, repo_path, pairs, control=None):
+        """pairs 中的每一对 (ancestor, descendant) 是否都满足 is_ancestor"""
+        return all(self.is_ancestor(repo_path, ancestor, descendant, control) for ancestor, descendant in pairs)
+
+    def iter_commits(self, repo_path, start_date, end_date, author, extract_all_branches=False, revisions=None,
+                     branch='', control=None):
+        """按日期范围和作者逐个产出 Commit，顺序与 git log 相同，参数见 iter_commits"""
+        raise NotImplementedError
+
+    def iter_index_records(self, repo_path, extract_all_branches, revisions=None, control=None):
+        """
+        不限日期和作者，逐个产出建立提交索引用的记录
+        (hash, author, email, mailmap_author, mailmap_email, timestamp, tz_offset, commit_timestamp, message)。
+        """
+        raise NotImplementedError
+
+
+_CURRENT_BRANCH_ARGS = ['rev-parse', '--abbrev-ref', 'HEAD']
+_REF_TIPS_ARGS = ['show-ref', '--head']
+
+
+def _parse_ref_tips(output, extract_all_branches):
+    """解析 git show-ref --head 的输出，返回 {引用名: 对象哈希}"""
+    tips = {}
+    # show-ref 在没有任何引用时返回 1，此时视为空仓库
+    for line in output.decode('utf-8', errors='replace').splitlines():
+        sha, _, ref = line.partition(' ')
+        if ref and (extract_all_branches or ref == 'HEAD'):
+            tips[ref] = sha
+    return tips
+
+
+class SubprocessBackend(GitBackend):
+    """默认后端：每次查询启动一个 git 子进程，受 RunControl 的超时和取消控制"""
+
+    name = 'subprocess'
+
+    def current_branch(self, repo_path, control=None):
+        try:
+            # 通过 cwd 指定仓库路径，而不是 os.chdir 修改进程全局的工作目录，保证多线程下安全
+            result = _run_git(repo_path, _CURRENT_BRANCH_ARGS, check=True, control=control)
+            return result.stdout.strip().decode('utf-8')
+        except (subprocess.CalledProcessError, OSError):
+            return "unknown branch"
+
+    def ref_tips(self, repo_path, extract_all_branches, control=None):
+        result = _run_git(repo_path, _REF_TIPS_ARGS, control=control)
+        return _parse_ref_tips(result.stdout, extract_all_branches)
+
+    def is_ancestor(self, repo_path, ancestor, descendant, control=None):
+        return _run_git(repo_path, ['merge-base', '--is-ancestor', ancestor, descendant],
+                        control=control).returncode == 0
+
+    def check_ancestry(self, repo_path, pairs, control=None):
+        if len(pairs) <= 1:
+            return super().check_ancestry(repo_path, pairs, control)
+        # 多个引用有变化时共用一个常驻的 cat-file 进程，而不是每个引用启动一次 merge-base
+        with git_helpers(repo_path, control) as helpers:
+            for ancestor, descendant in pairs:
+                result = helpers.is_ancestor(ancestor, descendant)
+                if result is None:
+                    result = self.is_ancestor(repo_path, ancestor, descendant, control)
+                if not result:
+                    return False
+        return True
+
+    def iter_commits(self, repo_path, start_date, end_date, author, extract_all_branches=False, revisions=None,
+                     branch='', control=None):
+        git_log_command = _build_git_log_command(start_date, end_date, author, extract_all_branches,
+                                                 read_revisions=revisions is not None)
+        field_count, decode = _commit_decoder(author, repo_path, branch)
+        records = _iter_git_records(repo_path, git_log_command, revisions, field_count, decode, control)
+        if isinstance(author, AuthorMatcher):
+            return (commit for commit in records if commit is not None)
+        return records
+
+    def iter_index_records(self, repo_path, extract_all_branches, revisions=None, control=None):
+        git_log_command = ['git', 'log']
+        if revisions is not None:
+            git_log_command.append('--stdin')
+        elif extract_all_branches:
+            git_log_command.append('--all')
+        git_log_command.extend([GIT_INDEX_PRETTY_FORMAT, '--date=format:%z'])
+        return _iter_git_records(repo_path, git_log_command, revisions, GIT_INDEX_FIELD_COUNT,
+                                 _decode_index_record, control)
+
+
+class Pygit2Backend(GitBackend):
+    """
+    进程内后端：通过 pygit2（libgit2）直接读取引用和对象，不启动子进程。
+
+    Windows 上每启动一个 git 进程要数十毫秒，仓库较多时可明显缩短提取时间。
+    结果与 subprocess 后端一致（可用 benchmark.py --check-backends 在合成仓库上校验）；
+    读取在进程内完成，不受 git_timeout 限制，但会定期检查是否已取消。
+    """
+
+    name = 'pygit2'
+
+    def __init__(self):
+        if pygit2 is None:
+            raise ValueError("进程内 git 后端需要安装 pygit2")
+
+    @staticmethod
+    def _open(repo_path):
+        try:
+            return pygit2.Repository(repo_path)
+        except (pygit2.GitError, KeyError) as e:
+            raise GitBackendError(f"无法打开仓库 {repo_path}: {e}") from e
+
+    def current_branch(self, repo_path, control=None):
+        try:
+            repo = self._open(repo_path)
+            if repo.head_is_unborn:
+                return "unknown branch"
+            if repo.head_is_detached:
+                return 'HEAD'
+            return repo.head.shorthand
+        except (GitBackendError, pygit2.GitError):
+            return "unknown branch"
+
+    def ref_tips(self, repo_path, extract_all_branches, control=None):
+        repo = self._open(repo_path)
+        tips = {}
+        try:
+            if not repo.head_is_unborn:
+                tips['HEAD'] = str(repo.head.target)
+            if extract_all_branches:
+                for name in repo.references:
+                    try:
+                        tips[name] = str(repo.references[name].resolve().target)
+                    except (KeyError, pygit2.GitError):
+                        # 指向不存在引用的符号引用，git show-ref 同样不会列出
+                        continue
+        except pygit2.GitError as e:
+            raise GitBackendError(f"读取引用失败 {repo_path}: {e}") from e
+        return tips
+
+    def is_ancestor(self, repo_path, ancestor, descendant, control=None):
+        try:
+            repo = self._open(repo_path)
+            return ancestor == descendant or repo.descendant_of(descendant, ancestor)
+        except (GitBackendError, pygit2.GitError, KeyError, ValueError):
+            return False
+
+    def _walk(self, repo_path, repo, extract_all_branches, revisions, since=None, control=None):
+        """
+        按与 git log 相同的顺序遍历提交：起点同 HEAD / --all / --stdin，每次取出提交时间最新的提交，
+        时间相同时先加入的先取出。提交时间早于 since 的提交不输出，也不再遍历其父提交（同 --since）。
+        """
+        roots = []
+        hidden = []
+        try:
+            if revisions is not None:
+                for revision in revisions:
+                    if revision.startswith('^'):
+                        hidden.append(repo[revision[1:]].peel(pygit2.Commit).id)
+                    else:
+                        roots.append(repo[revision].peel(pygit2.Commit).id)
+            elif extract_all_branches:
+                # 与 git log --all 相同：先按名称加入所有引用，再加入 HEAD；跳过不指向提交的引用
+                for name in sorted(repo.references):
+                    try:
+                        roots.append(repo.references[name].peel(pygit2.Commit).id)
+                    except (KeyError, ValueError, pygit2.GitError):
+                        continue
+                if not repo.head_is_unborn:
+                    roots.append(repo.head.target)
+            elif repo.head_is_unborn:
+                raise GitBackendError(f"当前分支还没有任何提交: {repo_path}")
+            else:
+                roots.append(repo.head.target)
+
+            allowed = None
+            if hidden:
+                # 排除被隐藏提交可达的所有提交（同 git log ^<提交>）
+                walker = repo.walk(None, pygit2.GIT_SORT_NONE)
+                for root in roots:
+                    walker.push(root)
+                for oid in hidden:
+                    walker.hide(oid)
+                allowed = {commit.id for commit in walker}
+        except (KeyError, ValueError, pygit2.GitError) as e:
+            raise GitBackendError(f"无法遍历提交 {repo_path}: {e}") from e
+
+        queue = []
+        seen = set()
+        counter = 0
+
+        def add(oid):
+            nonlocal counter
+            if oid in seen or (allowed is not None and oid not in allowed):
+                return
+            seen.add(oid)
+            commit = repo[oid]
+            counter += 1
+            heapq.heappush(queue, (-commit.commit_time, counter, commit))
+
+        for root in roots:
+            add(root)
+
+        number = 0
+        while queue:
+            _, _, commit = heapq.heappop(queue)
+            if control is not None and number % BACKEND_CANCEL_CHECK_INTERVAL == 0:
+                control.check()
+            number += 1
+            if since is not None and commit.commit_time < since:
+                continue
+            for parent_id in commit.parent_ids:
+                add(parent_id)
+            yield commit
+
+    @staticmethod
+    def _log_uses_mailmap(repo):
+        """git log --author 是否按 .mailmap 映射后的作者匹配（log.mailmap，git 2.23 起默认开启）"""
+        try:
+            return repo.config.get_bool('log.mailmap')
+        except (KeyError, ValueError, pygit2.GitError):
+            return True
+
+    @staticmethod
+    def _decode_author(commit):
+        """按提交的 encoding 头解码作者名、邮箱和提交信息（git log 同样会先转换为 UTF-8 再输出）"""
+        encoding = commit.message_encoding
+        signature = commit.author
+        return (_decode_commit_text(signature.raw_name, encoding),
+                _decode_commit_text(signature.raw_email, encoding),
+                signature)
+
+    def iter_commits(self, repo_path, start_date, end_date, author, extract_all_branches=False, revisions=None,
+                     branch='', control=None):
+        repo = self._open(repo_path)
+        since, until = _local_day_range(start_date, end_date)
+        if isinstance(author, AuthorMatcher):
+            use_mailmap = author.use_mailmap
+            pattern = None
+        else:
+            use_mailmap = self._log_uses_mailmap(repo)
+            pattern = _compile_author_pattern(author)
+        mailmap = pygit2.Mailmap.from_repository(repo) if use_mailmap else None
+
+        for commit in self._walk(repo_path, repo, extract_all_branches, revisions, since, control):
+            if commit.commit_time > until:
+                continue
+            name, email, signature = self._decode_author(commit)
+            mailmap_name, mailmap_email = mailmap.resolve(name, email) if mailmap is not None else (name, email)
+            if pattern is not None:
+                # 与 git log --author 相同：匹配映射后的作者，输出的作者名（%an）仍为原始作者名
+                if not pattern.search(f"{mailmap_name} <{mailmap_email}>"):
+                    continue
+                member = name
+            else:
+                member = author.match(name, email, mailmap_name, mailmap_email)
+                if member is None:
+                    continue
+            yield Commit(str(commit.id), member, signature.time, signature.offset,
+                         _decode_commit_text(commit.raw_message, commit.message_encoding).strip(), repo_path, branch)
+
+    def iter_index_records(self, repo_path, extract_all_branches, revisions=None, control=None):
+        repo = self._open(repo_path)
+        mailmap = pygit2.Mailmap.from_repository(repo)
+        for commit in self._walk(repo_path, repo, extract_all_branches, revisions, control=control):
+            name, email, signature = self._decode_author(commit)
+            mailmap_name, mailmap_email = mailmap.resolve(name, email)
+            yield (str(commit.id), name, email, mailmap_name, mailmap_email, signature.time, signature.offset,
+                   commit.commit_time,
+                   _decode_commit_text(commit.raw_message, commit.message_encoding).strip())
+
+
+def _decode_commit_text(data, encoding):
+    """按提交的 encoding 头解码；没有该头、编码未知或内容与编码不符时按 UTF-8 解码（同 git 转换失败时原样输出）"""
+    if encoding:
+        try:
+            return data.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            pass
+    return data.decode('utf-8', errors='replace')
+
+
+_git_backend = SubprocessBackend()
+
+
+def create_git_backend(name=None):
+    """
+    按名称创建后端。
+
+    :param name: GIT_BACKENDS 中的名称；None 或 'subprocess' 为默认后端，
+                 'auto' 在安装了 pygit2 时使用进程内后端，'pygit2' 未安装时打印提示并使用默认后端
+    :return: GitBackend
+    """
+    name = name or 'subprocess'
+    if name not in GIT_BACKENDS:
+        raise ValueError(f"未知的 git 后端: {name}")
+    if name == 'subprocess' or (name == 'auto' and pygit2 is None):
+        return SubprocessBackend()
+    if pygit2 is None:
+        print("⚠️ 未安装 pygit2，使用 git 命令行后端")
+        return SubprocessBackend()
+    return Pygit2Backend()
+
+
+def set_git_backend(backend):
+    """设置全局使用的后端（GitBackend 或 GIT_BACKENDS 中的名称），返回设置后的后端"""
+    global _git_backend
+    if not isinstance(backend, GitBackend):
+        backend = create_git_backend(backend)
+    _git_backend = backend
+    return backend
+
+
+def get_git_commits(repo_path, start_date, end_date, author, pull_latest_code, extract_all_branches, cache=None,
+                    control=None):
+    """
+    获取指定日期、作者的 git 提交记录，并在获取之前拉取最新代码。
+
+    :param repo_path: 仓库路径
+    :param date_str: 日期字符串，格式为 'YYYY-MM-DD'
+    :param author: 作者名；为 AuthorMatcher 时一次获取所有团队成员的提交，Commit.author 为成员名
+    :param pull_latest_code: 是否拉取最新代码
+    :param extract_all_branches: 是否提取所有分支的提交记录
+    :param cache: 可选的 CommitCache 或 CommitIndex。
+                  CommitCache：引用指向未变化时直接返回缓存结果；只有新增提交时只获取新增部分
+                  CommitIndex：先把新提交同步到索引，再从索引查询
+    :param control: 本次运行的 RunControl（超时、取消和性能分析），为 None 时不限时
+    :return: Commit 列表
+    """
+    with profile_stage(_profiler_of(control), 'extract', repo_path):
+        return _get_git_commits(repo_path, start_date, end_date, author, pull_latest_code, extract_all_branches, cache,
+                                control)
+
+
+def _get_git_commits(repo_path, start_date, end_date, author, pull_latest_code, extract_all_branches, cache,
+                     control=None):
+    profiler = _profiler_of(control)
+    try:
+        # 根据配置决定是否拉取最新代码
+        if pull_latest_code:
+            with profile_stage(profiler, 'sync', repo_path):
+                _run_git(repo_path, ['pull'], check=True, control=control)
+
+        if isinstance(cache, CommitIndex):
+            cache.sync(repo_path, extract_all_branches, control)
+            return cache.query(repo_path, start_date, end_date, author, extract_all_branches)
+
+        # 分支名每个仓库只查询一次，记录在每个 Commit 上，写文件时无需再调用 git
+        branch = get_current_branch(repo_path, control)
+
+        if cache is not None:
+            cache_key = CommitCache.make_key(repo_path, start_date, end_date, author, extract_all_branches)
+            tips = get_ref_tips(repo_path, extract_all_branches, control)
+            entry = cache.get(cache_key)
+            # 切换到指向同一提交的另一个分支时引用指向不变，因此还要比较分支名
+            if entry is not None and entry.get('branch') == branch:
+                cached_commits = [Commit.from_list(values) for values in entry['commits']]
+                if entry['tips'] == tips:
+                    _count(profiler, 'cache_hits')
+                    return cached_commits
+                new_commits = _fetch_new_commits(repo_path, entry['tips'], tips, start_date, end_date,
+                                                 author, extract_all_branches, branch, control)
+                if new_commits is not None:
+                    _count(profiler, 'cache_incremental')
+                    commits = new_commits + cached_commits
+                    cache.put(cache_key, tips, branch, commits)
+                    return commits
+
+        commits = _run_git_log(repo_path, start_date, end_date, author, extract_all_branches, branch,
+                               control=control)
+
+        if cache is not None:
+            cache.put(cache_key, tips, branch, commits)
+
+        return commits
+    
+    except subprocess.TimeoutExpired as e:
+        error = f"{' '.join(e.cmd[:2])} 超时（{e.timeout} 秒）"
+        print(f"Timeout in {repo_path}: {error}")
+        _record_timeout(control, repo_path, error)
+        return []
+    except (subprocess.CalledProcessError, GitBackendError, OSError) as e:
+        print(f"Error in {repo_path}: {e}")
+        _record_failure(control, repo_path, e)
+        return []
+
+
+class CommitCache:
+    """
+    按仓库保存的提交记录缓存。
+
+    缓存键由仓库路径、作者、日期范围和分支模式组成，每条缓存同时记录获取时各引用的指向；
+    引用指向不变时结果必然不变，可以不再执行 git log。可在多个线程中共享。
+
+    只有缓存内容变化时 save() 才重写文件，所有仓库的引用都未变化的运行不会写盘。
+    """
+
+    def __init__(self, cache_file, max_entries=DEFAULT_COMMIT_CACHE_ENTRIES,
+                 max_entries_per_repo=DEFAULT_COMMIT_CACHE_ENTRIES_PER_REPO, max_age=DEFAULT_COMMIT_CACHE_MAX_AGE):
+        """
+        :param cache_file: 缓存文件路径
+        :param max_entries: 最多保留的缓存条数
+        :param max_entries_per_repo: 每个仓库最多保留的缓存条数
+        :param max_age: 超过该时长（秒）未使用的缓存在保存时删除，为 None 时不限
+        """
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.max_entries_per_repo = max_entries_per_repo
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = False
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == COMMIT_CACHE_VERSION and isinstance(data.get('entries'), dict):
+                self._entries = data['entries']
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    @staticmethod
+    def make_key(repo_path, start_date, end_date, author, extract_all_branches):
+        if isinstance(author, AuthorMatcher):
+            author = author.key
+        return json.dumps([os.path.abspath(repo_path), author, start_date, end_date, bool(extract_all_branches)],
+                          ensure_ascii=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                now = time.time()
+                if now - entry.get('used', 0) >= _COMMIT_CACHE_TOUCH_INTERVAL:
+                    entry['used'] = now
+                    self._dirty = True
+            return entry
+
+    def put(self, key, tips, branch, commits):
+        with self._lock:
+            self._entries[key] = {
+                'tips': tips,
+                'branch': branch,
+                'commits': [commit.to_list() for commit in commits],
+                'used': time.time(),
+            }
+            self._dirty = True
+
+    def save(self):
+        """
+        缓存有变化时写回磁盘：删除超过 max_age 未使用的缓存，每个仓库只保留最近使用的 max_entries_per_repo 条，
+        总共只保留最近使用的 max_entries 条
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            expire = time.time() - self.max_age if self.max_age is not None else None
+            recent = sorted(self._entries.items(), key=lambda item: item[1].get('used', 0), reverse=True)
+            per_repo = {}
+            kept = {}
+            for key, entry in recent:
+                if len(kept) >= self.max_entries or (expire is not None and entry.get('used', 0) < expire):
+                    break
+                repo = json.loads(key)[0]
+                if per_repo.get(repo, 0) >= self.max_entries_per_repo:
+                    continue
+                per_repo[repo] = per_repo.get(repo, 0) + 1
+                kept[key] = entry
+            self._entries = kept
+            data = {'version': COMMIT_CACHE_VERSION, 'entries': self._entries}
+            _write_json_atomic(self.cache_file, data)
+            self._dirty = False
+
+    def close(self):
+        """缓存只在 save() 时写入文件，没有需要释放的资源（与 CommitIndex.close 接口一致）"""
+
+
+def get_commit_cache_path(config_file="config.yaml"):
+    """返回提交记录缓存文件的路径（与配置文件位于同一目录）"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), COMMIT_CACHE_FILENAME)
+
+
+def get_commit_index_path(config_file="config.yaml"):
+    """返回提交索引数据库的路径（与配置文件位于同一目录）"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), COMMIT_INDEX_FILENAME)
+
+
+def _local_day_range(start_date, end_date):
+    """把 'YYYY-MM-DD' 日期范围转换为本地时间的时间戳范围，与 git log --since/--until 的写法一致"""
+    start = datetime.datetime.strptime(f"{start_date} 00:00:00", '%Y-%m-%d %H:%M:%S')
+    end = datetime.datetime.strptime(f"{end_date} 23:59:59", '%Y-%m-%d %H:%M:%S')
+    return int(time.mktime(start.timetuple())), int(time.mktime(end.timetuple()))
+
+
+# POSIX 字符类在 Python 正则字符集中的写法
+_POSIX_CHAR_CLASSES = {
+    'alpha': 'a-zA-Z', 'digit': '0-9', 'alnum': 'a-zA-Z0-9', 'upper': 'A-Z', 'lower': 'a-z',
+    'space': ' \\t\\n\\r\\f\\v', 'blank': ' \\t', 'punct': re.escape('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'),
+    'xdigit': '0-9A-Fa-f', 'cntrl': '\\x00-\\x1f\\x7f', 'print': '\\x20-\\x7e', 'graph': '\\x21-\\x7e',
+}
+# GNU 扩展的反斜杠转义在 Python 正则中的写法
+_BRE_ESCAPES = {
+    '(': '(', ')': ')', '|': '|', '{': '{', '}': '}', '+': '+', '?': '?',
+    'w': '\\w', 'W': '\\W', 's': '\\s', 'S': '\\S', 'b': '\\b', 'B': '\\B',
+    '<': '\\b(?=\\w)', '>': '\\b(?<=\\w)', '`': '\\A', "'": '\\Z',
+}
+
+
+def _bre_bracket(pattern, i):
+    """转换从 pattern[i]（'['）开始的方括号表达式，返回 (Python 写法, 结束后的位置)；没有闭合时返回 None"""
+    j = i + 1
+    negate = j < len(pattern) and pattern[j] == '^'
+    if negate:
+        j += 1
+    items = []
+    first = True
+    while j < len(pattern):
+        char = pattern[j]
+        if char == ']' and not first:
+            return '[' + ('^' if negate else '') + ''.join(items) + ']', j + 1
+        first = False
+        if char == '[' and pattern[j + 1:j + 2] in (':', '.', '='):
+            end = pattern.find(pattern[j + 1] + ']', j + 2)
+            if end < 0:
+                return None
+            name = pattern[j + 2:end]
+            if pattern[j + 1] == ':':
+                if name not in _POSIX_CHAR_CLASSES:
+                    raise re.error(f"unknown character class {name!r}")
+                items.append(_POSIX_CHAR_CLASSES[name])
+            else:
+                items.append(re.escape(name))
+            j = end + 2
+            continue
+        # 方括号内反斜杠等都是普通字符；保留 '-' 表示范围
+        items.append(char if char == '-' else re.escape(char))
+        j += 1
+    return None
+
+
+def _bre_to_regex(pattern):
+    """
+    把 POSIX 基本正则（BRE，含 git 在 glibc 上可用的 GNU 扩展 \\| \\+ \\? \\w 等）转换为 Python 正则。
+
+    BRE 中 ( ) { } + ? | 是普通字符，加反斜杠后才是分组、区间、重复和选择；'*' 出现在开头或分组开头时、
+    '^' 不在开头时、'$' 不在结尾时都是普通字符。
+    """
+    result = []
+    i = 0
+    length = len(pattern)
+    # 当前位置是否为表达式（或分组、选择分支）的开头
+    at_start = True
+    while i < length:
+        char = pattern[i]
+        if char == '\\' and i + 1 < length:
+            escaped = pattern[i + 1]
+            i += 2
+            if escaped in _BRE_ESCAPES:
+                result.append(_BRE_ESCAPES[escaped])
+                at_start = escaped in '(|'
+            elif escaped.isdigit() and escaped != '0':
+                result.append('\\' + escaped)
+                at_start = False
+            else:
+                result.append(re.escape(escaped))
+                at_start = False
+            continue
+        if char == '[':
+            converted = _bre_bracket(pattern, i)
+            if converted is None:
+                raise re.error("unmatched [")
+            result.append(converted[0])
+            i = converted[1]
+            at_start = False
+            continue
+        elif char == '*' and at_start:
+            result.append('\\*')
+        elif char == '^':
+            result.append('^' if at_start else '\\^')
+            # '^' 之后的 '*' 仍是普通字符
+            i += 1
+            continue
+        elif char == '$':
+            at_end = i + 1 == length or pattern[i + 1:i + 3] in ('\\)', '\\|')
+            result.append('$' if at_end else '\\$')
+        elif char == '.':
+            result.append('.')
+        elif char == '*':
+            result.append('*')
+        else:
+            result.append(re.escape(char))
+        i += 1
+        at_start = False
+    return ''.join(result)
+
+
+def _compile_author_pattern(author):
+    """
+    编译与 git log --author 相同规则的作者匹配表达式：按 POSIX 基本正则（BRE）在 “作者名 <邮箱>” 中查找，
+    区分大小写。进程内后端和提交索引都用它过滤作者，结果与 git 命令行一致；不是合法表达式时按普通文本匹配。
+    """
+    try:
+        return re.compile(_bre_to_regex(author or ''))
+    except re.error:
+        return re.compile(re.escape(author or ''))
+
+
+def _decode_index_record(fields):
+    """
+    把索引用 git log 的一条记录解码为
+    (hash, author, email, mailmap_author, mailmap_email, timestamp, tz_offset, commit_timestamp, message)
+    """
+    commit_hash, author, email, mailmap_author, mailmap_email, timestamp, tz_offset, commit_timestamp, message = fields
+    return (commit_hash.lstrip(b'\n').decode('ascii'),
+            author.decode('utf-8', errors='replace'),
+            email.decode('utf-8', errors='replace'),
+            mailmap_author.decode('utf-8', errors='replace'),
+            mailmap_email.decode('utf-8', errors='replace'),
+            int(timestamp),
+            _parse_tz_offset(tz_offset.decode('ascii', errors='replace')),
+            int(commit_timestamp),
+            message.decode('utf-8', errors='replace').strip())
+
+
+class CommitIndex:
+    """
+    本地 SQLite 提交索引。
+
+    保存各仓库全部提交的元数据（仓库、分支、哈希、作者、邮箱、时间、提交信息，不限作者和日期），
+    并记录同步时各引用的指向。sync() 只为新增的提交执行 git log（引用被改写时重建该仓库），
+    之后任意日期范围、作者的查询都直接由 query() 从索引回答。可在多个线程中共享。
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            version = self._connection.execute('PRAGMA user_version').fetchone()[0]
+            if version != COMMIT_INDEX_VERSION:
+                self._connection.execute('DROP TABLE IF EXISTS commits')
+                self._connection.execute('DROP TABLE IF EXISTS repos')
+            # all_branches 区分“只统计当前分支”和“统计所有分支”两种范围，两者的提交集合不同
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS repos (repo TEXT, all_branches INTEGER, branch TEXT, tips TEXT, '
+                'synced REAL, PRIMARY KEY (repo, all_branches))')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS commits (repo TEXT, all_branches INTEGER, hash TEXT, branch TEXT, '
+                'author TEXT, email TEXT, mailmap_author TEXT, mailmap_email TEXT, timestamp INTEGER, '
+                'tz_offset INTEGER, commit_timestamp INTEGER, message TEXT, batch INTEGER, seq INTEGER, '
+                'PRIMARY KEY (repo, all_branches, hash))')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS idx_commits_author_timestamp ON commits (author, commit_timestamp)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS idx_commits_repo_timestamp '
+                'ON commits (repo, all_branches, commit_timestamp)')
+            self._connection.execute(f'PRAGMA user_version = {COMMIT_INDEX_VERSION}')
+
+    def save(self):
+        """同步时已逐批提交事务，这里只把 WAL 日志合并回数据库文件（与 CommitCache.save 接口一致）"""
+        with self._lock:
+            self._connection.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        """关闭数据库连接，之后不能再使用该索引"""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _get_state(self, repo, scope):
+        with self._lock:
+            row = self._connection.execute('SELECT branch, tips FROM repos WHERE repo = ? AND all_branches = ?',
+                                           (repo, scope)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def sync(self, repo_path, extract_all_branches, control=None):
+        """
+        把仓库的新提交同步到索引。
+
+        :param repo_path: 仓库路径
+        :param extract_all_branches: 为 True 时索引所有引用可达的提交，否则只索引 HEAD 可达的提交
+        :param control: 本次运行的 RunControl
+        :return: 仓库当前的分支名
+        """
+        repo = os.path.abspath(repo_path)
+        scope = int(bool(extract_all_branches))
+        profiler = _profiler_of(control)
+        branch = get_current_branch(repo_path, control)
+        tips = get_ref_tips(repo_path, extract_all_branches, control)
+        state = self._get_state(repo, scope)
+
+        revisions = None
+        if state is not None:
+            old_branch, old_tips = state
+            revisions = _incremental_revisions(repo_path, old_tips, tips, control)
+            if revisions is not None and old_branch != branch:
+                # 沿用“提交记录上的分支为提取时的当前分支”的约定
+                with self._lock, self._connection:
+                    self._connection.execute('UPDATE commits SET branch = ? WHERE repo = ? AND all_branches = ?',
+                                             (branch, repo, scope))
+            if revisions == []:
+                self._save_state(repo, scope, branch, tips)
+                _count(profiler, 'index_unchanged')
+                return branch
+
+        if revisions is None:
+            # 首次同步或引用被改写：重建该仓库的索引。先删除状态，中途失败时下次仍会完整重建
+            with self._lock, self._connection:
+                self._connection.execute('DELETE FROM repos WHERE repo = ? AND all_branches = ?', (repo, scope))
+                self._connection.execute('DELETE FROM commits WHERE repo = ? AND all_branches = ?', (repo, scope))
+            _count(profiler, 'index_rebuilt')
+        else:
+            _count(profiler, 'index_incremental')
+
+        if tips:
+            # 记录遍历顺序：sync_batch 为第几次同步，seq 为本次同步中 git log 输出的顺序
+            sync_batch = self._next_batch(repo, scope)
+            batch = []
+            for seq, record in enumerate(_git_backend.iter_index_records(repo_path, extract_all_branches,
+                                                                          revisions, control)):
+                batch.append((repo, scope, record[0], branch) + record[1:] + (sync_batch, seq))
+                if len(batch) >= COMMIT_INDEX_BATCH_SIZE:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+
+        # 所有新提交写入后才记录新的引用指向
+        self._save_state(repo, scope, branch, tips)
+        return branch
+
+    def _next_batch(self, repo, scope):
+        with self._lock:
+            row = self._connection.execute('SELECT MAX(batch) FROM commits WHERE repo = ? AND all_branches = ?',
+                                           (repo, scope)).fetchone()
+        return (row[0] or 0) + 1
+
+    def _insert(self, rows):
+        if not rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _save_state(self, repo, scope, branch, tips):
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO repos VALUES (?, ?, ?, ?, ?)',
+                                     (repo, scope, branch, json.dumps(tips, sort_keys=True), time.time()))
+
+    def is_indexed(self, repo_path, extract_all_branches):
+        return self._get_state(os.path.abspath(repo_path), int(bool(extract_all_branches))) is not None
+
+    def query(self, repo_path, start_date, end_date, author, extract_all_branches):
+        """
+        从索引中查询仓库在日期范围内、匹配作者的提交。
+
+        结果按同步时记录的遍历顺序排列：同一次同步写入的提交与 git log 的顺序相同，增量同步的新提交排在之前
+        同步的提交前面。提交时间正常递增时这就是 git log 的顺序；若新提交的提交时间早于已索引的提交
+        （时钟偏差），git log 会把它们穿插排列，而这里仍排在前面。
+
+        :param author: 作者名（与 git log --author 相同：按 BRE 匹配 .mailmap 映射后的 “作者名 <邮箱>”），
+                       或团队模式的 AuthorMatcher
+        :return: Commit 列表
+        """
+        repo = os.path.abspath(repo_path)
+        scope = int(bool(extract_all_branches))
+        since, until = _local_day_range(start_date, end_date)
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT hash, author, email, mailmap_author, mailmap_email, timestamp, tz_offset, message, branch '
+                'FROM commits WHERE repo = ? AND all_branches = ? AND commit_timestamp BETWEEN ? AND ? '
+                'ORDER BY batch DESC, seq', (repo, scope, since, until)).fetchall()
+        if isinstance(author, AuthorMatcher):
+            commits = []
+            for commit_hash, name, email, mailmap_name, mailmap_email, timestamp, tz_offset, message, branch in rows:
+                member = author.match(name, email, mailmap_name, mailmap_email)
+                if member is not None:
+                    commits.append(Commit(commit_hash, member, timestamp, tz_offset, message, repo_path, branch))
+            return commits
+        pattern = _compile_author_pattern(author)
+        return [Commit(commit_hash, name, timestamp, tz_offset, message, repo_path, branch)
+                for commit_hash, name, _, mailmap_name, mailmap_email, timestamp, tz_offset, message, branch in rows
+                if pattern.search(f"{mailmap_name} <{mailmap_email}>")]
+
+
+def _build_sync_command(mode):
+    if mode not in SYNC_MODES:
+        raise ValueError(f"未知的同步模式: {mode}")
+    return ['git', 'pull'] if mode == 'pull' else ['git', 'fetch', '--all']
+
+
+def sync_repo(repo_path, mode='pull', timeout=DEFAULT_SYNC_TIMEOUT, control=None):
+    """
+    同步单个仓库的远端代码。
+
+    :param repo_path: 仓库路径
+    :param mode: 'pull' 拉取并合并；'fetch' 只获取远端引用，不修改工作区（工作区有未提交修改时也不会失败）
+    :param timeout: 超时时间（秒），为 None 时使用 control 的 git_timeout
+    :param control: 本次运行的 RunControl
+    :return: (是否成功, 失败原因)
+    """
+    sync_command = _build_sync_command(mode)
+    try:
+        with profile_stage(_profiler_of(control), 'sync', repo_path):
+            result = _run_git(repo_path, sync_command[1:], timeout=timeout or _git_timeout(control), control=control)
+    except subprocess.TimeoutExpired as e:
+        error = f"git {mode} 超时（{e.timeout} 秒）"
+        _record_timeout(control, repo_path, error)
+        return False, error
+    except OSError as e:
+        return False, str(e)
+    if result.returncode != 0:
+        return False, result.stderr.decode('utf-8', errors='replace').strip()
+    return True, ''
+
+
+def iter_repo_commits(repos, start_date, end_date, author, pull_latest_code, extract_all_branches,
+                      max_workers=None, on_repo_done=None, cache=None,
+                      sync_mode='pull', sync_workers=None, sync_timeout=DEFAULT_SYNC_TIMEOUT, on_repo_synced=None,
+                      control=None):
+    """
+    使用有界线程池并行提取多个仓库的提交记录，并按仓库的输入顺序逐个产出结果。
+
+    pull_latest_code 为 True 时，同步（pull/fetch）作为独立阶段在单独的线程池中执行，
+    每个仓库同步完成后立即开始提取，网络同步与日志提取形成流水线。
+
+    :param repos: 仓库路径列表
+    :param start_date: 开始日期，格式为 'YYYY-MM-DD'
+    :param end_date: 结束日期，格式为 'YYYY-MM-DD'
+    :param author: 作者名
+    :param pull_latest_code: 是否在提取前同步远端代码
+    :param extract_all_branches: 是否提取所有分支的提交记录
+    :param max_workers: 最大并行线程数，为 None 时使用 DEFAULT_MAX_WORKERS
+    :param on_repo_done: 可选回调 on_repo_done(done, total, repo, commits)，
+                         在每个仓库完成时（按完成顺序，在工作线程中）调用
+    :param cache: 可选的 CommitCache 或 CommitIndex，在所有线程间共享
+    :param sync_mode: 同步方式，'pull' 或 'fetch'
+    :param sync_workers: 同步阶段的并发数，为 None 时使用 DEFAULT_SYNC_WORKERS
+    :param sync_timeout: 单个仓库同步的超时时间（秒）
+    :param on_repo_synced: 可选回调 on_repo_synced(repo, ok, error)，每个仓库同步完成时调用；
+                           同步失败时仍会用本地已有的提交继续提取
+    :param control: 可选的 RunControl，用于取消运行、限制 git 命令的执行时间和性能分析；
+                    超时的仓库产出空列表并记录在 control.timed_out 中
+    :return: 生成器，按输入顺序产出 (repo, commits)
+    :raises ExtractionCancelled: 运行被取消
+    """
+    repos = list(repos)
+    if not repos:
+        return
+
+    # 未传入时也使用一个 RunControl，以便 Ctrl-C 时结束本次运行正在运行的 git 进程
+    control = control or RunControl(git_timeout=None)
+    yield from _iter_repo_commits(repos, start_date, end_date, author, extract_all_branches, pull_latest_code,
+                                  max_workers, on_repo_done, cache, sync_mode, sync_workers, sync_timeout,
+                                  on_repo_synced, control)
+
+
+def _wait_future(future):
+    """等待 Future 完成；分段等待，使 Windows 上的 Ctrl-C 也能及时中断"""
+    while True:
+        try:
+            return future.result(timeout=_GIT_WATCHDOG_INTERVAL)
+        except FutureTimeoutError:
+            continue
+
+
+def _iter_repo_commits(repos, start_date, end_date, author, extract_all_branches, pull_latest_code, max_workers,
+                       on_repo_done, cache, sync_mode, sync_workers, sync_timeout, on_repo_synced, control):
+
+    workers = max(1, min(int(max_workers or DEFAULT_MAX_WORKERS), len(repos)))
+    total = len(repos)
+    done_count = [0]
+    done_lock = threading.Lock()
+    # 调用方提前结束迭代时排队中的仓库直接跳过；不取消 control，正在执行的 git 命令正常结束
+    abandoned = threading.Event()
+
+    def extract(repo):
+        control.check()
+        if abandoned.is_set():
+            return []
+        commits = get_git_commits(repo, start_date, end_date, author, False, extract_all_branches, cache, control)
+        if on_repo_done is not None:
+            with done_lock:
+                done_count[0] += 1
+                done = done_count[0]
+            on_repo_done(done, total, repo, commits)
+        return commits
+
+    def sync(repo):
+        control.check()
+        if abandoned.is_set():
+            return
+        ok, error = sync_repo(repo, sync_mode, sync_timeout, control)
+        if not ok:
+            print(f"Sync failed in {repo}: {error}")
+        if on_repo_synced is not None:
+            on_repo_synced(repo, ok, error)
+
+    extract_executor = ThreadPoolExecutor(max_workers=workers)
+    sync_executor = None
+    try:
+        if pull_latest_code:
+            sync_executor = ThreadPoolExecutor(
+                max_workers=max(1, min(int(sync_workers or DEFAULT_SYNC_WORKERS), len(repos))))
+
+            def pipeline(repo):
+                # 同步完成后再把提取任务提交到提取线程池，结果转交给占位的 Future
+                result = Future()
+
+                def start_extract(_):
+                    try:
+                        extract_future = extract_executor.submit(extract, repo)
+                    except RuntimeError as e:
+                        # 调用方提前结束迭代，线程池已关闭
+                        result.set_exception(e)
+                        return
+                    extract_future.add_done_callback(lambda f: _transfer_future(f, result))
+
+                sync_executor.submit(sync, repo).add_done_callback(start_extract)
+                return result
+
+            futures = [pipeline(repo) for repo in repos]
+        else:
+            futures = [extract_executor.submit(extract, repo) for repo in repos]
+
+        # 按提交顺序等待结果，保证输出顺序与串行执行时一致
+        for repo, future in zip(repos, futures):
+            yield repo, _wait_future(future)
+    except GeneratorExit:
+        abandoned.set()
+        raise
+    except BaseException:
+        # Ctrl-C、取消或出错：让排队中的仓库直接跳过，并结束本次运行正在运行的 git 进程
+        control.cancel()
+        raise
+    finally:
+        if sync_executor is not None:
+            sync_executor.shutdown(wait=True)
+        extract_executor.shutdown(wait=True)
+
+
+def _transfer_future(source, target):
+    """把已完成的 source 的结果或异常转交给 target"""
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+def extract_commits_from_repos(repos, start_date, end_date, author, pull_latest_code, extract_all_branches,
+                               max_workers=None, on_repo_done=None, cache=None,
+                               sync_mode='pull', sync_workers=None, sync_timeout=DEFAULT_SYNC_TIMEOUT,
+                               on_repo_synced=None, engine='threads', control=None, on_repo_commits=None,
+                               deduplicator=None):
+    """
+    并行提取多个仓库的提交记录，并按仓库顺序合并结果。
+
+    参数同 iter_repo_commits。
+
+    :param engine: 提取引擎，'threads' 使用线程池，'asyncio' 使用异步子进程（见 run_async_extraction）
+    :param on_repo_commits: 可选回调 on_repo_commits(repo, commits)，在调用线程中按仓库顺序调用，
+                            前面的仓库都完成后立即调用（如 ReportWriter.write_commits 流式写入报告）；
+                            指定时不再在内存中汇总提交，返回空列表
+    :param deduplicator: 可选的 CommitDeduplicator，按仓库顺序去除已出现过的提交（先出现的仓库保留）；
+                         on_repo_commits 和返回值中都不含重复的提交，on_repo_done 收到的仍是各仓库的完整结果
+    :return: 所有仓库的 Commit 列表
+    :raises ExtractionCancelled: 运行被取消
+    """
+    if deduplicator is not None:
+        if on_repo_commits is not None:
+            callback = on_repo_commits
+            on_repo_commits = lambda repo, commits: callback(repo, deduplicator.filter(commits))
+        else:
+            return deduplicator.filter(extract_commits_from_repos(
+                repos, start_date, end_date, author, pull_latest_code, extract_all_branches, max_workers,
+                on_repo_done, cache, sync_mode, sync_workers, sync_timeout, on_repo_synced, engine, control))
+
+    if engine == 'asyncio':
+        return run_async_extraction(repos, start_date, end_date, author, pull_latest_code, extract_all_branches,
+                                    max_workers, on_repo_done, cache, sync_mode, sync_workers, sync_timeout,
+                                    on_repo_synced, control, on_repo_commits)
+    if engine != 'threads':
+        raise ValueError(f"未知的提取引擎: {engine}")
+
+    all_commits = []
+    for repo, commits in iter_repo_commits(repos, start_date, end_date, author, pull_latest_code,
+                                           extract_all_branches, max_workers, on_repo_done, cache,
+                                           sync_mode, sync_workers, sync_timeout, on_repo_synced, control):
+        if on_repo_commits is not None:
+            on_repo_commits(repo, commits)
+        else:
+            all_commits.extend(commits)
+    return all_commits
+
+
+class RepoWatcher:
+    """
+    以固定、可统计的开销轮询仓库的引用是否有变化（守护模式使用）。
+
+    每个仓库只 stat 少量文件和目录，不读取文件内容、也不启动 git：
+    HEAD、logs/HEAD（当前 worktree 的提交、切换分支、重置都会追加 reflog）、FETCH_HEAD、packed-refs，
+    以及 refs/heads、refs/tags、refs/remotes 和它们的下一级子目录
+    （git 通过“写锁文件再重命名”更新松散引用，所在目录的 mtime 会随之变化）。
+    每个仓库最多监视 MAX_WATCH_PATHS 个路径，因此每轮的 stat 次数不超过 仓库数 × MAX_WATCH_PATHS。
+
+    poll() 报告的变化要由调用方处理成功后调用 commit(repo) 确认；未确认的仓库（如提取失败或超时）
+    在之后每一轮都会再次报告，直到确认为止。
+    """
+
+    def __init__(self, repos):
+        self.repos = list(repos)
+        self.cycles = 0
+        self.stat_calls = 0
+        self.cpu_seconds = 0.0
+        self._paths = {}
+        self._state = {}
+        # poll() 发现变化时的新快照，commit() 时才替换 _state
+        self._pending = {}
+        # 没有引用变化也需要再次报告的仓库
+        self._stale = set()
+        for repo in self.repos:
+            self._paths[repo] = self.watch_paths(repo)
+            self._state[repo] = self._snapshot(self._paths[repo])
+
+    @staticmethod
+    def watch_paths(repo_path):
+        """返回仓库需要监视的路径列表"""
+        git_dir, common_dir = _read_git_dirs(repo_path)
+        if git_dir is None:
+            return []
+        paths = [os.path.join(git_dir, 'HEAD'), os.path.join(git_dir, 'logs', 'HEAD'),
+                 os.path.join(git_dir, 'FETCH_HEAD'), os.path.join(common_dir, 'packed-refs')]
+        for name in ('heads', 'tags', 'remotes'):
+            ref_dir = os.path.join(common_dir, 'refs', name)
+            paths.append(ref_dir)
+            try:
+                with os.scandir(ref_dir) as entries:
+                    # 如 refs/heads/feature/、refs/remotes/origin/
+                    paths.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+        return paths[:MAX_WATCH_PATHS]
+
+    def _snapshot(self, paths):
+        state = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                state.append(None)
+        self.stat_calls += len(paths)
+        return state
+
+    def poll(self):
+        """
+        检查一轮所有仓库。
+
+        :return: 引用有变化（或尚未 commit 确认、被 mark_stale 标记）的仓库列表（按仓库顺序）
+        """
+        start = time.process_time()
+        changed = []
+        for repo in self.repos:
+            if repo in self._stale or self._snapshot(self._paths[repo]) != self._state[repo]:
+                changed.append(repo)
+                # 快照在处理之前获取，处理期间的新变化会在下一轮被发现；
+                # 重新收集路径，新建的引用目录（如新的远端）也会被监视
+                paths = self.watch_paths(repo)
+                self._pending[repo] = (paths, self._snapshot(paths))
+        self.cycles += 1
+        self.cpu_seconds += time.process_time() - start
+        return changed
+
+    def commit(self, repo):
+        """确认仓库在上一次 poll() 时的变化已处理，之后只有引用再次变化时才报告"""
+        pending = self._pending.pop(repo, None)
+        if pending is not None:
+            self._paths[repo], self._state[repo] = pending
+        self._stale.discard(repo)
+
+    def mark_stale(self, repos=None):
+        """让仓库（默认所有仓库）在下一次 poll() 时无论引用是否变化都被报告"""
+        self._stale.update(self.repos if repos is None else repos)
+
+    def stats(self):
+        """轮询开销：每轮的 stat 次数和平均 CPU 时间"""
+        return {
+            'repos': len(self.repos),
+            'cycles': self.cycles,
+            'stat_calls_per_cycle': sum(len(paths) for paths in self._paths.values()),
+            'stat_calls_total': self.stat_calls,
+            'cpu_ms_per_cycle': round(self.cpu_seconds * 1000 / self.cycles, 3) if self.cycles else 0.0,
+        }
+
+
+def watch_commits(repos, author, extract_all_branches, write_report, interval=DEFAULT_WATCH_INTERVAL,
+                  max_workers=None, cache=None, deduplicate=True, control=None, on_update=None):
+    """
+    守护模式：持续保持当天的报告为最新，直到 control 被取消（或 Ctrl-C）。
+
+    首次运行提取所有仓库当天的提交，之后每隔 interval 秒用 RepoWatcher 轮询一次，
+    只重新提取引用有变化的仓库（配合 cache 时只获取新增的提交），再用各仓库的最新结果按仓库顺序重写报告
+    （当天没有提交时同样重写为空报告）；日期变化后重新提取所有仓库，写入新日期的报告。
+    提取失败或超时的仓库保留上一次的结果，并在之后每一轮重试，直到提取成功。
+
+    :param write_report: 回调 write_report(date_str, commits)，写出当天的报告
+    :param interval: 轮询间隔（秒）
+    :param deduplicate: 是否按哈希去除在多个仓库中重复出现的提交
+    :param on_update: 可选回调 on_update(date_str, changed_repos, commits, watcher)，每次重写报告后调用；
+                      此时 control.timed_out、control.failed 只包含本轮超时、失败的仓库
+    :raises ExtractionCancelled: 提取过程中被取消
+    """
+    control = control or RunControl(git_timeout=None)
+    watcher = RepoWatcher(repos)
+    results = {}
+    day = None
+
+    while not control.cancelled:
+        # 每轮只保留本轮的超时和失败记录，长时间运行时不会无限增长
+        control.clear_timeouts()
+        today = datetime.date.today().strftime('%Y-%m-%d')
+        if today != day:
+            day = today
+            results = {}
+            watcher.mark_stale()
+        changed = watcher.poll()
+
+        if changed:
+            extracted = {}
+            extract_commits_from_repos(changed, day, day, author, False, extract_all_branches, max_workers,
+                                       cache=cache, control=control, on_repo_commits=extracted.__setitem__)
+            # 失败或超时的仓库不确认变化，保留上一次的结果，下一轮再次提取
+            unfinished = {repo for repo, _ in control.timed_out + control.failed}
+            for repo in changed:
+                if repo not in unfinished and repo in extracted:
+                    results[repo] = extracted[repo]
+                    watcher.commit(repo)
+            commits = [commit for repo in watcher.repos for commit in results.get(repo, [])]
+            if deduplicate:
+                commits = CommitDeduplicator().filter(commits)
+            write_report(day, commits)
+            if cache is not None:
+                cache.save()
+            if on_update is not None:
+                on_update(day, changed, commits, watcher)
+
+        control.wait(interval)
+
+
+async def _run_git_async(repo_path, args, input=None, timeout=None, control=None):
+    """
+    以异步子进程执行 git 命令。
+
+    :param timeout: 超时时间（秒），为 None 时使用 control 的 git_timeout
+    :param control: 本次运行的 RunControl
+    :return: (returncode, stdout, stderr)
+    :raises subprocess.TimeoutExpired: 超时（子进程已被结束）
+    :raises ExtractionCancelled: 运行被取消
+    """
+    profiler = _profiler_of(control)
+    if profiler is not None:
+        profiler.add_git_spawn(repo_path)
+    timeout = _git_timeout(control, timeout)
+    tracker = _process_tracker(control)
+    process = await asyncio.create_subprocess_exec(
+        'git', *args, cwd=repo_path,
+        stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **_GIT_POPEN_KWARGS)
+    tracker.register(process, timeout)
+    try:
+        stdout, stderr = await process.communicate(input)
+    except BaseException:
+        # 任务被取消时不留下孤儿进程
+        _kill_process_tree(process)
+        await process.wait()
+        raise
+    finally:
+        reason = tracker.unregister(process)
+    _raise_if_stopped(reason, ['git'] + list(args), timeout)
+    if profiler is not None:
+        profiler.add_bytes_read(len(stdout), repo_path)
+    return process.returncode, stdout, stderr
+
+
+async def aiter_commits(repo_path, start_date, end_date, author, extract_all_branches=False, revisions=None,
+                        branch='', control=None):
+    """
+    iter_commits 的异步版本：从异步子进程的标准输出流式解析提交记录。
+
+    :return: 异步生成器，逐个产出 Commit
+    :raises subprocess.CalledProcessError: git log 执行失败
+    :raises subprocess.TimeoutExpired: 超过 control 的 git_timeout
+    :raises ExtractionCancelled: 运行被取消
+    """
+    git_log_command = _build_git_log_command(start_date, end_date, author, extract_all_branches,
+                                             read_revisions=revisions is not None)
+    field_count, decode = _commit_decoder(author, repo_path, branch)
+    timeout = _git_timeout(control)
+    profiler = _profiler_of(control)
+    tracker = _process_tracker(control)
+    if profiler is not None:
+        profiler.add_git_spawn(repo_path)
+    bytes_read = 0
+    process = await asyncio.create_subprocess_exec(
+        *git_log_command, cwd=repo_path,
+        stdin=asyncio.subprocess.PIPE if revisions is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **_GIT_POPEN_KWARGS)
+    tracker.register(process, timeout)
+    try:
+        if revisions is not None:
+            try:
+                process.stdin.write(('\n'.join(revisions) + '\n').encode('utf-8'))
+                await process.stdin.drain()
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                # 进程已被结束，原因在下面检查
+                pass
+
+        parser = _CommitStreamParser(field_count)
+        while True:
+            chunk = await process.stdout.read(GIT_LOG_READ_SIZE)
+            if not chunk:
+                break
+            bytes_read += len(chunk)
+            for fields in parser.feed(chunk):
+                commit = decode(fields)
+                if commit is not None:
+                    yield commit
+
+        stderr = await process.stderr.read()
+        returncode = await process.wait()
+        _raise_if_stopped(tracker.unregister(process), git_log_command, timeout)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, git_log_command, stderr=stderr)
+    finally:
+        tracker.unregister(process)
+        if process.returncode is None:
+            _kill_process_tree(process)
+            await process.wait()
+        if profiler is not None:
+            profiler.add_bytes_read(bytes_read, repo_path)
+
+
+async def _acollect_commits(repo_path, start_date, end_date, author, extract_all_branches, branch, revisions=None,
+                            control=None):
+    return [commit async for commit in aiter_commits(repo_path, start_date, end_date, author,
+                                                     extract_all_branches, revisions, branch, control)]
+
+
+async def aget_git_commits(repo_path, start_date, end_date, author, extract_all_branches, cache=None, control=None):
+    """
+    get_git_commits 的异步版本（不包含同步远端代码，同步由调用方单独进行）。
+
+    缓存规则与 get_git_commits 相同。
+
+    :return: Commit 列表；git 执行失败时返回空列表
+    """
+    profiler = _profiler_of(control)
+    start = time.perf_counter()
+    try:
+        return await _aget_git_commits(repo_path, start_date, end_date, author, extract_all_branches, cache, control)
+    finally:
+        if profiler is not None:
+            profiler.add_time('extract', time.perf_counter() - start, repo_path)
+
+
+async def _aget_git_commits(repo_path, start_date, end_date, author, extract_all_branches, cache, control=None):
+    profiler = _profiler_of(control)
+    if isinstance(cache, CommitIndex) or not isinstance(_git_backend, SubprocessBackend):
+        # 索引的读写是同步的 SQLite 操作，进程内后端也是同步读取仓库，放到线程池中执行，避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _get_git_commits, repo_path, start_date, end_date, author,
+                                          False, extract_all_branches, cache, control)
+
+    try:
+        # 分支、引用和祖先判断同样以异步子进程执行，不占用线程池
+        branch = await _aget_current_branch(repo_path, control)
+
+        if cache is not None:
+            cache_key = CommitCache.make_key(repo_path, start_date, end_date, author, extract_all_branches)
+            tips = await _aget_ref_tips(repo_path, extract_all_branches, control)
+            entry = cache.get(cache_key)
+            if entry is not None and entry.get('branch') == branch:
+                cached_commits = [Commit.from_list(values) for values in entry['commits']]
+                if entry['tips'] == tips:
+                    _count(profiler, 'cache_hits')
+                    return cached_commits
+                new_commits = await _afetch_new_commits(repo_path, entry['tips'], tips, start_date, end_date,
+                                                        author, extract_all_branches, branch, control)
+                if new_commits is not None:
+                    _count(profiler, 'cache_incremental')
+                    commits = new_commits + cached_commits
+                    cache.put(cache_key, tips, branch, commits)
+                    return commits
+
+        commits = await _acollect_commits(repo_path, start_date, end_date, author, extract_all_branches, branch,
+                                          control=control)
+
+        if cache is not None:
+            cache.put(cache_key, tips, branch, commits)
+
+        return commits
+
+    except subprocess.TimeoutExpired as e:
+        error = f"{' '.join(e.cmd[:2])} 超时（{e.timeout} 秒）"
+        print(f"Timeout in {repo_path}: {error}")
+        _record_timeout(control, repo_path, error)
+        return []
+    except (subprocess.CalledProcessError, GitBackendError, OSError) as e:
+        print(f"Error in {repo_path}: {e}")
+        _record_failure(control, repo_path, e)
+        return []
+
+
+async def _aget_current_branch(repo_path, control=None):
+    """get_current_branch 的异步版本（git 命令行后端）"""
+    with profile_stage(_profiler_of(control), 'branch', repo_path):
+        try:
+            returncode, stdout, _ = await _run_git_async(repo_path, _CURRENT_BRANCH_ARGS, control=control)
+        except OSError:
+            return "unknown branch"
+    if returncode != 0:
+        return "unknown branch"
+    return stdout.strip().decode('utf-8')
+
+
+async def _aget_ref_tips(repo_path, extract_all_branches, control=None):
+    """get_ref_tips 的异步版本（git 命令行后端）"""
+    with profile_stage(_profiler_of(control), 'refs', repo_path):
+        _, stdout, _ = await _run_git_async(repo_path, _REF_TIPS_ARGS, control=control)
+    return _parse_ref_tips(stdout, extract_all_branches)
+
+
+async def _aincremental_revisions(repo_path, old_tips, new_tips, control=None):
+    """_incremental_revisions 的异步版本：逐个以异步的 git merge-base --is-ancestor 判断祖先关系"""
+    pairs = _changed_ref_pairs(old_tips, new_tips)
+    if pairs is None:
+        return None
+    with profile_stage(_profiler_of(control), 'refs', repo_path):
+        for ancestor, descendant in pairs:
+            returncode, _, _ = await _run_git_async(repo_path, ['merge-base', '--is-ancestor', ancestor, descendant],
+                                                    control=control)
+            if returncode != 0:
+                return None
+    return _new_revisions(old_tips, new_tips)
+
+
+async def _afetch_new_commits(repo_path, old_tips, new_tips, start_date, end_date, author, extract_all_branches,
+                              branch, control=None):
+    """_fetch_new_commits 的异步版本：祖先判断和 git log 都以异步子进程执行"""
+    revisions = await _aincremental_revisions(repo_path, old_tips, new_tips, control)
+    if not revisions:
+        return revisions
+
+    try:
+        return await _acollect_commits(repo_path, start_date, end_date, author, extract_all_branches, branch,
+                                       revisions, control)
+    except (subprocess.CalledProcessError, GitBackendError):
+        # 例如引用指向的不是提交对象，退回完整获取
+        return None
+
+
+async def async_sync_repo(repo_path, mode='pull', timeout=DEFAULT_SYNC_TIMEOUT, control=None):
+    """sync_repo 的异步版本，返回 (是否成功, 失败原因)"""
+    sync_command = _build_sync_command(mode)
+    profiler = _profiler_of(control)
+    start = time.perf_counter()
+    try:
+        returncode, _, stderr = await _run_git_async(repo_path, sync_command[1:],
+                                                     timeout=timeout or _git_timeout(control), control=control)
+    except subprocess.TimeoutExpired as e:
+        error = f"git {mode} 超时（{e.timeout} 秒）"
+        _record_timeout(control, repo_path, error)
+        return False, error
+    except OSError as e:
+        return False, str(e)
+    finally:
+        if profiler is not None:
+            profiler.add_time('sync', time.perf_counter() - start, repo_path)
+    if returncode != 0:
+        return False, stderr.decode('utf-8', errors='replace').strip()
+    return True, ''
+
+
+async def aiter_repo_commits(repos, start_date, end_date, author, pull_latest_code, extract_all_branches,
+                             concurrency=None, cache=None, sync_mode='pull', sync_workers=None,
+                             sync_timeout=DEFAULT_SYNC_TIMEOUT, on_repo_synced=None, control=None):
+    """
+    基于 asyncio 子进程的并行提取：由信号量限制并发，不需要为每个仓库占用一个线程。
+
+    每个仓库先在同步信号量下同步（如需要），再在提取信号量下提取，两个阶段形成流水线。
+
+    :param concurrency: 同时提取的仓库数，为 None 时使用 DEFAULT_MAX_WORKERS
+    :param sync_workers: 同时同步的仓库数，为 None 时使用 DEFAULT_SYNC_WORKERS
+    其余参数同 iter_repo_commits。
+    :return: 异步生成器，按完成顺序产出 (index, repo, commits)，index 为仓库在 repos 中的位置
+    :raises ExtractionCancelled: 运行被取消
+    """
+    repos = list(repos)
+    if not repos:
+        return
+
+    control = control or RunControl(git_timeout=None)
+    async for result in _aiter_repo_commits(repos, start_date, end_date, author, pull_latest_code,
+                                            extract_all_branches, concurrency, cache, sync_mode, sync_workers,
+                                            sync_timeout, on_repo_synced, control):
+        yield result
+
+
+async def _aiter_repo_commits(repos, start_date, end_date, author, pull_latest_code, extract_all_branches,
+                              concurrency, cache, sync_mode, sync_workers, sync_timeout, on_repo_synced, control):
+
+    extract_semaphore = asyncio.Semaphore(max(1, int(concurrency or DEFAULT_MAX_WORKERS)))
+    sync_semaphore = asyncio.Semaphore(max(1, int(sync_workers or DEFAULT_SYNC_WORKERS)))
+
+    async def process(index, repo):
+        if pull_latest_code:
+            async with sync_semaphore:
+                control.check()
+                ok, error = await async_sync_repo(repo, sync_mode, sync_timeout, control)
+            if not ok:
+                print(f"Sync failed in {repo}: {error}")
+            if on_repo_synced is not None:
+                on_repo_synced(repo, ok, error)
+        async with extract_semaphore:
+            control.check()
+            commits = await aget_git_commits(repo, start_date, end_date, author, extract_all_branches, cache,
+                                             control)
+        return index, repo, commits
+
+    tasks = [asyncio.ensure_future(process(index, repo)) for index, repo in enumerate(repos)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    except GeneratorExit:
+        # 调用方提前结束迭代：下面取消剩余的任务即可（任务取消时会结束各自的 git 进程），不取消整个运行
+        raise
+    except BaseException:
+        control.cancel()
+        raise
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def run_async_extraction(repos, start_date, end_date, author, pull_latest_code, extract_all_branches,
+                         concurrency=None, on_repo_done=None, cache=None, sync_mode='pull', sync_workers=None,
+                         sync_timeout=DEFAULT_SYNC_TIMEOUT, on_repo_synced=None, control=None, on_repo_commits=None):
+    """
+    aiter_repo_commits 的同步封装，供 main.py 等非异步代码使用。
+
+    :param on_repo_done: 可选回调 on_repo_done(done, total, repo, commits)，按完成顺序调用
+    :param on_repo_commits: 可选回调 on_repo_commits(repo, commits)，按仓库顺序调用（见 extract_commits_from_repos）；
+                            指定时只暂存先于前面仓库完成的结果，返回空列表
+    :return: 所有仓库的 Commit 列表，按仓库顺序排列
+    :raises ExtractionCancelled: 运行被取消
+    """
+    repos = list(repos)
+    control = control or RunControl(git_timeout=None)
+
+    async def collect():
+        results = [None] * len(repos)
+        done = 0
+        next_index = 0
+        async for index, repo, commits in aiter_repo_commits(
+                repos, start_date, end_date, author, pull_latest_code, extract_all_branches, concurrency,
+                cache, sync_mode, sync_workers, sync_timeout, on_repo_synced, control):
+            results[index] = commits
+            done += 1
+            if on_repo_done is not None:
+                on_repo_done(done, len(repos), repo, commits)
+            if on_repo_commits is not None:
+                # 按仓库顺序交出已连续完成的结果，交出后不再保留
+                while next_index < len(repos) and results[next_index] is not None:
+                    on_repo_commits(repos[next_index], results[next_index])
+                    results[next_index] = None
+                    next_index += 1
+        if on_repo_commits is not None:
+            return []
+        return [commit for commits in results if commits for commit in commits]
+
+    if sys.platform == 'win32' and sys.version_info < (3, 8):
+        # Python 3.7 在 Windows 上默认的事件循环不支持子进程
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    try:
+        return asyncio.run(collect())
+    except BaseException:
+        # Ctrl-C 时 asyncio.run 会取消所有任务，这里再确保结束残留的 git 进程
+        control.cancel()
+        raise
+
+
+class ParsedMessage:
+    """规范化后的提交信息：type、scope 为约定式提交的类型和范围（没有时为 None），tickets 为提到的工单号"""
+
+    __slots__ = ('text', 'type', 'scope', 'breaking', 'tickets')
+
+    def __init__(self, text, type=None, scope=None, breaking=False, tickets=()):
+        self.text = text
+        self.type = type
+        self.scope = scope
+        self.breaking = breaking
+        self.tickets = tickets
+
+    def __repr__(self):
+        return (f"ParsedMessage(type={self.type!r}, scope={self.scope!r}, breaking={self.breaking!r}, "
+                f"tickets={self.tickets!r}, text={self.text!r})")
+
+
+class MessageNormalizer:
+    """
+    提交信息规范化：解析 'feat(scope)!: ' 形式的前缀（类型、范围、破坏性变更标记），提取工单号，
+    去除噪音并合并空白。
+
+    规则在创建时预编译：工单号、噪音和空白合并在一个组合正则表达式中，每条提交信息只扫描一遍；
+    前缀只可能出现在开头，用锚定的表达式在位置 0 匹配一次。可在多个线程中共享。
+    """
+
+    def __init__(self, types=None, noise=None, ticket_pattern=None):
+        """
+        :param types: 识别的类型列表（不区分大小写），默认 DEFAULT_MESSAGE_TYPES
+        :param noise: 需要从提交信息中去除的正则表达式列表，默认 DEFAULT_MESSAGE_NOISE
+        :param ticket_pattern: 工单号的正则表达式，默认 DEFAULT_TICKET_PATTERN；为空字符串时不提取
+        :raises ValueError: 正则表达式无效
+        """
+        types = types or DEFAULT_MESSAGE_TYPES
+        noise = DEFAULT_MESSAGE_NOISE if noise is None else noise
+        ticket_pattern = DEFAULT_TICKET_PATTERN if ticket_pattern is None else ticket_pattern
+
+        # 各分支都以字符或字符集开头，正则引擎可以快速跳过不可能匹配的位置（组合中加入 \A 分支会使其失效，
+        # 因此前缀单独匹配）；连续空白、制表符和结尾的空白在 normalize 中合并或去掉
+        alternatives = []
+        if ticket_pattern:
+            alternatives.append(f'(?P<ticket>{ticket_pattern})')
+        if noise:
+            alternatives.append('(?P<noise>{})'.format('|'.join(f'(?:{pattern})' for pattern in noise)))
+        alternatives.append(r'(?P<space>\s(?:\s+|\Z)|[\t\r\f\v])')
+        try:
+            self._prefix = re.compile(r'\s*({})(?:\(([^()\r\n]*)\))?(!)?:\s*'.format(
+                '|'.join(re.escape(name) for name in types)), re.IGNORECASE)
+            self._pattern = re.compile('|'.join(alternatives))
+        except re.error as e:
+            raise ValueError(f"提交信息规范化规则无效: {e}")
+
+    def normalize(self, message):
+        """
+        :param message: 原始提交信息
+        :return: ParsedMessage
+        """
+        commit_type = scope = None
+        breaking = False
+        position = 0
+        prefix = self._prefix.match(message)
+        if prefix is not None:
+            commit_type = prefix.group(1).lower()
+            scope = prefix.group(2) or None
+            breaking = prefix.group(3) is not None
+            position = prefix.end()
+
+        tickets = []
+        parts = []
+        length = len(message)
+        for match in self._pattern.finditer(message, position):
+            kind = match.lastgroup
+            if kind == 'ticket':
+                # 工单号保留在正文中
+                tickets.append(match.group())
+                continue
+            start, end = match.span()
+            parts.append(message[position:start])
+            position = end
+            if kind == 'space':
+                if start > 0 and end < length:
+                    # 多个换行保留为一个空行，单个换行保留，其余空白合并为一个空格
+                    newlines = match.group().count('\n')
+                    parts.append('\n\n' if newlines > 1 else '\n' if newlines else ' ')
+            elif start > 0 and message[start - 1] in ' \t' and (end == length or message[end].isspace()):
+                # 两侧都是空白的噪音去掉后不留下多余的空格
+                parts[-1] = parts[-1].rstrip(' \t')
+        if parts:
+            parts.append(message[position:])
+            text = ''.join(parts)
+        else:
+            text = message[position:]
+        return ParsedMessage(text, commit_type, scope, breaking, tuple(dict.fromkeys(tickets)))
+
+    def normalize_many(self, messages):
+        """
+        批量规范化，重复的提交信息（如合并提交）只处理一次。
+
+        :param messages: 提交信息的可迭代对象
+        :return: 与输入顺序对应的 ParsedMessage 列表
+        """
+        seen = {}
+        results = []
+        for message in messages:
+            parsed = seen.get(message)
+            if parsed is None:
+                parsed = seen[message] = self.normalize(message)
+            results.append(parsed)
+        return results
+
+    def normalize_commits(self, commits):
+        """批量规范化 Commit 列表的提交信息，返回对应的 ParsedMessage 列表"""
+        return self.normalize_many(commit.message for commit in commits)
+
+
+_message_normalizer = MessageNormalizer()
+
+
+def set_message_normalizer(normalizer=None, **options):
+    """
+    设置全局使用的提交信息规范化规则，返回设置后的 MessageNormalizer。
+
+    :param normalizer: MessageNormalizer；为 None 时用 options（types、noise、ticket_pattern）创建
+    """
+    global _message_normalizer
+    if normalizer is None:
+        normalizer = MessageNormalizer(**options)
+    _message_normalizer = normalizer
+    return normalizer
+
+
+def get_message_normalizer():
+    """返回全局使用的 MessageNormalizer"""
+    return _message_normalizer
+
+
+def clean_commit_message(message):
+    """
+    去掉 'feat: ', 'fix(scope)!: ' 等前缀，去除噪音并合并空白（规则见 set_message_normalizer）。
+    
+    :param message: 原始提交信息
+    :return: 处理后的提交信息
+    """
+    return _message_normalizer.normalize(message).text
+
+
+def _has_glob(pattern):
+    return any(char in pattern for char in '*?[')
+
+
+class ProjectNameResolver:
+    """
+    项目名称映射：根据配置中的 project_names 查找仓库（项目名 + 分支名）对应的自定义名称。
+
+    键的格式为 "项目名(分支名)"，两部分都可以使用通配符（*、?、[...]），如 "web-*(release/*)"；
+    与之前一样，不是这种格式的键（如没有括号的 "web"）不匹配任何仓库，匹配所有分支要写 "web(*)"。
+    多条规则同时匹配时按以下顺序选择：
+
+    1. 项目名和分支名都不含通配符的规则（与之前的精确匹配相同）；
+    2. 项目名不含通配符的规则优先于项目名含通配符的规则；
+    3. 然后分支名不含通配符的规则优先；
+    4. 然后非通配符字符更多（更具体）的规则优先；
+    5. 仍然相同时，配置中靠前的规则优先。
+
+    规则在创建时预编译并排序，每个 (仓库, 分支) 只解析一次，之后直接返回缓存的结果。可在多个线程中共享。
+    """
+
+    def __init__(self, project_names=None):
+        """
+        :param project_names: 项目名称映射字典；值为空的规则被忽略
+        """
+        self._exact = {}
+        rules = []
+        for order, (key, alias) in enumerate((project_names or {}).items()):
+            if not alias:
+                continue
+            key = str(key).strip()
+            if not (key.endswith(')') and '(' in key):
+                continue
+            project, branch = key[:-1].split('(', 1)
+            project_glob = _has_glob(project)
+            branch_glob = _has_glob(branch)
+            if not project_glob and not branch_glob:
+                self._exact.setdefault((project, branch), alias)
+                continue
+            specificity = len(re.sub(r'\*|\?|\[[^\]]*\]', '', project + branch))
+            rules.append(((project_glob, branch_glob, -specificity, order),
+                          project if not project_glob else re.compile(fnmatch.translate(project)),
+                          re.compile(fnmatch.translate(branch)), alias))
+        rules.sort(key=lambda rule: rule[0])
+        # 项目名不含通配符的规则按项目名分组，查找时只需检查同名项目的规则和项目名含通配符的规则
+        self._by_project = {}
+        self._project_globs = []
+        for _, project, branch_pattern, alias in rules:
+            if isinstance(project, str):
+                self._by_project.setdefault(project, []).append((branch_pattern, alias))
+            else:
+                self._project_globs.append((project, branch_pattern, alias))
+        self._resolved = {}
+
+    def resolve(self, repo_path, branch):
+        """
+        :param repo_path: 仓库路径，项目名为其最后一级目录名
+        :param branch: 分支名
+        :return: 自定义名称，没有匹配时为空字符串
+        """
+        key = (repo_path, branch)
+        alias = self._resolved.get(key)
+        if alias is None:
+            alias = self._resolved[key] = self._lookup(os.path.basename(repo_path), branch or '')
+        return alias
+
+    def alias(self, commit):
+        """返回提交所属项目的自定义名称"""
+        return self.resolve(commit.repo, commit.branch)
+
+    def _lookup(self, project, branch):
+        # 各组规则已按优先级排序，第一条匹配的规则即为结果
+        alias = self._exact.get((project, branch))
+        if alias is not None:
+            return alias
+        for branch_pattern, alias in self._by_project.get(project, ()):
+            if branch_pattern.match(branch):
+                return alias
+        for project_pattern, branch_pattern, alias in self._project_globs:
+            if project_pattern.match(project) and branch_pattern.match(branch):
+                return alias
+        return ''
+
+
+def project_name_resolver(project_names):
+    """
+    返回 project_names 对应的 ProjectNameResolver：已经是 ProjectNameResolver 时直接返回，
+    否则（字典或 None）创建一个新的。写入器在创建时调用一次，之后共享同一个解析缓存。
+    """
+    if isinstance(project_names, ProjectNameResolver):
+        return project_names
+    return ProjectNameResolver(project_names)
+
+
+def get_project_alias(commit, project_names):
+    """
+    在项目名称映射中查找提交所属项目的自定义名称。
+
+    :param project_names: ProjectNameResolver 或项目名称映射字典（字典每次调用都要重新编译规则，
+                          需要处理多条提交时应先用 project_name_resolver 创建解析器）
+    :return: 自定义名称，没有匹配时为空字符串
+    """
+    return project_name_resolver(project_names).alias(commit)
+
+
+def format_summary_line(commit, project_names, show_project_and_branch, parsed=None):
+    """
+    生成汇总部分中一条提交对应的行。
+
+    :param commit: Commit
+    :param project_names: ProjectNameResolver（或项目名称映射字典）
+    :param show_project_and_branch: 是否显示项目名与分支名
+    :param parsed: 可选，已规范化的提交信息（ParsedMessage），批量写入时由调用方一次处理
+    :return: 以换行结尾的一行文本
+    """
+    custom_project_name = get_project_alias(commit, project_names)
+    if parsed is None:
+        parsed = _message_normalizer.normalize(commit.message)
+    cleaned_message = parsed.text
+
+    # 生成输出内容
+    if show_project_and_branch:
+        return f"{os.path.basename(commit.repo)}({commit.branch}) - {custom_project_name}{cleaned_message}\n"
+    return f"{custom_project_name}{cleaned_message}\n"
+
+
+def commit_to_record(commit, project_names, parsed=None):
+    """
+    将 Commit 转换为结构化输出使用的字典，键为 EXPORT_FIELDS。
+
+    message 为原始提交信息；type、scope、breaking、tickets（逗号分隔）来自规范化结果，便于按类型、工单分组。
+
+    :param parsed: 可选，已规范化的提交信息（ParsedMessage），批量写入时由调用方一次处理
+    """
+    if parsed is None:
+        parsed = _message_normalizer.normalize(commit.message)
+    return {
+        'repo': commit.repo,
+        'project': os.path.basename(commit.repo),
+        'project_alias': get_project_alias(commit, project_names),
+        'branch': commit.branch,
+        'hash': commit.hash,
+        'author': commit.author,
+        'timestamp': commit.timestamp,
+        'date': commit.date,
+        'message': commit.message,
+        'type': parsed.type or '',
+        'scope': parsed.scope or '',
+        'breaking': parsed.breaking,
+        'tickets': ','.join(parsed.tickets),
+    }
+
+
+class _AtomicFileWriter:
+    """
+    流式输出的基类：先写入目标目录下的临时文件，commit() 时用 os.replace 原子替换目标文件，
+    abort() 时删除临时文件，因此中途崩溃或取消不会留下不完整的输出。可在多个线程中调用 write_commits。
+
+    子类实现 _open()、_write(commit, parsed)（parsed 为批量规范化后的提交信息）、_finish()（写完剩余内容并关闭）和 _close()（直接关闭）。
+    可作为上下文管理器使用：正常退出时 commit()，发生异常时 abort()。
+    写入耗时记入 profiler 属性指定的 RunProfiler（默认不记录）。
+    """
+
+    profiler = None
+
+    def __init__(self, output_file):
+        self.output_file = os.path.abspath(output_file)
+        self.count = 0
+        self._tmp_file = f"{self.output_file}.{os.getpid()}.tmp"
+        self._lock = threading.Lock()
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    def write_commits(self, commits, parsed_messages=None):
+        """
+        写入一批提交（通常是一个仓库的结果）。
+
+        :param parsed_messages: 可选，与 commits 对应的 ParsedMessage 列表；未指定时按批规范化
+        """
+        with profile_stage(self.profiler, 'write'), self._lock:
+            if parsed_messages is not None:
+                for commit, parsed in zip(commits, parsed_messages):
+                    self._write(commit, parsed)
+                    self.count += 1
+                return
+            commits = iter(commits)
+            while True:
+                batch = list(itertools.islice(commits, MESSAGE_NORMALIZE_BATCH_SIZE))
+                if not batch:
+                    break
+                for commit, parsed in zip(batch, _message_normalizer.normalize_commits(batch)):
+                    self._write(commit, parsed)
+                self.count += len(batch)
+
+    def commit(self):
+        """
+        写完剩余内容并把临时文件替换为目标文件。
+
+        :return: 输出文件路径
+        """
+        with profile_stage(self.profiler, 'write'), self._lock:
+            try:
+                self._finish()
+                os.replace(self._tmp_file, self.output_file)
+            except BaseException:
+                self._discard()
+                raise
+        return self.output_file
+
+    def abort(self):
+        """放弃写入，删除临时文件，目标文件保持不变"""
+        with self._lock:
+            self._discard()
+
+    def _discard(self):
+        self._close()
+        try:
+            os.remove(self._tmp_file)
+        except OSError:
+            pass
+
+
+class ReportWriter(_AtomicFileWriter):
+    """
+    流式写入文本报告。
+
+    详细记录通过缓冲直接写入临时文件，汇总行写入 SpooledTemporaryFile（较小时留在内存，较大时溢出到磁盘），
+    commit() 时把汇总追加在详细记录之后，内存占用与提交数量无关。
+    """
+
+    def __init__(self, output_file, detailed_output, project_names, show_project_and_branch):
+        """
+        :param output_file: 输出文件路径
+        :param detailed_output: 是否输出详细记录
+        :param project_names: 项目名称映射字典或 ProjectNameResolver
+        :param show_project_and_branch: 是否显示项目名与分支名
+        """
+        self.detailed_output = detailed_output
+        self.project_names = project_name_resolver(project_names)
+        self.show_project_and_branch = show_project_and_branch
+        super().__init__(output_file)
+
+    def _open(self):
+        self._file = open(self._tmp_file, 'w', encoding='utf-8', buffering=REPORT_BUFFER_SIZE)
+        self._summary = tempfile.SpooledTemporaryFile(max_size=REPORT_SUMMARY_SPOOL_SIZE, mode='w+',
+                                                      encoding='utf-8')
+
+    def _write(self, commit, parsed):
+        if self.detailed_output:
+            self._file.write(commit.format_detail() + '\n\n')
+        self._summary.write(format_summary_line(commit, self.project_names, self.show_project_and_branch, parsed))
+
+    def _finish(self):
+        if self.detailed_output:
+            self._file.write('\n' + '='*40 + '\n')
+            self._file.write('Summary of all commit messages:\n\n')
+        self._summary.seek(0)
+        shutil.copyfileobj(self._summary, self._file, REPORT_BUFFER_SIZE)
+        self._close()
+
+    def _close(self):
+        self._file.close()
+        self._summary.close()
+
+
+class JsonLinesWriter(_AtomicFileWriter):
+    """以 JSON Lines 格式流式输出提交，每行一个对象，字段见 EXPORT_FIELDS"""
+
+    def __init__(self, output_file, project_names=None):
+        self.project_names = project_name_resolver(project_names)
+        super().__init__(output_file)
+
+    def _open(self):
+        self._file = open(self._tmp_file, 'w', encoding='utf-8', buffering=REPORT_BUFFER_SIZE)
+
+    def _write(self, commit, parsed):
+        self._file.write(json.dumps(commit_to_record(commit, self.project_names, parsed), ensure_ascii=False) + '\n')
+
+    def _finish(self):
+        self._file.close()
+
+    def _close(self):
+        self._file.close()
+
+
+class CsvWriter(_AtomicFileWriter):
+    """以 CSV 格式流式输出提交，第一行为 EXPORT_FIELDS 表头；使用带 BOM 的 UTF-8，便于 Excel 直接打开"""
+
+    def __init__(self, output_file, project_names=None):
+        self.project_names = project_name_resolver(project_names)
+        super().__init__(output_file)
+
+    def _open(self):
+        self._file = open(self._tmp_file, 'w', encoding='utf-8-sig', newline='', buffering=REPORT_BUFFER_SIZE)
+        self._writer = csv.DictWriter(self._file, fieldnames=EXPORT_FIELDS)
+        self._writer.writeheader()
+
+    def _write(self, commit, parsed):
+        self._writer.writerow(commit_to_record(commit, self.project_names, parsed))
+
+    def _finish(self):
+        self._file.close()
+
+    def _close(self):
+        self._file.close()
+
+
+class SqliteWriter(_AtomicFileWriter):
+    """
+    将提交写入 SQLite 数据库文件的 commits 表（列见 EXPORT_FIELDS）。
+
+    每批提交用一次 executemany 插入，整个文件在一个事务中写完；索引在最后统一创建。
+    """
+
+    def __init__(self, output_file, project_names=None):
+        self.project_names = project_name_resolver(project_names)
+        super().__init__(output_file)
+
+    def _open(self):
+        # 临时文件写完后整体替换，因此不需要日志和同步写盘
+        self._connection = sqlite3.connect(self._tmp_file, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=OFF')
+        self._connection.execute('PRAGMA synchronous=OFF')
+        self._connection.execute(
+            'CREATE TABLE commits (repo TEXT, project TEXT, project_alias TEXT, branch TEXT, hash TEXT, '
+            'author TEXT, timestamp INTEGER, date TEXT, message TEXT, type TEXT, scope TEXT, breaking INTEGER, '
+            'tickets TEXT)')
+        self._insert = f"INSERT INTO commits VALUES ({', '.join('?' * len(EXPORT_FIELDS))})"
+
+    def write_commits(self, commits, parsed_messages=None):
+        with profile_stage(self.profiler, 'write'), self._lock:
+            if parsed_messages is None:
+                commits = list(commits)
+                parsed_messages = _message_normalizer.normalize_commits(commits)
+            rows = [tuple(commit_to_record(commit, self.project_names, parsed)[field] for field in EXPORT_FIELDS)
+                    for commit, parsed in zip(commits, parsed_messages)]
+            self._connection.executemany(self._insert, rows)
+            self.count += len(rows)
+
+    def _finish(self):
+        self._connection.execute('CREATE INDEX idx_commits_author_timestamp ON commits (author, timestamp)')
+        self._connection.execute('CREATE INDEX idx_commits_repo_timestamp ON commits (repo, timestamp)')
+        self._connection.commit()
+        self._connection.close()
+
+    def _close(self):
+        self._connection.close()
+
+
+class MultiFormatWriter:
+    """
+    在一次提取中同时写入多种格式，接口与单个写入器相同（write_commits、commit、abort、count）。
+    """
+
+    def __init__(self, output_base, formats, detailed_output, project_names, show_project_and_branch,
+                 profiler=None):
+        """
+        :param output_base: 不含扩展名的输出路径，如 '~/Desktop/git_commits_2024-01-15'
+        :param formats: OUTPUT_FORMATS 中的格式名列表，如 ['txt', 'jsonl']
+        :param profiler: 可选的 RunProfiler，记录写入耗时
+        其余参数同 ReportWriter。
+        """
+        formats = list(dict.fromkeys(formats or ['txt']))
+        unknown = [name for name in formats if name not in OUTPUT_FORMATS]
+        if unknown:
+            raise ValueError(f"未知的输出格式: {', '.join(unknown)}")
+
+        # 各格式共享同一个项目名称解析器，每个 (仓库, 分支) 只解析一次
+        project_names = project_name_resolver(project_names)
+        self.writers = []
+        try:
+            for name in formats:
+                output_file = output_base + OUTPUT_FORMATS[name]
+                if name == 'txt':
+                    writer = ReportWriter(output_file, detailed_output, project_names, show_project_and_branch)
+                elif name == 'jsonl':
+                    writer = JsonLinesWriter(output_file, project_names)
+                elif name == 'csv':
+                    writer = CsvWriter(output_file, project_names)
+                else:
+                    writer = SqliteWriter(output_file, project_names)
+                writer.profiler = profiler
+                self.writers.append(writer)
+        except BaseException:
+            self.abort()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    @property
+    def count(self):
+        return self.writers[0].count if self.writers else 0
+
+    @property
+    def output_files(self):
+        return [writer.output_file for writer in self.writers]
+
+    def write_commits(self, commits):
+        # 各写入器都要遍历这批提交，迭代器需要先转为列表；提交信息只规范化一次
+        commits = commits if isinstance(commits, list) else list(commits)
+        parsed_messages = _message_normalizer.normalize_commits(commits) if len(self.writers) > 1 else None
+        for writer in self.writers:
+            writer.write_commits(commits, parsed_messages)
+
+    def commit(self):
+        """
+        :return: 所有输出文件的路径列表
+        """
+        try:
+            return [writer.commit() for writer in self.writers]
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        for writer in self.writers:
+            writer.abort()
+
+
+def _safe_file_part(name):
+    """把作者名转换为可用于文件名的片段"""
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', name).strip('._') or 'author'
+
+
+class TeamReportWriter:
+    """
+    团队模式的写入器：按 Commit.author（成员名）把提交分别写入每位成员自己的报告，
+    如 git_commits_2024-01-15_张三.txt（成员名转换为文件名后重复时追加 _2、_3 等序号）。
+    接口与 MultiFormatWriter 相同，默认没有提交的成员不生成文件。
+    """
+
+    def __init__(self, output_base, author_names, formats, detailed_output, project_names, show_project_and_branch,
+                 profiler=None, write_empty=False):
+        """
+        :param output_base: 不含扩展名的输出路径，每位成员的文件名在其后追加 '_<成员名>'
+        :param author_names: 成员名列表（AuthorMatcher.names）
+        :param write_empty: 为 True 时没有提交的成员也生成（空的）报告，如守护模式需要覆盖过期的报告
+        其余参数同 MultiFormatWriter。
+        """
+        project_names = project_name_resolver(project_names)
+        self.write_empty = write_empty
+        self.writers = {}
+        # 不同成员名转换后可能得到相同的文件名（如 'A B' 和 'A_B'），重复时追加序号；
+        # Windows 和 macOS 的文件名默认不区分大小写，比较时忽略大小写
+        used_parts = set()
+        try:
+            for name in author_names:
+                file_part = base_part = _safe_file_part(name)
+                suffix = 1
+                while file_part.casefold() in used_parts:
+                    suffix += 1
+                    file_part = f"{base_part}_{suffix}"
+                used_parts.add(file_part.casefold())
+                self.writers[name] = MultiFormatWriter(f"{output_base}_{file_part}", formats,
+                                                       detailed_output, project_names, show_project_and_branch,
+                                                       profiler)
+        except BaseException:
+            self.abort()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    @property
+    def count(self):
+        return sum(writer.count for writer in self.writers.values())
+
+    @property
+    def counts(self):
+        """各成员的提交数"""
+        return {name: writer.count for name, writer in self.writers.items()}
+
+    def write_commits(self, commits):
+        # 同一仓库的提交按成员分组，组内保持原有顺序
+        groups = {}
+        for commit in commits:
+            groups.setdefault(commit.author, []).append(commit)
+        for name, group in groups.items():
+            self.writers[name].write_commits(group)
+
+    def commit(self):
+        """
+        :return: 所有输出文件的路径列表（write_empty 为 False 时没有提交的成员不生成文件）
+        """
+        saved_files = []
+        try:
+            for writer in self.writers.values():
+                if writer.count or self.write_empty:
+                    saved_files.extend(writer.commit())
+                else:
+                    writer.abort()
+        except BaseException:
+            self.abort()
+            raise
+        return saved_files
+
+    def abort(self):
+        for writer in self.writers.values():
+            writer.abort()
+
+
+def save_commits_to_file(commits, output_file, detailed_output, project_names, show_project_and_branch):
+    """
+    将所有仓库的 commit 记录保存到指定文件，并在文件末尾汇总所有的提交 message。
+    
+    :param commits: Commit 列表（也可以是逐个产出 Commit 的迭代器）。
+    :param output_file: 输出文件路径。
+    :param detailed_output: 布尔值，控制是否输出详细记录。
+    :param project_names: 项目名称映射字典。
+    :param show_project_and_branch: 布尔值，控制是否显示项目名与分支名。
+    """
+    try:
+        with ReportWriter(output_file, detailed_output, project_names, show_project_and_branch) as writer:
+            writer.write_commits(commits)
         
-        print(f"File successfully saved at: {output_file}")
+        print(f"File successfully saved at: {writer.output_file}")
     except Exception as e:
         print(f"Failed to save file: {e}")
@@ -4,10 +4,129 @@ import os
 import datetime
 import json
 import threading
-from git_commit_tool import find_git_repos, get_git_commits, save_commits_to_file, load_config
+import queue
+from git_commit_tool import (find_git_repos, extract_commits_from_repos, MultiFormatWriter, TeamReportWriter,
+                             AuthorMatcher, OUTPUT_FORMATS, load_config, DEFAULT_MAX_WORKERS, get_repo_index_path,
+                             CommitCache, get_commit_cache_path, CommitIndex, get_commit_index_path,
+                             DEFAULT_SYNC_TIMEOUT, EXTRACTION_ENGINES, RunProfiler, RunControl,
+                             ExtractionCancelled, DEFAULT_GIT_TIMEOUT, set_git_backend, dedupe_git_repos,
+                             CommitDeduplicator, set_message_normalizer)
 import yaml
 from tkcalendar import DateEntry
 
+# 日志泵：工作线程只把日志放入队列，由 Tk 主线程定时批量写入日志区域
+LOG_PUMP_INTERVAL_MS = 100
+LOG_PUMP_BATCH_SIZE = 500
+# 日志区域默认最多保留的行数（可通过配置项 log_max_lines 修改），超出时删除最早的行
+DEFAULT_LOG_MAX_LINES = 2000
+
+# 结果列表可见行数；只有可见行会真正插入 Treeview，其余提交只保存在内存列表中
+RESULT_VISIBLE_ROWS = 15
+
+
+class CommitResultsView:
+    """
+    虚拟化的提交结果列表。
+
+    提交保存在 self.commits 中，Treeview 始终只包含当前可见的 RESULT_VISIBLE_ROWS 行，
+    滚动时按位置重新填充，因此数万条提交也能流畅滚动。点击列标题排序，再次点击切换升序/降序。
+    """
+
+    COLUMNS = (
+        ('repo', "仓库", 120),
+        ('branch', "分支", 100),
+        ('date', "时间", 130),
+        ('message', "提交信息", 300),
+    )
+    SORT_KEYS = {
+        'repo': lambda commit: os.path.basename(commit.repo).lower(),
+        'branch': lambda commit: commit.branch,
+        'date': lambda commit: commit.timestamp,
+        'message': lambda commit: commit.message,
+    }
+
+    def __init__(self, parent):
+        self.commits = []
+        self.first = 0
+        self.sort_column = None
+        self.sort_reverse = False
+
+        self.frame = ttk.Frame(parent, style='Main.TFrame')
+        self.tree = ttk.Treeview(self.frame, columns=[column for column, _, _ in self.COLUMNS],
+                                 show='headings', height=RESULT_VISIBLE_ROWS, selectmode='browse')
+        for column, title, width in self.COLUMNS:
+            self.tree.heading(column, text=title, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, stretch=(column == 'message'))
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scroll)
+
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        # 鼠标滚轮只滚动结果列表，返回 "break" 避免同时滚动整个窗口
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.render()
+
+    def clear(self):
+        self.commits = []
+        self.first = 0
+        self.render()
+
+    def add_commits(self, commits):
+        """追加一批提交；已按某列排序时保持排序"""
+        if not commits:
+            return
+        self.commits.extend(commits)
+        if self.sort_column is not None:
+            # 已排序部分加上新追加的一段，Timsort 对这种情况只需线性合并
+            self.commits.sort(key=self.SORT_KEYS[self.sort_column], reverse=self.sort_reverse)
+        self.render()
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.commits.sort(key=self.SORT_KEYS[column], reverse=self.sort_reverse)
+        for name, title, _ in self.COLUMNS:
+            arrow = (" ▼" if self.sort_reverse else " ▲") if name == column else ""
+            self.tree.heading(name, text=title + arrow)
+        self.first = 0
+        self.render()
+
+    def scroll(self, rows):
+        self.first += rows
+        self.render()
+        return "break"
+
+    def on_scroll(self, action, value, unit=None):
+        """滚动条回调，参数同 Tk 的 yview 命令"""
+        if action == 'moveto':
+            self.first = int(float(value) * len(self.commits))
+        elif action == 'scroll':
+            step = RESULT_VISIBLE_ROWS - 1 if unit == 'pages' else 1
+            self.first += int(value) * step
+        self.render()
+
+    def render(self):
+        """只为可见行生成显示文本并填充 Treeview"""
+        total = len(self.commits)
+        self.first = max(0, min(self.first, total - RESULT_VISIBLE_ROWS))
+        visible = self.commits[self.first:self.first + RESULT_VISIBLE_ROWS]
+
+        self.tree.delete(*self.tree.get_children())
+        for commit in visible:
+            message = commit.message.split('\n', 1)[0]
+            self.tree.insert('', tk.END, values=(os.path.basename(commit.repo), commit.branch,
+                                                 commit.date[:16], message))
+
+        if total:
+            self.scrollbar.set(self.first / total, (self.first + len(visible)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
 class GitCommitToolGUI:
     def __init__(self, root):
         self.root = root
@@ -36,6 +155,17 @@ class GitCommitToolGUI:
         
         self.root.configure(bg=self.colors['background'])
         
+        # 配置文件中没有对应界面控件的配置项（如 prune_directories），保存时原样写回
+        self.file_config = {}
+        
+        # 日志队列：log_message 可在任意线程调用
+        self.log_queue = queue.Queue()
+        # 结果队列：每个仓库完成后放入其提交列表，由 pump_results 在主线程加入结果列表
+        self.results_queue = queue.Queue()
+        # 当前运行的 RunControl，用于取消
+        self.run_control = None
+        self.log_max_lines = DEFAULT_LOG_MAX_LINES
+        
         # 创建样式
         self.setup_styles()
         
@@ -44,6 +174,10 @@ class GitCommitToolGUI:
         
         # 加载配置
         self.load_config_to_gui()
+        
+        # 启动日志泵
+        self.root.after(LOG_PUMP_INTERVAL_MS, self.pump_log)
+        self.root.after(LOG_PUMP_INTERVAL_MS, self.pump_results)
     
     def setup_styles(self):
         """设置Material UI样式"""
@@ -205,6 +339,7 @@ class GitCommitToolGUI:
         self.create_advanced_section()
         self.create_project_names_section()
         self.create_action_section()
+        self.create_results_section()
         self.create_log_section()
     
     def create_card_frame(self, parent, title, pady=(0, 20)):
@@ -388,6 +523,10 @@ class GitCommitToolGUI:
         ttk.Checkbutton(left_frame, text="🔄 提取前拉取最新代码", 
                        variable=self.pull_latest_var, style='Modern.TCheckbutton').pack(anchor="w", pady=5)
         
+        self.fetch_only_var = tk.BooleanVar()
+        ttk.Checkbutton(left_frame, text="📥 仅 fetch，不合并到工作区", 
+                       variable=self.fetch_only_var, style='Modern.TCheckbutton').pack(anchor="w", pady=5)
+        
         # 右列选项
         self.show_project_branch_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(right_frame, text="🏷️ 显示项目名与分支名", 
@@ -396,6 +535,42 @@ class GitCommitToolGUI:
         self.extract_all_branches_var = tk.BooleanVar()
         ttk.Checkbutton(right_frame, text="🌿 提取所有分支的提交记录", 
                        variable=self.extract_all_branches_var, style='Modern.TCheckbutton').pack(anchor="w", pady=5)
+        
+        # 强制重新扫描仓库（仅对本次运行生效，不保存到配置）
+        self.force_rescan_var = tk.BooleanVar()
+        ttk.Checkbutton(right_frame, text="🔁 忽略索引重新扫描仓库", 
+                       variable=self.force_rescan_var, style='Modern.TCheckbutton').pack(anchor="w", pady=5)
+        
+        # 生成性能分析报告（仅对本次运行生效，不保存到配置）
+        self.profile_var = tk.BooleanVar()
+        ttk.Checkbutton(right_frame, text="📈 生成性能分析报告", 
+                       variable=self.profile_var, style='Modern.TCheckbutton').pack(anchor="w", pady=5)
+        
+        # 并行线程数
+        workers_frame = ttk.Frame(left_frame, style='Main.TFrame')
+        workers_frame.pack(anchor="w", pady=5)
+        ttk.Label(workers_frame, text="⚡ 并行线程数:", style='Normal.TLabel').pack(side="left")
+        self.max_workers_var = tk.IntVar(value=DEFAULT_MAX_WORKERS)
+        ttk.Spinbox(workers_frame, from_=1, to=64, width=5,
+                   textvariable=self.max_workers_var).pack(side="left", padx=(10, 0))
+        
+        # 输出格式，可同时选择多种
+        formats_frame = ttk.Frame(left_frame, style='Main.TFrame')
+        formats_frame.pack(anchor="w", pady=5)
+        ttk.Label(formats_frame, text="📦 输出格式:", style='Normal.TLabel').pack(side="left")
+        self.output_format_vars = {}
+        for name in OUTPUT_FORMATS:
+            self.output_format_vars[name] = tk.BooleanVar(value=(name == 'txt'))
+            ttk.Checkbutton(formats_frame, text=name, variable=self.output_format_vars[name],
+                           style='Modern.TCheckbutton').pack(side="left", padx=(10, 0))
+        
+        # 提取引擎
+        engine_frame = ttk.Frame(right_frame, style='Main.TFrame')
+        engine_frame.pack(anchor="w", pady=5)
+        ttk.Label(engine_frame, text="🧩 提取引擎:", style='Normal.TLabel').pack(side="left")
+        self.extraction_engine_var = tk.StringVar(value='threads')
+        ttk.Combobox(engine_frame, values=EXTRACTION_ENGINES, width=8, state='readonly',
+                    textvariable=self.extraction_engine_var).pack(side="left", padx=(10, 0))
     
     def create_project_names_section(self):
         """创建项目名称映射区域"""
@@ -470,6 +645,12 @@ class GitCommitToolGUI:
                                    activeforeground='white')
         self.extract_btn.pack(side="left", padx=(10, 0))
         
+        # 取消按钮，仅在提取过程中可用
+        self.cancel_btn = ttk.Button(button_frame, text="⏹️ 取消", 
+                                    command=self.cancel_extraction, style='Secondary.TButton',
+                                    state='disabled')
+        self.cancel_btn.pack(side="left", padx=(10, 0))
+        
         # 进度条
         progress_frame = ttk.Frame(action_frame, style='Main.TFrame')
         progress_frame.pack(fill="x", pady=(15, 0))
@@ -478,6 +659,17 @@ class GitCommitToolGUI:
                                       style='Modern.Horizontal.TProgressbar')
         self.progress.pack(fill="x")
     
+    def create_results_section(self):
+        """创建提交结果区域"""
+        results_frame = self.create_card_frame(self.scrollable_frame, "📊 提交结果", pady=(20, 0))
+        
+        self.results_view = CommitResultsView(results_frame)
+        self.results_view.frame.pack(fill="both", expand=True)
+        
+        self.results_count_var = tk.StringVar(value="共 0 条提交")
+        ttk.Label(results_frame, textvariable=self.results_count_var,
+                 style='Normal.TLabel').pack(anchor="w", pady=(10, 0))
+    
     def create_log_section(self):
         """创建日志输出区域"""
         log_frame = self.create_card_frame(self.scrollable_frame, "📋 运行日志", pady=(20, 0))
@@ -511,6 +703,10 @@ class GitCommitToolGUI:
         if directory:
             self.root_dir_var.set(directory)
     
+    def get_root_directories(self):
+        """返回根目录列表（输入框中多个根目录用 ; 分隔）"""
+        return [path.strip() for path in self.root_dir_var.get().split(';') if path.strip()]
+    
     def browse_output_directory(self):
         """浏览输出目录"""
         directory = filedialog.askdirectory(title="选择输出目录")
@@ -518,11 +714,44 @@ class GitCommitToolGUI:
             self.output_dir_var.set(directory)
     
     def log_message(self, message):
-        """在日志区域添加消息"""
+        """添加日志消息（线程安全，实际写入由 pump_log 在主线程完成）"""
         timestamp = datetime.datetime.now().strftime('%H:%M:%S')
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self.log_queue.put(f"[{timestamp}] {message}\n")
+    
+    def pump_log(self):
+        """在 Tk 主线程中批量写入队列中的日志，并限制日志区域的行数"""
+        lines = []
+        try:
+            while len(lines) < LOG_PUMP_BATCH_SIZE:
+                lines.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if lines:
+            self.log_text.insert(tk.END, ''.join(lines))
+            # 末尾总有一个空行，因此实际行数为 end 的行号减一
+            excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - self.log_max_lines
+            if excess > 0:
+                self.log_text.delete('1.0', f'{excess + 1}.0')
+            self.log_text.see(tk.END)
+        
+        # 队列中还有积压时尽快继续处理
+        self.root.after(1 if len(lines) == LOG_PUMP_BATCH_SIZE else LOG_PUMP_INTERVAL_MS, self.pump_log)
+    
+    def pump_results(self):
+        """在 Tk 主线程中把已完成仓库的提交加入结果列表"""
+        batch = []
+        try:
+            while True:
+                batch.extend(self.results_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if batch:
+            self.results_view.add_commits(batch)
+            self.results_count_var.set(f"共 {len(self.results_view.commits)} 条提交")
+        
+        self.root.after(LOG_PUMP_INTERVAL_MS, self.pump_results)
     
     def clear_log(self):
         """清空日志"""
@@ -561,11 +790,17 @@ class GitCommitToolGUI:
             return ""
         return selected_date.strftime('%Y-%m-%d')
     
+    def get_output_formats(self):
+        """返回选中的输出格式列表"""
+        return [name for name, var in self.output_format_vars.items() if var.get()]
+    
     def save_config(self):
         """保存配置到YAML文件"""
         try:
-            config = {
-                'root_directory': self.root_dir_var.get(),
+            config = dict(self.file_config)
+            roots = self.get_root_directories()
+            config.update({
+                'root_directory': roots[0] if len(roots) == 1 else roots,
                 'author': self.author_var.get(),
                 'output_directory': self.output_dir_var.get(),
                 'start_date': self.get_date_string(self.start_date_entry),
@@ -573,9 +808,13 @@ class GitCommitToolGUI:
                 'detailed_output': self.detailed_output_var.get(),
                 'show_project_and_branch': self.show_project_branch_var.get(),
                 'pull_latest_code': self.pull_latest_var.get(),
+                'sync_mode': 'fetch' if self.fetch_only_var.get() else 'pull',
                 'extract_all_branches': self.extract_all_branches_var.get(),
+                'max_workers': self.max_workers_var.get(),
+                'extraction_engine': self.extraction_engine_var.get(),
+                'output_formats': self.get_output_formats(),
                 'project_names': self.parse_project_names()
-            }
+            })
             
             with open('config.yaml', 'w', encoding='utf-8') as f:
                 yaml.dump(config, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
@@ -591,9 +830,13 @@ class GitCommitToolGUI:
         """从配置文件加载配置到GUI"""
         try:
             if os.path.exists('config.yaml'):
-                config = load_config()
+                config = load_config() or {}
+                self.file_config = config
                 
-                self.root_dir_var.set(config.get('root_directory', ''))
+                root_directory = config.get('root_directory', '')
+                if isinstance(root_directory, list):
+                    root_directory = '; '.join(root_directory)
+                self.root_dir_var.set(root_directory)
                 self.author_var.set(config.get('author', ''))
                 self.output_dir_var.set(config.get('output_directory', ''))
                 
@@ -622,7 +865,14 @@ class GitCommitToolGUI:
                 self.detailed_output_var.set(config.get('detailed_output', True))
                 self.show_project_branch_var.set(config.get('show_project_and_branch', True))
                 self.pull_latest_var.set(config.get('pull_latest_code', False))
+                self.fetch_only_var.set(config.get('sync_mode') == 'fetch')
                 self.extract_all_branches_var.set(config.get('extract_all_branches', False))
+                self.max_workers_var.set(config.get('max_workers') or DEFAULT_MAX_WORKERS)
+                self.extraction_engine_var.set(config.get('extraction_engine') or 'threads')
+                output_formats = config.get('output_formats') or ['txt']
+                for name, var in self.output_format_vars.items():
+                    var.set(name in output_formats)
+                self.log_max_lines = max(1, int(config.get('log_max_lines') or DEFAULT_LOG_MAX_LINES))
                 
                 # 加载项目名称映射
                 project_names = config.get('project_names', {})
@@ -639,11 +889,12 @@ class GitCommitToolGUI:
     
     def validate_config(self):
         """验证配置"""
-        if not self.root_dir_var.get():
+        if not self.get_root_directories():
             messagebox.showerror("配置错误", "请选择根目录！", icon='error')
             return False
         
-        if not self.author_var.get():
+        # 配置文件中设置了 authors 时为团队模式，不使用界面上的作者名
+        if not self.author_var.get() and not self.file_config.get('authors'):
             messagebox.showerror("配置错误", "请输入作者名！", icon='error')
             return False
         
@@ -651,14 +902,19 @@ class GitCommitToolGUI:
             messagebox.showerror("配置错误", "请选择输出目录！", icon='error')
             return False
         
-        if not os.path.exists(self.root_dir_var.get()):
-            messagebox.showerror("配置错误", "根目录不存在！", icon='error')
+        missing = [path for path in self.get_root_directories() if not os.path.exists(path)]
+        if missing:
+            messagebox.showerror("配置错误", f"根目录不存在：\n{chr(10).join(missing)}", icon='error')
             return False
         
         if not os.path.exists(self.output_dir_var.get()):
             messagebox.showerror("配置错误", "输出目录不存在！", icon='error')
             return False
         
+        if not self.get_output_formats():
+            messagebox.showerror("配置错误", "请至少选择一种输出格式！", icon='error')
+            return False
+        
         return True
     
     def start_extraction(self):
@@ -669,20 +925,37 @@ class GitCommitToolGUI:
         # 保存当前配置
         self.save_config()
         
+        # 清空上次的结果
+        self.results_view.clear()
+        self.results_count_var.set("共 0 条提交")
+        
         # 禁用按钮并开始进度条
         self.extract_btn.config(state='disabled')
+        self.cancel_btn.config(state='normal')
         self.progress.start()
         
+        self.run_control = RunControl(git_timeout=self.file_config.get('git_timeout', DEFAULT_GIT_TIMEOUT),
+                                      profiler=RunProfiler() if self.profile_var.get() else None)
+        
         # 在新线程中执行提取操作
         threading.Thread(target=self.extract_commits, daemon=True).start()
     
+    def cancel_extraction(self):
+        """取消正在进行的提取，结束正在运行的 git 进程"""
+        if self.run_control is not None and not self.run_control.cancelled:
+            self.log_message("⏹️ 正在取消...")
+            self.cancel_btn.config(state='disabled')
+            self.run_control.cancel()
+    
     def extract_commits(self):
         """提取提交记录的主要逻辑"""
+        commit_cache = None
+        writer = None
         try:
             self.log_message("🔍 开始搜索Git仓库...")
             
             # 获取配置
-            root_directory = self.root_dir_var.get()
+            root_directories = self.get_root_directories()
             author = self.author_var.get()
             output_directory = self.output_dir_var.get()
             
@@ -701,30 +974,50 @@ class GitCommitToolGUI:
             project_names = self.parse_project_names()
             show_project_and_branch = self.show_project_branch_var.get()
             pull_latest_code = self.pull_latest_var.get()
+            sync_mode = 'fetch' if self.fetch_only_var.get() else 'pull'
             extract_all_branches = self.extract_all_branches_var.get()
+            max_workers = self.max_workers_var.get()
+            extraction_engine = self.extraction_engine_var.get()
+            force_rescan = self.force_rescan_var.get()
+            use_repo_index = self.file_config.get('use_repo_index', True)
+            profiler = self.run_control.profiler
+            set_git_backend(self.file_config.get('git_backend') or 'subprocess')
+            set_message_normalizer(types=self.file_config.get('message_types'),
+                                   noise=self.file_config.get('message_noise'),
+                                   ticket_pattern=self.file_config.get('ticket_pattern'))
             
             # 搜索Git仓库
-            git_repos = find_git_repos(root_directory)
+            git_repos = find_git_repos(root_directories[0] if len(root_directories) == 1 else root_directories,
+                                       prune_dirs=self.file_config.get('prune_directories'),
+                                       max_workers=max_workers,
+                                       index_file=get_repo_index_path() if use_repo_index else None,
+                                       force_rescan=force_rescan, profiler=profiler)
             self.log_message(f"✅ 找到 {len(git_repos)} 个Git仓库")
             
-            all_commits = []
-            all_messages = []
+            # 去除重复的仓库（同一路径、同一仓库的 worktree），提交按哈希去重
+            deduplicator = None
+            if self.file_config.get('deduplicate', True):
+                git_repos, skipped_repos = dedupe_git_repos(git_repos, extract_all_branches)
+                for repo, duplicate_of in skipped_repos:
+                    self.log_message(f"🔁 跳过重复的仓库 {repo}（与 {duplicate_of} 相同）")
+                deduplicator = CommitDeduplicator()
             
-            # 处理每个仓库
-            for i, repo in enumerate(git_repos, 1):
-                self.log_message(f"📂 处理仓库 {i}/{len(git_repos)}: {os.path.basename(repo)}")
-                
-                commits, messages = get_git_commits(
-                    repo, start_date, end_date, author, 
-                    pull_latest_code, extract_all_branches
-                )
-                
+            # 并行处理每个仓库，按完成顺序输出进度；asyncio 引擎在本线程的事件循环中回调，不再需要每个仓库一个线程
+            def on_repo_done(done, total, repo, commits):
                 if commits:
-                    all_commits.extend(commits)
-                    all_messages.extend(messages)
-                    self.log_message(f"   ✅ 找到 {len(commits)} 个提交")
+                    self.log_message(f"📂 [{done}/{total}] {os.path.basename(repo)}: ✅ 找到 {len(commits)} 个提交")
                 else:
-                    self.log_message(f"   ⚪ 无提交记录")
+                    self.log_message(f"📂 [{done}/{total}] {os.path.basename(repo)}: ⚪ 无提交记录")
+            
+            commit_cache = None
+            if self.file_config.get('use_commit_index', False):
+                commit_cache = CommitIndex(get_commit_index_path())
+            elif self.file_config.get('use_commit_cache', True):
+                commit_cache = CommitCache(get_commit_cache_path())
+            
+            def on_repo_synced(repo, ok, error):
+                if not ok:
+                    self.log_message(f"⚠️ {os.path.basename(repo)} 同步失败，使用本地记录: {error}")
             
             # 生成输出文件名
             if start_date == today and end_date == today:
@@ -732,29 +1025,94 @@ class GitCommitToolGUI:
             else:
                 date_part = f"{start_date}_to_{end_date}"
             
-            output_file = os.path.join(output_directory, f"git_commits_{date_part}.txt")
+            output_base = os.path.join(output_directory, f"git_commits_{date_part}")
+            
+            # 每个仓库完成后按仓库顺序写入临时文件，全部完成后才替换为输出文件
+            team_authors = self.file_config.get('authors')
+            if team_authors:
+                # 团队模式：每个仓库只执行一次 git log，每位成员一份报告
+                author = AuthorMatcher(team_authors, use_mailmap=self.file_config.get('use_mailmap', True))
+                self.log_message(f"👥 团队模式: {', '.join(author.names)}")
+                writer = TeamReportWriter(output_base, author.names, self.get_output_formats(),
+                                          detailed_output, project_names, show_project_and_branch, profiler)
+            else:
+                writer = MultiFormatWriter(output_base, self.get_output_formats(),
+                                           detailed_output, project_names, show_project_and_branch, profiler)
+            
+            # 去重后的结果按仓库顺序写入文件并加入结果列表
+            def on_repo_commits(repo, commits):
+                writer.write_commits(commits)
+                if commits:
+                    self.results_queue.put(commits)
+            
+            extract_commits_from_repos(
+                git_repos, start_date, end_date, author,
+                pull_latest_code, extract_all_branches,
+                max_workers=max_workers,
+                on_repo_done=on_repo_done,
+                cache=commit_cache,
+                sync_mode=sync_mode,
+                sync_workers=self.file_config.get('sync_workers'),
+                sync_timeout=self.file_config.get('sync_timeout', DEFAULT_SYNC_TIMEOUT),
+                on_repo_synced=on_repo_synced,
+                engine=extraction_engine,
+                control=self.run_control,
+                on_repo_commits=on_repo_commits,
+                deduplicator=deduplicator
+            )
+            if deduplicator is not None and deduplicator.duplicates:
+                self.log_message(f"🔁 已去除 {deduplicator.duplicates} 条在多个仓库中重复出现的提交")
+            if commit_cache is not None:
+                commit_cache.save()
+            
+            # 报告超时的仓库
+            if self.run_control.timed_out:
+                self.log_message(f"⏱️ {len(self.run_control.timed_out)} 个仓库超时，其提交未包含在结果中:")
+                for repo, error in self.run_control.timed_out:
+                    self.log_message(f"   {os.path.basename(repo)}: {error}")
             
             # 保存文件
-            if all_commits:
-                save_commits_to_file(
-                    all_commits, all_messages, output_file,
-                    detailed_output, project_names, show_project_and_branch
-                )
-                self.log_message(f"🎉 提取完成! 文件已保存至: {output_file}")
-                self.log_message(f"📊 总共找到 {len(all_commits)} 个提交记录")
+            if team_authors:
+                for name, count in writer.counts.items():
+                    self.log_message(f"👤 {name}: {count} 个提交记录")
+            if writer.count:
+                saved_files = writer.commit()
+                for saved_file in saved_files:
+                    self.log_message(f"🎉 提取完成! 文件已保存至: {saved_file}")
+                self.log_message(f"📊 总共找到 {writer.count} 个提交记录")
                 
-                # 询问是否打开文件
-                self.root.after(0, lambda: self.ask_open_file(output_file))
+                # 询问是否打开文件（优先打开文本报告）
+                text_files = [path for path in saved_files if path.endswith(OUTPUT_FORMATS['txt'])]
+                open_file = text_files[0] if text_files else saved_files[0]
+                self.root.after(0, lambda: self.ask_open_file(open_file))
             else:
+                writer.abort()
                 self.log_message(f"⚠️ 在 {start_date} 到 {end_date} 期间未找到任何提交记录")
                 self.root.after(0, lambda: messagebox.showinfo("提示", "未找到任何提交记录", icon='info'))
+            
+            # 保存性能分析报告
+            if profiler is not None:
+                profile_prefix = os.path.join(output_directory, f"git_commits_{date_part}_profile")
+                _, text_file = profiler.save(profile_prefix)
+                self.log_message(f"📈 性能分析报告已保存至: {text_file}")
+        
+        except ExtractionCancelled:
+            if writer is not None:
+                writer.abort()
+            if commit_cache is not None:
+                commit_cache.save()
+            self.log_message("🛑 提取已取消，未生成输出文件")
         
         except Exception as e:
+            if writer is not None:
+                writer.abort()
             error_msg = f"❌ 提取过程中发生错误: {str(e)}"
             self.log_message(error_msg)
             self.root.after(0, lambda: messagebox.showerror("错误", error_msg))
         
         finally:
+            if commit_cache is not None:
+                commit_cache.close()
             # 恢复UI状态
             self.root.after(0, self.extraction_finished)
     
@@ -776,6 +1134,7 @@ class GitCommitToolGUI:
         """提取完成后恢复UI状态"""
         self.progress.stop()
         self.extract_btn.config(state='normal')
+        self.cancel_btn.config(state='disabled')
         self.log_message("🏁 操作完成")
 
 
@@ -799,6 +1158,9 @@ def main():
     
     # 优雅退出
     def on_closing():
+        # 关闭窗口时结束仍在运行的 git 进程
+        if app.run_control is not None:
+            app.run_control.cancel()
         root.quit()
         root.destroy()
     
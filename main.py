@@ -5,26 +5,64 @@ LastEditors: Huang Zhaoqi
 Date: 2024-10-14 16:43:27
 LastEditTime: 2025-05-29 09:57:41
 '''
-from git_commit_tool import find_git_repos, get_git_commits, save_commits_to_file, load_config
+from git_commit_tool import (find_git_repos, extract_commits_from_repos, MultiFormatWriter, TeamReportWriter,
+                             AuthorMatcher, load_config, get_repo_index_path, CommitCache, get_commit_cache_path,
+                             CommitIndex, get_commit_index_path, DEFAULT_SYNC_TIMEOUT, RunProfiler,
+                             RunControl, ExtractionCancelled, DEFAULT_GIT_TIMEOUT, set_git_backend,
+                             dedupe_git_repos, CommitDeduplicator, watch_commits, DEFAULT_WATCH_INTERVAL,
+                             set_message_normalizer)
 import os
+import sys
 import datetime
+import argparse
 
 if __name__ == "__main__":
+    # 命令行参数
+    parser = argparse.ArgumentParser(description="提取多个 Git 仓库中指定作者的提交记录")
+    parser.add_argument('--rescan', action='store_true', help="忽略仓库查找索引，完整重新扫描根目录")
+    parser.add_argument('--profile', action='store_true', help="记录各阶段和各仓库的耗时，并在输出目录生成性能分析报告")
+    parser.add_argument('--index-only', action='store_true',
+                        help="只从提交索引查询，不执行 git（需要开启 use_commit_index 并已同步过）")
+    parser.add_argument('--watch', action='store_true',
+                        help="守护模式：持续运行，仓库有新提交时只重新提取该仓库并更新当天的报告")
+    parser.add_argument('--interval', type=float, default=None,
+                        help=f"守护模式的轮询间隔（秒，默认读取 watch_interval，未配置时为 {DEFAULT_WATCH_INTERVAL}）")
+    args = parser.parse_args()
+
     # 加载配置
     config = load_config()
 
     # 从配置文件中获取变量
-    root_directory = config.get('root_directory', 'C:\\workspace')
+    root_directory = config.get('root_directory', 'C:\\workspace')  # 可以是一个目录，也可以是多个目录的列表
     author = config.get('author', 'YourName')
+    authors = config.get('authors') or []  # 团队模式：配置后为每位成员分别生成报告，忽略 author
+    use_mailmap = config.get('use_mailmap', True)  # 团队模式下是否同时按仓库的 .mailmap 匹配作者
     output_directory = config.get('output_directory', '~/Desktop')
     today = datetime.datetime.now().strftime('%Y-%m-%d') # 获取当前日期
     start_date = config.get("start_date", today) # 从配置获取开始日期，若未提供则使用今天的日期
     end_date = config.get("end_date", today) # 从配置获取结束日期，若未提供则使用今天的日期
     detailed_output = config.get('detailed_output', True)  # 是否输出详细日志
+    output_formats = config.get('output_formats') or ['txt']  # 输出格式，可同时输出多种
     project_names = config.get('project_names', {})  # 获取项目名称映射
     show_project_and_branch = config.get('show_project_and_branch', True)  # 获取控制输出的配置
     pull_latest_code = config.get('pull_latest_code', False)  # 是否在提取日志之前拉取最新代码
+    sync_mode = config.get('sync_mode') or 'pull'  # 同步方式：pull 或只 fetch
+    sync_workers = config.get('sync_workers')  # 同步阶段的并发数
+    sync_timeout = config.get('sync_timeout', DEFAULT_SYNC_TIMEOUT)  # 单个仓库同步的超时时间（秒）
+    git_timeout = config.get('git_timeout', DEFAULT_GIT_TIMEOUT)  # 单个 git 命令的超时时间（秒）
     extract_all_branches = config.get('extract_all_branches', False)  # 是否提取所有分支的提交记录
+    max_workers = config.get('max_workers')  # 并行处理仓库的线程数，未配置时使用默认值
+    extraction_engine = config.get('extraction_engine') or 'threads'  # 提取引擎：threads 或 asyncio
+    git_backend = config.get('git_backend') or 'subprocess'  # 读取引用和提交的后端：subprocess、pygit2 或 auto
+    prune_directories = config.get('prune_directories')  # 查找仓库时跳过的目录，未配置时使用默认列表
+    use_repo_index = config.get('use_repo_index', True)  # 是否使用仓库查找索引做增量扫描
+    use_commit_cache = config.get('use_commit_cache', True)  # 是否缓存提交记录，引用未变化的仓库不再执行 git log
+    use_commit_index = config.get('use_commit_index', False)  # 是否使用 SQLite 提交索引（开启后取代提交记录缓存）
+    deduplicate = config.get('deduplicate', True)  # 是否去除重复的仓库（同一路径、同一仓库的 worktree）和重复的提交
+    watch_interval = args.interval or config.get('watch_interval') or DEFAULT_WATCH_INTERVAL  # 守护模式的轮询间隔（秒）
+    message_types = config.get('message_types')  # 提交信息中识别的约定式提交类型，未配置时使用默认列表
+    message_noise = config.get('message_noise')  # 从提交信息中去除的噪音（正则表达式），未配置时使用默认列表
+    ticket_pattern = config.get('ticket_pattern')  # 工单号的正则表达式，未配置时识别 ABC-123 和 #123
 
     # 确保start_date和end_date是有效的日期
     if not start_date:
@@ -38,22 +76,133 @@ if __name__ == "__main__":
     else:
         date_part = f"{start_date}_to_{end_date}"  # 日期范围
 
+    # 启用性能分析
+    profiler = RunProfiler() if args.profile else None
+
+    # 选择 git 后端（pygit2 未安装时回退到 git 命令行）
+    set_git_backend(git_backend)
+
+    # 提交信息规范化规则（去除前缀和噪音、提取类型 / 范围 / 工单号）
+    set_message_normalizer(types=message_types, noise=message_noise, ticket_pattern=ticket_pattern)
+
     # 查找所有 git 仓库
-    git_repos = find_git_repos(root_directory)
-    all_commits = []
-    all_messages = []
-
-    # 遍历每个仓库，获取提交记录
-    for repo in git_repos:
-        commits, messages = get_git_commits(repo, start_date, end_date, author, pull_latest_code, extract_all_branches)
-        if commits:
-            all_commits.extend(commits)
-            all_messages.extend(messages)
-
-    # 保存提交记录到指定文件夹
-    output_file = os.path.join(os.path.expanduser(output_directory), f"git_commits_{date_part}.txt")
-    
-    if all_commits:
-        save_commits_to_file(all_commits, all_messages, output_file, detailed_output, project_names, show_project_and_branch)
+    git_repos = find_git_repos(root_directory, prune_dirs=prune_directories, max_workers=max_workers,
+                               index_file=get_repo_index_path() if use_repo_index else None,
+                               force_rescan=args.rescan, profiler=profiler)
+    deduplicator = None
+    if deduplicate:
+        git_repos, skipped_repos = dedupe_git_repos(git_repos, extract_all_branches)
+        for repo, duplicate_of in skipped_repos:
+            print(f"🔁 跳过重复的仓库 {repo}（与 {duplicate_of} 相同）")
+        deduplicator = CommitDeduplicator()
+
+    if authors:
+        # 团队模式：每个仓库只执行一次 git log，在进程内按成员拆分，每位成员一份报告
+        author = AuthorMatcher(authors, use_mailmap=use_mailmap)
+
+    def create_writer(date_part, write_empty=False):
+        """报告在每个仓库完成后按仓库顺序流式写入临时文件，全部完成后再原子替换到输出路径"""
+        output_base = os.path.join(os.path.expanduser(output_directory), f"git_commits_{date_part}")
+        if authors:
+            return TeamReportWriter(output_base, author.names, output_formats, detailed_output, project_names,
+                                    show_project_and_branch, profiler, write_empty)
+        return MultiFormatWriter(output_base, output_formats, detailed_output, project_names,
+                                 show_project_and_branch, profiler)
+
+    if use_commit_index or args.index_only:
+        commit_cache = CommitIndex(get_commit_index_path())
     else:
-        print(f"No commits found for {start_date} to {end_date}")
\ No newline at end of file
+        commit_cache = CommitCache(get_commit_cache_path()) if use_commit_cache else None
+    # 退出（包括 sys.exit 和异常）时关闭提交索引的数据库连接
+    try:
+        control = RunControl(git_timeout=git_timeout, profiler=profiler)
+
+        if args.watch:
+            # 守护模式：只统计当天的提交，忽略配置的日期范围
+            def write_report(day, commits):
+                # 当天没有提交时同样重写报告，避免保留过期的内容
+                with create_writer(day, write_empty=True) as watch_writer:
+                    watch_writer.write_commits(commits)
+
+            def on_update(day, changed, commits, watcher):
+                stats = watcher.stats()
+                print(f"🔄 [{datetime.datetime.now().strftime('%H:%M:%S')}] {len(changed)} 个仓库有变化，"
+                      f"当天共 {len(commits)} 条提交 | 每轮 stat {stats['stat_calls_per_cycle']} 次，"
+                      f"CPU {stats['cpu_ms_per_cycle']} ms")
+                for repo, error in control.timed_out:
+                    print(f"  ⏱️ {repo}: {error}")
+                for repo, error in control.failed:
+                    print(f"  ❌ {repo}: {error}")
+
+            print(f"👀 守护模式：每 {watch_interval} 秒检查 {len(git_repos)} 个仓库，按 Ctrl-C 退出")
+            try:
+                watch_commits(git_repos, author, extract_all_branches, write_report, interval=watch_interval,
+                              max_workers=max_workers, cache=commit_cache, deduplicate=deduplicate, control=control,
+                              on_update=on_update)
+            except (KeyboardInterrupt, ExtractionCancelled):
+                control.cancel()
+                print("🛑 已退出守护模式")
+            if commit_cache is not None:
+                commit_cache.save()
+            sys.exit(0)
+
+        writer = create_writer(date_part)
+
+        # 并行获取每个仓库的提交记录
+        # Ctrl-C 时结束正在运行的 git 进程，已完成仓库的缓存仍会保存，但不生成输出文件
+        try:
+            if args.index_only:
+                # 直接查询索引，未同步过的仓库跳过
+                for repo in git_repos:
+                    if commit_cache.is_indexed(repo, extract_all_branches):
+                        commits = commit_cache.query(repo, start_date, end_date, author, extract_all_branches)
+                        writer.write_commits(deduplicator.filter(commits) if deduplicator is not None else commits)
+                    else:
+                        print(f"⚠️ 仓库尚未建立索引，已跳过: {repo}")
+            else:
+                extract_commits_from_repos(
+                    git_repos, start_date, end_date, author, pull_latest_code, extract_all_branches, max_workers,
+                    cache=commit_cache, sync_mode=sync_mode, sync_workers=sync_workers, sync_timeout=sync_timeout,
+                    engine=extraction_engine, control=control,
+                    on_repo_commits=lambda repo, commits: writer.write_commits(commits), deduplicator=deduplicator)
+        except (KeyboardInterrupt, ExtractionCancelled):
+            writer.abort()
+            print("🛑 已取消，未生成输出文件")
+            if commit_cache is not None:
+                commit_cache.save()
+            sys.exit(130)
+        except BaseException:
+            writer.abort()
+            raise
+        if commit_cache is not None:
+            commit_cache.save()
+
+        if deduplicator is not None and deduplicator.duplicates:
+            print(f"🔁 已去除 {deduplicator.duplicates} 条在多个仓库中重复出现的提交")
+
+        # 报告超时的仓库（其提交未包含在本次结果中）
+        if control.timed_out:
+            print(f"⏱️ {len(control.timed_out)} 个仓库超时:")
+            for repo, error in control.timed_out:
+                print(f"  {repo}: {error}")
+
+        # 保存提交记录到指定文件夹
+        if authors:
+            for name, count in writer.counts.items():
+                print(f"👤 {name}: {count} 条提交")
+        if writer.count:
+            for saved_file in writer.commit():
+                print(f"File successfully saved at: {saved_file}")
+        else:
+            writer.abort()
+            print(f"No commits found for {start_date} to {end_date}")
+
+        # 输出性能分析报告
+        if profiler is not None:
+            print(profiler.format_text())
+            profile_prefix = os.path.join(os.path.expanduser(output_directory), f"git_commits_{date_part}_profile")
+            json_file, text_file = profiler.save(profile_prefix)
+            print(f"📈 性能分析报告已保存: {text_file}, {json_file}")
+    finally:
+        if commit_cache is not None:
+            commit_cache.close()
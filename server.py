@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Git提交日志提取工具 - 本地 HTTP 查询服务
+在本机提供 JSON 接口，供看板等程序直接查询工作区中指定作者、日期范围的提交，无需解析文本报告。
+
+查询结果保存在内存中的 LRU 缓存里，并带有 ETag；只有仓库的引用发生变化（通过 stat 引用文件判断，
+不启动 git）时缓存才会失效，因此重复轮询几乎没有开销。
+
+用法示例:
+    python server.py --port 8765
+    curl "http://127.0.0.1:8765/api/commits?author=YourName&since=2024-01-01&until=2024-01-31"
+
+接口:
+    GET /api/commits?author=&since=&until=&all_branches=   提交列表（日期默认今天，其余默认读取配置）
+    GET /api/repos                                         工作区中的仓库列表
+    GET /health                                            服务状态、缓存命中数和轮询开销
+"""
+
+import sys
+import json
+import time
+import hashlib
+import argparse
+import datetime
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from git_commit_tool import (find_git_repos, extract_commits_from_repos, load_config, get_repo_index_path,
+                             CommitCache, get_commit_cache_path, CommitIndex, get_commit_index_path,
+                             RunControl, DEFAULT_GIT_TIMEOUT, set_git_backend, dedupe_git_repos,
+                             CommitDeduplicator, RepoWatcher, commit_to_record, set_message_normalizer,
+                             project_name_resolver)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# 内存中最多缓存的响应数
+DEFAULT_RESPONSE_CACHE_ENTRIES = 256
+# 两次检查仓库引用之间的最短间隔（秒），期间的请求直接使用缓存
+DEFAULT_REF_CHECK_INTERVAL = 1.0
+
+
+class ResponseCache:
+    """
+    按查询参数缓存 JSON 响应的 LRU 缓存。
+
+    每条缓存记录生成时的“代数”，仓库引用变化时代数加一，旧代数的缓存随即失效。可在多个线程中共享。
+    """
+
+    def __init__(self, max_entries=DEFAULT_RESPONSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回 (ETag, 响应内容)，不存在或已失效时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != self.generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, generation, body):
+        """
+        保存响应；generation 为开始计算时的代数，计算期间引用已变化时不保存。
+
+        :return: 响应的 ETag
+        """
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        with self._lock:
+            if generation == self.generation:
+                self._entries[key] = (generation, etag, body)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return etag
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+class CommitQueryService:
+    """查询服务：持有仓库列表、提交缓存和响应缓存，HTTP 请求处理器通过它回答查询"""
+
+    def __init__(self, config, ref_check_interval=DEFAULT_REF_CHECK_INTERVAL, config_path="config.yaml"):
+        """
+        :param config: load_config 读取的配置
+        :param ref_check_interval: 两次检查仓库引用之间的最短间隔（秒）
+        :param config_path: 配置文件路径，仓库查找索引、提交缓存和提交索引保存在它所在的目录
+        """
+        self.config = config
+        self.config_path = config_path
+        self.ref_check_interval = ref_check_interval
+        self.project_names = project_name_resolver(config.get('project_names'))
+        self.responses = ResponseCache(config.get('server_cache_entries') or DEFAULT_RESPONSE_CACHE_ENTRIES)
+
+        set_git_backend(config.get('git_backend') or 'subprocess')
+        self.normalizer = set_message_normalizer(types=config.get('message_types'),
+                                                 noise=config.get('message_noise'),
+                                                 ticket_pattern=config.get('ticket_pattern'))
+        repo_index = get_repo_index_path(config_path) if config.get('use_repo_index', True) else None
+        repos = find_git_repos(config.get('root_directory', 'C:\\workspace'),
+                               prune_dirs=config.get('prune_directories'), max_workers=config.get('max_workers'),
+                               index_file=repo_index)
+        self.deduplicate = config.get('deduplicate', True)
+        if self.deduplicate:
+            # 每次查询可以指定是否查询所有分支，这里按只查询当前分支的（较保守的）规则去重，
+            # 查询所有分支时工作树之间重复的提交再由 CommitDeduplicator 去除
+            repos, _ = dedupe_git_repos(repos, False)
+        self.repos = repos
+
+        if config.get('use_commit_index', False):
+            self.cache = CommitIndex(get_commit_index_path(config_path))
+        elif config.get('use_commit_cache', True):
+            self.cache = CommitCache(get_commit_cache_path(config_path))
+        else:
+            self.cache = None
+
+        self._watcher = RepoWatcher(self.repos)
+        self._watch_lock = threading.Lock()
+        self._last_check = time.monotonic()
+
+    def check_refs(self):
+        """距上次检查超过 ref_check_interval 时 stat 各仓库的引用文件，有变化则使响应缓存失效"""
+        with self._watch_lock:
+            now = time.monotonic()
+            if now - self._last_check < self.ref_check_interval:
+                return
+            self._last_check = now
+            changed = self._watcher.poll()
+            # 缓存失效即完成处理，确认这些变化
+            for repo in changed:
+                self._watcher.commit(repo)
+        if changed:
+            self.responses.invalidate()
+
+    def query_commits(self, author, since, until, extract_all_branches):
+        """执行一次提取，返回 JSON 可序列化的结果"""
+        # 提交缓存、提交索引和 git 后端都可在多个线程中共享，每个请求使用自己的 RunControl，并发的查询互不影响
+        control = RunControl(git_timeout=self.config.get('git_timeout', DEFAULT_GIT_TIMEOUT))
+        commits = extract_commits_from_repos(
+            self.repos, since, until, author, False, extract_all_branches, self.config.get('max_workers'),
+            cache=self.cache, engine=self.config.get('extraction_engine') or 'threads', control=control,
+            deduplicator=CommitDeduplicator() if self.deduplicate else None)
+        if self.cache is not None:
+            self.cache.save()
+        parsed_messages = self.normalizer.normalize_commits(commits)
+        return {
+            'author': author,
+            'since': since,
+            'until': until,
+            'all_branches': extract_all_branches,
+            'count': len(commits),
+            'timed_out': [{'repo': repo, 'error': error} for repo, error in control.timed_out],
+            'commits': [commit_to_record(commit, self.project_names, parsed)
+                        for commit, parsed in zip(commits, parsed_messages)],
+        }
+
+    def stats(self):
+        return {
+            'repos': len(self.repos),
+            'cache_generation': self.responses.generation,
+            'cache_hits': self.responses.hits,
+            'cache_misses': self.responses.misses,
+            'ref_checks': self._watcher.stats(),
+        }
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"{name} 必须是 YYYY-MM-DD 格式的日期: {value}")
+
+
+class CommitQueryHandler(BaseHTTPRequestHandler):
+    """JSON 接口的请求处理器，service 由 make_server 设置"""
+
+    service = None
+    server_version = 'GitCommitTool'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == '/api/commits':
+                self._send_cached(self._commits_key(params), lambda key: self.service.query_commits(*key[1:]))
+            elif url.path == '/api/repos':
+                self._send_cached(('repos',), lambda key: {'repos': self.service.repos})
+            elif url.path == '/health':
+                self._send_json(200, dict(self.service.stats(), status='ok'))
+            else:
+                self._send_json(404, {'error': f"未知的接口: {url.path}"})
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+
+    def _commits_key(self, params):
+        config = self.service.config
+        today = datetime.date.today().strftime('%Y-%m-%d')
+        author = params.get('author') or config.get('author', '')
+        if not author:
+            raise ValueError("缺少 author 参数")
+        since = _parse_date(params.get('since') or today, 'since')
+        until = _parse_date(params.get('until') or since, 'until')
+        all_branches = params.get('all_branches')
+        if all_branches is None:
+            all_branches = bool(config.get('extract_all_branches', False))
+        else:
+            all_branches = all_branches.lower() in ('1', 'true', 'yes')
+        return ('commits', author, since, until, all_branches)
+
+    def _send_cached(self, key, compute):
+        """返回缓存的响应；缓存未命中时计算并缓存。请求带有相同的 If-None-Match 时返回 304"""
+        service = self.service
+        service.check_refs()
+        cached = service.responses.get(key)
+        if cached is None:
+            generation = service.responses.generation
+            body = json.dumps(compute(key), ensure_ascii=False).encode('utf-8')
+            etag = service.responses.put(key, generation, body)
+        else:
+            etag, body = cached
+
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self._send_body(200, body, etag)
+
+    def _send_json(self, status, data):
+        self._send_body(status, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def _send_body(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 只输出请求行和状态码，避免刷屏时掩盖其他信息
+        print(f"🌐 {self.address_string()} {format % args}", file=sys.stderr)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """创建绑定到 host:port 的多线程 HTTP 服务（调用 serve_forever() 开始处理请求）"""
+    handler = type('BoundCommitQueryHandler', (CommitQueryHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Git 提交日志提取工具本地 HTTP 查询服务")
+    parser.add_argument('--host', default=None, help=f"监听地址 (默认 {DEFAULT_HOST}，只允许本机访问)")
+    parser.add_argument('--port', type=int, default=None, help=f"监听端口 (默认 {DEFAULT_PORT})")
+    parser.add_argument('--config', default="config.yaml", help="配置文件路径 (默认 config.yaml)")
+    args = parser.parse_args()
+
+    config = load_config(args.config) or {}
+    host = args.host or config.get('server_host') or DEFAULT_HOST
+    port = args.port or config.get('server_port') or DEFAULT_PORT
+
+    print("🔍 正在查找Git仓库...", file=sys.stderr)
+    service = CommitQueryService(config, config_path=args.config)
+    server = make_server(service, host, port)
+    print(f"🚀 查询服务已启动: http://{host}:{server.server_address[1]}/ （{len(service.repos)} 个仓库，"
+          f"按 Ctrl-C 退出）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 查询服务已停止", file=sys.stderr)
+    finally:
+        server.server_close()
+        if service.cache is not None:
+            service.cache.save()
+            service.cache.close()
+
+
+if __name__ == "__main__":
+    main()
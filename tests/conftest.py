@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+测试公用的 fixture：在临时目录中生成真实的 git 仓库（不访问网络），git 的作者和提交者信息由环境变量指定。
+"""
+
+import os
+import sys
+import time
+import datetime
+import subprocess
+
+import pytest
+
+# 被测模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_AUTHOR = "Test User"
+TEST_EMAIL = "test.user@example.com"
+
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch):
+    """不依赖全局 git 配置：提交身份由环境变量指定，不读取系统级配置"""
+    monkeypatch.setenv('GIT_AUTHOR_NAME', TEST_AUTHOR)
+    monkeypatch.setenv('GIT_AUTHOR_EMAIL', TEST_EMAIL)
+    monkeypatch.setenv('GIT_COMMITTER_NAME', TEST_AUTHOR)
+    monkeypatch.setenv('GIT_COMMITTER_EMAIL', TEST_EMAIL)
+    monkeypatch.setenv('GIT_CONFIG_NOSYSTEM', '1')
+
+
+def git(repo_path, *args, **env):
+    """在仓库中执行 git 命令，返回去掉首尾空白的标准输出"""
+    process_env = dict(os.environ, **env)
+    result = subprocess.run(['git'] + list(args), cwd=repo_path, env=process_env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return result.stdout.decode('utf-8').strip()
+
+
+class RepoFactory:
+    """在临时目录下创建仓库并追加提交"""
+
+    git = staticmethod(git)
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def create(self, name, commits=1, branch='main'):
+        """
+        :param name: 仓库目录名（可以包含子目录）
+        :param commits: 初始提交数
+        :return: 仓库路径
+        """
+        repo_path = os.path.join(self.root, name)
+        os.makedirs(repo_path)
+        git(repo_path, 'init', '-q')
+        git(repo_path, 'symbolic-ref', 'HEAD', f'refs/heads/{branch}')
+        for i in range(commits):
+            self.commit(repo_path, f"feat: initial change {i}")
+        return repo_path
+
+    @staticmethod
+    def commit(repo_path, message, author=None, when=None):
+        """
+        追加一个空提交。
+
+        :param author: (作者名, 邮箱)，默认 TEST_AUTHOR
+        :param when: 提交时间（datetime），默认当前时间
+        :return: 新提交的哈希
+        """
+        name, email = author or (TEST_AUTHOR, TEST_EMAIL)
+        date = (when or datetime.datetime.now()).strftime('%Y-%m-%dT%H:%M:%S')
+        git(repo_path, 'commit', '-q', '--allow-empty', '-m', message,
+            GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=email, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+        # 引用文件的 mtime 精度有限，间隔一小段时间，保证 RepoWatcher 能观察到连续的变化
+        time.sleep(0.01)
+        return git(repo_path, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture
+def repos(tmp_path):
+    return RepoFactory(tmp_path / 'workspace')
+
+
+@pytest.fixture
+def today():
+    return datetime.date.today().strftime('%Y-%m-%d')
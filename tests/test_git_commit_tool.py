@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""git_commit_tool 的测试：后端一致性、流式解析、作者表达式、缓存与索引、原子写入、提交信息规范化、项目名称映射和守护模式"""
+
+import os
+import re
+import json
+import datetime
+
+import pytest
+
+import benchmark
+from git_commit_tool import (
+    _CommitStreamParser, _bre_to_regex, _write_json_atomic, Commit, CommitCache, CommitIndex, MessageNormalizer,
+    ProjectNameResolver, MultiFormatWriter, TeamReportWriter, RepoWatcher, RunControl, RunProfiler,
+    ExtractionCancelled, get_git_commits, extract_commits_from_repos, iter_repo_commits, watch_commits,
+    find_git_repos, EXTRACTION_ENGINES,
+)
+from conftest import TEST_AUTHOR
+
+
+def _rows(commits):
+    return [(c.hash, c.author, c.timestamp, c.tz_offset, c.message, c.repo, c.branch) for c in commits]
+
+
+# ---------------------------------------------------------------- 后端一致性
+
+@pytest.fixture(scope='module')
+def synthetic_workspace(tmp_path_factory):
+    """benchmark.py 生成的合成工作区（含边界情况仓库），整个模块共用"""
+    root = str(tmp_path_factory.mktemp('synthetic'))
+    mp = pytest.MonkeyPatch()
+    mp.setenv('GIT_COMMITTER_NAME', TEST_AUTHOR)
+    mp.setenv('GIT_COMMITTER_EMAIL', 'test.user@example.com')
+    try:
+        benchmark.generate_workspace(root, repos=4, commits=30, branches=2, branch_commits=5, depth=2,
+                                     noise_dirs=1, days=7)
+        benchmark.generate_edge_cases(root, days=7)
+    finally:
+        mp.undo()
+    today = datetime.date.today()
+    return root, (today - datetime.timedelta(days=7)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')
+
+
+def test_backends_agree_on_synthetic_repos(synthetic_workspace):
+    root, start_date, end_date = synthetic_workspace
+    assert benchmark.check_backends(root, start_date, end_date) == []
+
+
+@pytest.mark.parametrize('extract_all_branches', [False, True])
+def test_engines_agree_on_synthetic_repos(synthetic_workspace, extract_all_branches):
+    root, start_date, end_date = synthetic_workspace
+    repos = find_git_repos(root)
+    results = [_rows(extract_commits_from_repos(repos, start_date, end_date, benchmark.BENCH_AUTHOR, False,
+                                                extract_all_branches, 4, engine=engine))
+               for engine in EXTRACTION_ENGINES]
+    assert results[0]
+    assert all(result == results[0] for result in results[1:])
+
+
+# ---------------------------------------------------------------- 流式解析
+
+def test_stream_parser_handles_any_chunk_boundary():
+    records = [(b'a' * 40, b'Alice', b'1700000000', b'+0800', b'feat: one\n\nsecond paragraph\n'),
+               (b'b' * 40, b'Bob', b'1700000001', b'-0130', b''),
+               (b'c' * 40, 'Renée'.encode('utf-8'), b'1700000002', b'+0000', 'fix: 中文\n'.encode('utf-8'))]
+    data = b''.join(field + b'\0' for record in records for field in record)
+    for size in (1, 2, 3, 7, 41, len(data)):
+        parser = _CommitStreamParser(5)
+        parsed = []
+        for start in range(0, len(data), size):
+            parsed.extend(parser.feed(data[start:start + size]))
+        assert parsed == records
+
+
+def test_stream_parser_keeps_incomplete_record():
+    parser = _CommitStreamParser(3)
+    assert parser.feed(b'a\0b\0') == []
+    assert parser.feed(b'c') == []
+    assert parser.feed(b'\0d\0') == [(b'a', b'b', b'c')]
+
+
+# ---------------------------------------------------------------- 作者表达式（git log --author 的 BRE）
+
+@pytest.mark.parametrize('pattern, text, expected', [
+    ('Alice', 'Alice <a@x>', True),
+    ('alice', 'Alice <a@x>', False),
+    ('C++', 'C++ Dev <c@x>', True),
+    ('Alice+', 'Alice+ <a@x>', True),
+    ('Alice+', 'Aliceee <a@x>', False),
+    ('Alice\\+', 'Aliceee <a@x>', True),
+    ('Alice (Dev)', 'Alice (Dev) <a@x>', True),
+    ('\\(Dev\\|Ops\\)', 'Ops <o@x>', True),
+    ('Ali.e', 'Alize <a@x>', True),
+    ('^Alice', 'Bob Alice <b@x>', False),
+    ('a^b', 'a^b <x@x>', True),
+    ('x$y', 'x$y <x@x>', True),
+    ('>$', 'Alice <a@x>', True),
+    ('*', 'Star* <s@x>', True),
+    ('*', 'Alice <a@x>', False),
+    ('\\(*\\)x', '*x <s@x>', True),
+    ('[bot]', 'build-o <b@x>', True),
+    ('[[:upper:]]\\{3\\}', 'ABC <a@x>', True),
+    ('[[:upper:]]\\{3\\}', 'ABc <a@x>', False),
+    ('l\\{2\\}', 'Allan <a@x>', True),
+    ('[]a]', '] <x@x>', True),
+    ('[^a-z]', 'abc', False),
+    ('\\(ab\\)\\1', 'abab <x@x>', True),
+    ('{1}', '{1} <x@x>', True),
+    ('a?', 'a? <x@x>', True),
+    ('a?', 'b <x@x>', False),
+])
+def test_bre_to_regex(pattern, text, expected):
+    assert bool(re.search(_bre_to_regex(pattern), text)) == expected
+
+
+def test_bre_to_regex_rejects_unmatched_bracket():
+    with pytest.raises(re.error):
+        _bre_to_regex('[abc')
+
+
+# ---------------------------------------------------------------- 提交缓存和提交索引
+
+def _extract(repo, today, cache=None, control=None):
+    return get_git_commits(repo, today, today, TEST_AUTHOR, False, False, cache=cache, control=control)
+
+
+def test_commit_cache_hit_incremental_and_rewrite(repos, today, tmp_path):
+    repo = repos.create('app', commits=3)
+    cache = CommitCache(str(tmp_path / 'cache.json'))
+
+    first = _extract(repo, today, cache)
+    assert len(first) == 3
+
+    profiler = RunProfiler()
+    assert _rows(_extract(repo, today, cache, RunControl(profiler=profiler))) == _rows(first)
+    assert profiler.counters.get('cache_hits') == 1
+
+    # 快进：只获取新增的提交
+    repos.commit(repo, "fix: fast forward")
+    profiler = RunProfiler()
+    commits = _extract(repo, today, cache, RunControl(profiler=profiler))
+    assert profiler.counters.get('cache_incremental') == 1
+    assert _rows(commits) == _rows(_extract(repo, today))
+
+    # 改写历史：丢弃的提交不能留在结果中
+    repos.git(repo, 'reset', '-q', '--hard', 'HEAD~2')
+    repos.commit(repo, "fix: rewritten")
+    profiler = RunProfiler()
+    commits = _extract(repo, today, cache, RunControl(profiler=profiler))
+    assert 'cache_incremental' not in profiler.counters
+    assert _rows(commits) == _rows(_extract(repo, today))
+    assert [c.message for c in commits] == ["fix: rewritten", "feat: initial change 1", "feat: initial change 0"]
+
+
+def test_commit_cache_saves_only_when_changed(repos, today, tmp_path):
+    repo = repos.create('app', commits=2)
+    cache_file = str(tmp_path / 'cache.json')
+    cache = CommitCache(cache_file)
+    expected = _rows(_extract(repo, today, cache))
+    cache.save()
+    assert json.load(open(cache_file, encoding='utf-8'))['entries']
+
+    reloaded = CommitCache(cache_file)
+    mtime = os.stat(cache_file).st_mtime_ns
+    assert _rows(_extract(repo, today, reloaded)) == expected
+    reloaded.save()
+    assert os.stat(cache_file).st_mtime_ns == mtime
+
+
+def test_commit_cache_caps_entries_per_repo(tmp_path):
+    cache = CommitCache(str(tmp_path / 'cache.json'), max_entries_per_repo=2)
+    for day in ('2024-01-01', '2024-01-02', '2024-01-03'):
+        cache.put(CommitCache.make_key('/repo', day, day, 'a', False), {}, 'main', [])
+    cache.save()
+    assert len(CommitCache(str(tmp_path / 'cache.json'))._entries) == 2
+
+
+def test_commit_index_incremental_and_rewrite(repos, today, tmp_path):
+    repo = repos.create('app', commits=3)
+    with CommitIndex(str(tmp_path / 'index.sqlite')) as index:
+        assert not index.is_indexed(repo, False)
+        assert _rows(_extract(repo, today, index)) == _rows(_extract(repo, today))
+        assert index.is_indexed(repo, False)
+
+        repos.commit(repo, "fix: fast forward")
+        profiler = RunProfiler()
+        assert _rows(_extract(repo, today, index, RunControl(profiler=profiler))) == _rows(_extract(repo, today))
+        assert profiler.counters.get('index_incremental') == 1
+
+        profiler = RunProfiler()
+        _extract(repo, today, index, RunControl(profiler=profiler))
+        assert profiler.counters.get('index_unchanged') == 1
+
+        repos.git(repo, 'reset', '-q', '--hard', 'HEAD~2')
+        repos.commit(repo, "fix: rewritten")
+        profiler = RunProfiler()
+        commits = _extract(repo, today, index, RunControl(profiler=profiler))
+        assert profiler.counters.get('index_rebuilt') == 1
+        assert _rows(commits) == _rows(_extract(repo, today))
+        assert "fix: fast forward" not in [c.message for c in commits]
+
+
+# ---------------------------------------------------------------- 原子写入
+
+def _commit(message, repo='/work/app', branch='main', author=TEST_AUTHOR):
+    return Commit('a' * 40, author, 1700000000, 480, message, repo, branch)
+
+
+def _leftover_tmp(directory):
+    return [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+
+def test_multi_format_writer_commits_all_formats(tmp_path):
+    base = str(tmp_path / 'report')
+    with MultiFormatWriter(base, ['txt', 'jsonl', 'csv', 'sqlite'], True, {}, True) as writer:
+        writer.write_commits([_commit("feat: one ABC-1"), _commit("fix: two")])
+    assert writer.count == 2
+    assert sorted(os.listdir(tmp_path)) == ['report.csv', 'report.jsonl', 'report.sqlite', 'report.txt']
+    records = [json.loads(line) for line in open(base + '.jsonl', encoding='utf-8')]
+    assert [(r['type'], r['tickets']) for r in records] == [('feat', 'ABC-1'), ('fix', '')]
+
+
+def test_writer_abort_keeps_existing_output(tmp_path):
+    target = tmp_path / 'report.txt'
+    target.write_text('previous report', encoding='utf-8')
+    with pytest.raises(RuntimeError):
+        with MultiFormatWriter(str(tmp_path / 'report'), ['txt'], False, {}, False) as writer:
+            writer.write_commits([_commit("feat: partial")])
+            raise RuntimeError("interrupted")
+    assert target.read_text(encoding='utf-8') == 'previous report'
+    assert _leftover_tmp(tmp_path) == []
+
+
+def test_write_json_atomic_replaces_file(tmp_path):
+    path = str(tmp_path / 'data.json')
+    _write_json_atomic(path, {'a': 1})
+    _write_json_atomic(path, {'b': ['中文']})
+    assert json.load(open(path, encoding='utf-8')) == {'b': ['中文']}
+    assert _leftover_tmp(tmp_path) == []
+
+
+def test_team_report_writer_disambiguates_file_names(tmp_path):
+    writer = TeamReportWriter(str(tmp_path / 'r'), ['A B', 'A_B', 'a b'], ['txt'], False, {}, False)
+    writer.write_commits([_commit("one", author='A B'), _commit("two", author='A_B'), _commit("three", author='a b')])
+    saved = writer.commit()
+    assert [os.path.basename(path) for path in saved] == ['r_A_B.txt', 'r_A_B_2.txt', 'r_a_b_3.txt']
+
+
+def test_team_report_writer_write_empty(tmp_path):
+    writer = TeamReportWriter(str(tmp_path / 'r'), ['Alice', 'Bob'], ['txt'], False, {}, False, write_empty=True)
+    writer.write_commits([_commit("one", author='Alice')])
+    assert len(writer.commit()) == 2
+
+
+# ---------------------------------------------------------------- 提交信息规范化
+
+@pytest.mark.parametrize('message, text, commit_type, scope, breaking, tickets', [
+    ("feat(api)!: drop v1 ABC-12", "drop v1 ABC-12", 'feat', 'api', True, ('ABC-12',)),
+    ("Fix: handle #42 and #42", "handle #42 and #42", 'fix', None, False, ('#42',)),
+    ("update readme", "update readme", None, None, False, ()),
+    ("feature: not a prefix", "feature: not a prefix", None, None, False, ()),
+    ("chore:  tidy\t up  ", "tidy up", 'chore', None, False, ()),
+    ("docs: para one\n\n\n\npara two\n", "para one\n\npara two", 'docs', None, False, ()),
+    ('fix: quote "x" [\'\'] done', "quote x done", 'fix', None, False, ()),
+    ("xABC-1 A-1 ABC-1x ABC-1", "xABC-1 A-1 ABC-1x ABC-1", None, None, False, ('ABC-1',)),
+])
+def test_message_normalizer(message, text, commit_type, scope, breaking, tickets):
+    parsed = MessageNormalizer().normalize(message)
+    assert (parsed.text, parsed.type, parsed.scope, parsed.breaking, parsed.tickets) == \
+        (text, commit_type, scope, breaking, tickets)
+
+
+def test_message_normalizer_custom_rules():
+    normalizer = MessageNormalizer(types=['wip'], noise=[r'\[skip ci\]'], ticket_pattern='')
+    parsed = normalizer.normalize("WIP: try it [skip ci] ABC-1")
+    assert (parsed.type, parsed.text, parsed.tickets) == ('wip', "try it ABC-1", ())
+    with pytest.raises(ValueError):
+        MessageNormalizer(noise=['('])
+
+
+def test_message_normalizer_normalize_many_reuses_results():
+    parsed = MessageNormalizer().normalize_many(["fix: a", "fix: b", "fix: a"])
+    assert [p.text for p in parsed] == ["a", "b", "a"]
+    assert parsed[0] is parsed[2]
+
+
+# ---------------------------------------------------------------- 项目名称映射
+
+def test_project_name_resolver_precedence():
+    resolver = ProjectNameResolver({
+        'web-*(*)': 'glob-all',
+        'web-*(release/*)': 'glob-release',
+        'web-*(main)': 'glob-main',
+        'web-shop(*)': 'shop-all',
+        'web-shop(release/*)': 'shop-release',
+        'web-shop(release/1.0)': 'shop-1.0',
+        '*(hotfix/*)': 'any-hotfix',
+        '*(hotfix/urgent-*)': 'any-urgent',
+        'api(*)': 'api-first',
+        'ap?(*)': 'api-second',
+        'unused(main)': '',
+    })
+    cases = [
+        ('web-shop', 'release/1.0', 'shop-1.0'),         # 完全精确
+        ('web-shop', 'release/2.0', 'shop-release'),     # 项目名精确
+        ('web-shop', 'dev', 'shop-all'),
+        ('web-blog', 'main', 'glob-main'),               # 分支名精确
+        ('web-blog', 'release/2.0', 'glob-release'),     # 更具体
+        ('web-blog', 'dev', 'glob-all'),
+        ('tool', 'hotfix/urgent-1', 'any-urgent'),
+        ('tool', 'hotfix/minor', 'any-hotfix'),
+        ('api', 'main', 'api-first'),                    # 项目名精确优先于通配符
+        ('apx', 'main', 'api-second'),
+        ('unused', 'main', ''),                          # 值为空的规则被忽略
+        ('other', 'main', ''),
+    ]
+    for project, branch, expected in cases:
+        assert resolver.resolve(os.path.join('/work', project), branch) == expected, (project, branch)
+
+
+def test_project_name_resolver_uses_config_order_as_tie_breaker():
+    resolver = ProjectNameResolver({'a*(*)': 'first', '*b(*)': 'second'})
+    assert resolver.resolve('/work/ab', 'main') == 'first'
+
+
+def test_project_name_resolver_ignores_keys_without_branch():
+    resolver = ProjectNameResolver({'web': 'bare', 'api(*)': 'api-'})
+    assert resolver.resolve('/work/web', 'main') == ''
+    assert resolver.resolve('/work/api', 'dev') == 'api-'
+
+
+# ---------------------------------------------------------------- 取消和守护模式
+
+def test_closing_iterator_early_does_not_cancel_run(repos, today):
+    repo_paths = [repos.create(f'r{i}') for i in range(3)]
+    control = RunControl()
+    results = iter_repo_commits(repo_paths, today, today, TEST_AUTHOR, False, False, 2, control=control)
+    next(results)
+    results.close()
+    assert not control.cancelled
+
+
+def test_cancel_only_affects_its_own_run():
+    first, second = RunControl(), RunControl()
+    first.cancel()
+    assert first.cancelled and not second.cancelled
+    with pytest.raises(ExtractionCancelled):
+        first.check()
+    second.check()
+
+
+def test_repo_watcher_reports_until_committed(repos):
+    repo = repos.create('app')
+    other = repos.create('other')
+    watcher = RepoWatcher([repo, other])
+    assert watcher.poll() == []
+
+    repos.git(repo, 'checkout', '-q', '-b', 'feature')
+    assert watcher.poll() == [repo]
+    # 没有 commit 确认的变化在之后每一轮都会再次报告
+    assert watcher.poll() == [repo]
+    watcher.commit(repo)
+    assert watcher.poll() == []
+
+    watcher.mark_stale()
+    assert watcher.poll() == [repo, other]
+    watcher.commit(repo)
+    assert watcher.poll() == [other]
+
+
+def test_watch_commits_retries_failed_repo(repos):
+    # 提交信息不同，两个仓库的提交哈希才不同（否则会被去重）
+    good = repos.create('good', commits=0)
+    repos.commit(good, "feat: good")
+    broken = repos.create('broken', commits=0)
+    repos.commit(broken, "feat: broken")
+    branch_ref = os.path.join(broken, '.git', 'refs', 'heads', 'main')
+    with open(branch_ref) as f:
+        head = f.read()
+    # 分支指向不存在的对象时 git log 失败；原地改写引用文件不会改变 RepoWatcher 监视的目录
+    with open(branch_ref, 'w') as f:
+        f.write('0' * 40 + '\n')
+
+    control = RunControl(git_timeout=30)
+    reports = []
+    updates = []
+
+    def on_update(day, changed, commits, watcher):
+        updates.append((list(changed), [repo for repo, _ in control.failed]))
+        if len(updates) == 1:
+            with open(branch_ref, 'w') as f:
+                f.write(head)
+        else:
+            control.cancel()
+
+    watch_commits([good, broken], TEST_AUTHOR, False, lambda day, commits: reports.append(len(commits)),
+                  interval=0.01, control=control, on_update=on_update)
+    assert updates == [([good, broken], [broken]), ([broken], [])]
+    assert reports == [1, 2]
+
+
+def test_watch_commits_writes_empty_report(repos):
+    repo = repos.create('app', commits=0)
+    repos.commit(repo, "feat: old", when=datetime.datetime.now() - datetime.timedelta(days=3))
+    control = RunControl()
+    reports = []
+    watch_commits([repo], TEST_AUTHOR, False, lambda day, commits: reports.append(commits), interval=0.01,
+                  control=control, on_update=lambda *args: control.cancel())
+    assert reports == [[]]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""server.py 的测试：JSON 接口、ETag / 304 和引用变化后的缓存失效"""
+
+import json
+import threading
+import http.client
+
+import pytest
+
+from server import CommitQueryService, ResponseCache, make_server
+from conftest import TEST_AUTHOR
+
+
+@pytest.fixture
+def service_url(repos, tmp_path):
+    """在随机端口上启动查询服务，返回 (service, 仓库路径, 请求函数)"""
+    repo = repos.create('app', commits=2)
+    config = {'root_directory': repos.root, 'author': TEST_AUTHOR, 'use_commit_cache': True}
+    service = CommitQueryService(config, ref_check_interval=0, config_path=str(tmp_path / 'config.yaml'))
+    server = make_server(service, '127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def request(path, headers=None):
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=30)
+        try:
+            connection.request('GET', path, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            connection.close()
+
+    try:
+        yield service, repo, request
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.cache.close()
+
+
+def test_commits_etag_and_not_modified(service_url, today):
+    service, repo, request = service_url
+    path = f'/api/commits?since={today}'
+    status, headers, body = request(path)
+    assert status == 200
+    data = json.loads(body.decode('utf-8'))
+    assert data['count'] == 2
+    etag = headers['ETag']
+
+    status, headers, body = request(path, {'If-None-Match': etag})
+    assert (status, headers['ETag'], body) == (304, etag, b'')
+    # 只有第一次请求执行了提取
+    assert service.responses.misses == 1
+
+    status, _, _ = request(path, {'If-None-Match': '"other", ' + etag})
+    assert status == 304
+
+
+def test_ref_change_invalidates_cached_response(service_url, repos, today):
+    service, repo, request = service_url
+    path = f'/api/commits?since={today}'
+    _, headers, _ = request(path)
+    etag = headers['ETag']
+
+    repos.commit(repo, "fix: new work")
+    status, headers, body = request(path, {'If-None-Match': etag})
+    assert status == 200
+    assert headers['ETag'] != etag
+    assert json.loads(body.decode('utf-8'))['count'] == 3
+
+    # 变化已确认，之后的请求重新命中缓存
+    status, _, _ = request(path, {'If-None-Match': headers['ETag']})
+    assert status == 304
+
+
+def test_bad_requests(service_url):
+    _, _, request = service_url
+    status, _, body = request('/api/commits?since=yesterday')
+    assert status == 400
+    assert 'since' in json.loads(body.decode('utf-8'))['error']
+    assert request('/api/unknown')[0] == 404
+    status, _, body = request('/health')
+    assert status == 200 and json.loads(body.decode('utf-8'))['repos'] == 1
+
+
+def test_response_cache_skips_stale_generation():
+    cache = ResponseCache(max_entries=2)
+    generation = cache.generation
+    cache.invalidate()
+    cache.put('a', generation, b'old')
+    assert cache.get('a') is None
+
+    for key in ('a', 'b', 'c'):
+        cache.put(key, cache.generation, key.encode('ascii'))
+    assert cache.get('a') is None
+    assert cache.get('c')[1] == b'c'